@@ -90,6 +90,15 @@ class Config(object):
 
         self._level = []
         self._dict_cache = {}
+        # get_config_dict() results, keyed by absolute path and arguments. The
+        # underlying config trees never change during the lifetime of a Config
+        # object, so a result can be shared by all callers (e.g. all scripts
+        # of a single commit run by vyos-configd) as long as each caller gets
+        # its own copy.
+        self._config_dict_cache = {}
+        # diff between running and session config, computed once by
+        # vyos.configdiff for the same reason
+        self._diff_cache = {}
         (self._running_config,
          self._session_config) = self._config_source.get_configtree_tuple()
 
@@ -223,9 +232,27 @@ class Config(object):
 
         return config_dict
 
+    def _get_sub_dict(self, lpath, effective, get_first_key):
+        # Only decode the part of the config below lpath, unless the whole
+        # tree has already been decoded (e.g. for a ConfigDiff)
+        if not lpath or self._dict_cache.get(effective):
+            root_dict = self.get_cached_root_dict(effective)
+            return vyos.util.get_sub_dict(root_dict, lpath, get_first_key)
+
+        if effective:
+            config = self._running_config
+        else:
+            config = self._session_config
+
+        if not config:
+            return {}
+
+        sub_dict = config.to_dict(lpath)
+        return vyos.util.get_sub_dict(sub_dict, lpath[-1:], get_first_key)
+
     def get_config_dict(self, path=[], effective=False, key_mangling=None,
                         get_first_key=False, no_multi_convert=False,
-                        no_tag_node_value_mangle=False):
+                        no_tag_node_value_mangle=False, with_defaults=False):
         """
         Args:
             path (str list): Configuration tree path, can be empty
@@ -233,34 +260,43 @@ class Config(object):
             key_mangling=None: mangle dict keys according to regex and replacement
             get_first_key=False: if k = path[:-1], return sub-dict d[k] instead of {k: d[k]}
             no_multi_convert=False: if convert, return single value of multi node as list
+            with_defaults=False: merge in the default values of the node under
+                path (of each of its values for a tag node) and of its
+                children - except for the values of nested tag nodes
 
         Returns: a dict representation of the config under path
+
+        Note:
+            Results are cached per path and arguments for the lifetime of
+            the Config object; every call returns an independent copy.
         """
         lpath = self._make_path(path)
-        root_dict = self.get_cached_root_dict(effective)
-        conf_dict = vyos.util.get_sub_dict(root_dict, lpath, get_first_key)
-
-        if not key_mangling and no_multi_convert:
-            return deepcopy(conf_dict)
-
-        xmlpath = lpath if get_first_key else lpath[:-1]
-
-        if not key_mangling:
-            conf_dict = vyos.xml.multi_to_list(xmlpath, conf_dict)
-            return conf_dict
 
-        if no_multi_convert is False:
-            conf_dict = vyos.xml.multi_to_list(xmlpath, conf_dict)
-
-        if not (isinstance(key_mangling, tuple) and \
+        if key_mangling and not (isinstance(key_mangling, tuple) and \
                 (len(key_mangling) == 2) and \
                 isinstance(key_mangling[0], str) and \
                 isinstance(key_mangling[1], str)):
             raise ValueError("key_mangling must be a tuple of two strings")
 
-        conf_dict = vyos.util.mangle_dict_keys(conf_dict, key_mangling[0], key_mangling[1], abs_path=xmlpath, no_tag_node_value_mangle=no_tag_node_value_mangle)
+        cache_key = (tuple(lpath), effective, key_mangling, get_first_key,
+                     no_multi_convert, no_tag_node_value_mangle, with_defaults)
+        if cache_key in self._config_dict_cache:
+            return deepcopy(self._config_dict_cache[cache_key])
+
+        conf_dict = self._get_sub_dict(lpath, effective, get_first_key)
+
+        if key_mangling or not no_multi_convert or with_defaults:
+            # multi node conversion, key mangling and default values are all
+            # handled in a single pass over the dict
+            conf_dict = vyos.xml.config_dict(lpath, conf_dict,
+                get_first_key=get_first_key, key_mangling=key_mangling,
+                no_multi_convert=no_multi_convert,
+                no_tag_node_value_mangle=no_tag_node_value_mangle,
+                with_defaults=with_defaults)
+
+        self._config_dict_cache[cache_key] = conf_dict
 
-        return conf_dict
+        return deepcopy(conf_dict)
 
     def is_multi(self, path):
         """
@@ -105,9 +105,8 @@ def list_diff(first, second):
     return [item for item in first if item not in second]
 
 def is_node_changed(conf, path):
-   from vyos.configdiff import get_config_diff
-   D = get_config_diff(conf, key_mangling=('-', '_'))
-   return D.is_node_changed(path)
+   from vyos.configdiff import get_diff_index
+   return get_diff_index(conf).is_node_changed(conf.get_level() + path)
 
 def leaf_node_changed(conf, path):
     """
@@ -118,6 +117,10 @@ def leaf_node_changed(conf, path):
     NOTE: path must use the real CLI node name (e.g. with a hyphen!)
     """
     from vyos.configdiff import get_config_diff
+    from vyos.configdiff import get_diff_index
+    if not get_diff_index(conf).is_node_changed(conf.get_level() + path):
+        return None
+
     D = get_config_diff(conf, key_mangling=('-', '_'))
     (new, old) = D.get_value_diff(path)
     if new != old:
@@ -146,7 +149,10 @@ def node_changed(conf, path, key_mangling=None, recursive=False):
     changed, or it was added/removed, we will return the old value. If nothing
     has been changed, None is returned
     """
-    from vyos.configdiff import get_config_diff, Diff
+    from vyos.configdiff import get_config_diff, get_diff_index, Diff
+    if not get_diff_index(conf).is_node_changed(conf.get_level() + path):
+        return []
+
     D = get_config_diff(conf, key_mangling)
     # get_child_nodes() will return dict_keys(), mangle this into a list with PEP448
     keys = D.get_child_nodes_diff(path, expand_nodes=Diff.DELETE, recursive=recursive)['delete'].keys()
@@ -403,42 +409,37 @@ def get_interface_dict(config, base, ifname=''):
             raise ConfigError('Interface (VYOS_TAGNODE_VALUE) not specified')
         ifname = os.environ['VYOS_TAGNODE_VALUE']
 
-    # retrieve interface default values
-    default_values = defaults(base)
-
-    # We take care about VLAN (vif, vif-s, vif-c) default values later on when
-    # parsing vlans in default dict and merge the "proper" values in correctly,
-    # see T2665.
-    for vif in ['vif', 'vif_s']:
-        if vif in default_values: del default_values[vif]
-
-    dict = config.get_config_dict(base + [ifname], key_mangling=('-', '_'),
-                                  get_first_key=True,
-                                  no_tag_node_value_mangle=True)
-
     # Check if interface has been removed. We must use exists() as
     # get_config_dict() will always return {} - even when an empty interface
     # node like the following exists.
     # +macsec macsec1 {
     # +}
-    if not config.exists(base + [ifname]):
+    deleted = not config.exists(base + [ifname])
+
+    # We need the dict representation of the CLI, but there are default
+    # options which we need to update into the dictionary retrived. But we
+    # should only add them when interface is not deleted - as this might
+    # confuse parsers. We take care about VLAN (vif, vif-s, vif-c) default
+    # values later on when parsing vlans in default dict and merge the "proper"
+    # values in correctly, see T2665 - get_config_dict() does not merge
+    # defaults into the values of tag nodes.
+    dict = config.get_config_dict(base + [ifname], key_mangling=('-', '_'),
+                                  get_first_key=True,
+                                  no_tag_node_value_mangle=True,
+                                  with_defaults=not deleted)
+
+    if deleted:
         dict.update({'deleted' : {}})
 
     # Add interface instance name into dictionary
     dict.update({'ifname': ifname})
 
-    # XXX: T2665: When there is no DHCPv6-PD configuration given, we can safely
-    # remove the default values from the dict.
-    if 'dhcpv6_options' not in dict:
-        if 'dhcpv6_options' in default_values:
-            del default_values['dhcpv6_options']
-
-    # We have gathered the dict representation of the CLI, but there are
-    # default options which we need to update into the dictionary retrived.
-    # But we should only add them when interface is not deleted - as this might
-    # confuse parsers
     if 'deleted' not in dict:
-        dict = dict_merge(default_values, dict)
+        # XXX: T2665: When there is no DHCPv6-PD configuration given, we can safely
+        # remove the default values from the dict.
+        if not config.exists(base + [ifname, 'dhcpv6-options']):
+            if 'dhcpv6_options' in dict:
+                del dict['dhcpv6_options']
 
         # If interface does not request an IPv4 DHCP address there is no need
         # to keep the dhcp-options key
@@ -41,6 +41,16 @@ class Diff(IntFlag):
 
 ALL = Diff.MERGE | Diff.DELETE | Diff.ADD | Diff.STABLE
 
+class Change(IntFlag):
+    """
+    Kind of change of a node between effective and session config:
+    ADD/DELETE: the node, or one of its parents, was added/deleted
+    MODIFY: the node exists in both, but its value or a node below changed
+    """
+    ADD = auto()
+    DELETE = auto()
+    MODIFY = auto()
+
 requires_effective = [enum_to_key(Diff.DELETE)]
 target_defaults = [enum_to_key(Diff.MERGE)]
 
@@ -66,21 +76,99 @@ def _dict_from_key_set(key_set, d):
 
     return ret
 
-def get_config_diff(config, key_mangling=None):
+class DiffIndex(object):
     """
-    Check type and return ConfigDiff instance.
+    Index of the changed nodes between effective and session config dicts,
+    computed once; the change of any path is then found in O(depth).
     """
+    def __init__(self, session_dict, effective_dict):
+        self._changes = {}
+        self._index((), session_dict, effective_dict)
+
+    def _index(self, path, session, effective):
+        changed = False
+        for k in session:
+            kpath = path + (k,)
+            if k not in effective:
+                self._changes[kpath] = Change.ADD
+                changed = True
+            elif isinstance(session[k], dict) and isinstance(effective[k], dict):
+                if self._index(kpath, session[k], effective[k]):
+                    self._changes[kpath] = Change.MODIFY
+                    changed = True
+            elif session[k] != effective[k]:
+                self._changes[kpath] = Change.MODIFY
+                changed = True
+        for k in effective:
+            if k not in session:
+                self._changes[path + (k,)] = Change.DELETE
+                changed = True
+        return changed
+
+    def get_change(self, path):
+        """
+        Args:
+            path (list): absolute config path
+
+        Returns: Change of the node at path, Change(0) if unchanged
+        """
+        key = tuple(path)
+        change = self._changes.get(key)
+        if change is not None:
+            return change
+        # below an added or deleted node
+        for i in range(len(key) - 1, 0, -1):
+            change = self._changes.get(key[:i])
+            if change is not None:
+                if change & (Change.ADD | Change.DELETE):
+                    return change
+                break
+        return Change(0)
+
+    def is_node_changed(self, path):
+        return bool(self.get_change(path))
+
+    def get_changed_paths(self, path=[]):
+        """
+        Returns: dict of the changed paths (as tuples) below and including
+                 path, with their Change; paths below an added or deleted
+                 node are not listed
+        """
+        key = tuple(path)
+        return {k: v for k, v in self._changes.items() if k[:len(key)] == key}
+
+def _check_config(config):
     if not config or not isinstance(config, Config):
         raise TypeError("argument must me a Config instance")
+
+def get_diff_index(config):
+    """
+    Return the DiffIndex of config, computed on first use only.
+    """
+    _check_config(config)
+    if 'index' not in config._diff_cache:
+        config._diff_cache['index'] = DiffIndex(
+            config.get_cached_root_dict(effective=False),
+            config.get_cached_root_dict(effective=True))
+    return config._diff_cache['index']
+
+def get_config_diff(config, key_mangling=None):
+    """
+    Check type and return ConfigDiff instance.
+    """
+    _check_config(config)
     if key_mangling and not (isinstance(key_mangling, tuple) and \
             (len(key_mangling) == 2) and \
             isinstance(key_mangling[0], str) and \
             isinstance(key_mangling[1], str)):
         raise ValueError("key_mangling must be a tuple of two strings")
 
-    diff_t = DiffTree(config._running_config, config._session_config)
+    # the config trees of a Config object do not change, neither does the diff
+    if 'tree' not in config._diff_cache:
+        config._diff_cache['tree'] = DiffTree(config._running_config,
+                                              config._session_config)
 
-    return ConfigDiff(config, key_mangling, diff_tree=diff_t)
+    return ConfigDiff(config, key_mangling, diff_tree=config._diff_cache['tree'])
 
 class ConfigDiff(object):
     """
@@ -95,6 +183,7 @@ class ConfigDiff(object):
 
         self._diff_tree = diff_tree
         self._diff_dict = diff_tree.dict if diff_tree else {}
+        self._diff_index = get_diff_index(config)
 
     # mirrored from Config; allow path arguments relative to level
     def _make_path(self, path):
@@ -145,13 +234,16 @@ class ConfigDiff(object):
         return config_dict
 
     def is_node_changed(self, path=[]):
-        if self._diff_tree is None:
-            raise NotImplementedError("diff_tree class not available")
+        return self._diff_index.is_node_changed(self._make_path(path))
+
+    def get_node_change(self, path=[]):
+        """
+        Args:
+            path (str|list): config path
 
-        if (self._diff_tree.add.exists(self._make_path(path)) or
-            self._diff_tree.sub.exists(self._make_path(path))):
-            return True
-        return False
+        Returns: Change of the node at path, Change(0) if unchanged
+        """
+        return self._diff_index.get_change(self._make_path(path))
 
     def get_child_nodes_diff_str(self, path=[]):
         ret = {'add': {}, 'change': {}, 'delete': {}}
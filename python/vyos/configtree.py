@@ -42,6 +42,75 @@ class ConfigTreeError(Exception):
     pass
 
 
+_command_token = re.compile(r"""'([^']*)'|"((?:[^"\\]|\\.)*)"|(\S+)""")
+
+def parse_commands(commands):
+    """Parse a stream of set/delete commands into ConfigTree.apply_ops() operations.
+
+    commands: iterable of lines, e.g. an open file or the lines of to_commands()
+
+    Lines are consumed one at a time and operations are yielded as they are
+    parsed, so the stream is never held in memory as a whole. The last word of
+    a command is a value if it is quoted, or if the XML definition says the
+    node before it is a leaf node, otherwise it is a valueless node. Values of
+    multi nodes, or of nodes unknown to the XML definition, are added to the
+    existing values, other values replace them. Tag nodes known by the XML
+    definition are marked as such once, after their first set.
+    Empty lines and comments are skipped, other commands raise a ValueError.
+    """
+    from vyos.xml import load_configuration
+
+    xml = load_configuration()
+    tags = set()
+    for number, line in enumerate(commands, start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        words = []
+        quoted = False
+        for m in _command_token.finditer(line):
+            single, double, plain = m.groups()
+            if plain is not None:
+                words.append(plain)
+                quoted = False
+            elif single is not None:
+                words.append(single)
+                quoted = True
+            else:
+                words.append(re.sub(r'\\(.)', r'\1', double))
+                quoted = True
+
+        op, path = words[0], words[1:]
+        if op not in ['set', 'delete'] or not path:
+            raise ValueError(f'line {number}: unsupported command "{line}"')
+
+        value = None
+        if len(path) > 1 and (quoted or xml.is_leaf(path[:-1])):
+            path, value = path[:-1], path[-1]
+
+        if op == 'delete':
+            if value is None:
+                yield ('delete', path)
+            else:
+                yield ('delete_value', path, value)
+            continue
+
+        yield ('set', path, value, xml.is_multi(path) is False)
+
+        tag_value = False
+        for i in range(1, len(path)):
+            if tag_value:
+                tag_value = False
+                continue
+            if xml.is_tag(path[:i]):
+                tag_value = True
+                tag = tuple(path[:i])
+                if tag not in tags:
+                    tags.add(tag)
+                    yield ('set_tag', path[:i])
+
+
 class ConfigTree(object):
     def __init__(self, config_string=None, address=None, libpath=LIBPATH):
         if config_string is None and address is None:
@@ -171,6 +240,23 @@ class ConfigTree(object):
     def to_json_ast(self):
         return self.__to_json_ast(self.__config).decode()
 
+    def to_dict(self, path=[]):
+        """Return the configuration under path as a dict.
+
+        The result is identical to vyos.util.get_sub_dict(json.loads(to_json()), path)
+        but only the requested subtree is serialized and decoded, which makes
+        retrieving a small part of a large configuration cheap.
+        path: configuration path e.g. ['interfaces', 'ethernet', 'eth0']
+        """
+        check_path(path)
+        if not path:
+            return json.loads(self.to_json())
+        if not self.exists(path):
+            return {}
+
+        subt = self.get_subtree(path, with_node=True)
+        return json.loads(subt.to_json())
+
     def set(self, path, value=None, replace=True):
         """Set new entry in VyOS configuration.
         path: configuration path e.g. 'system dns forwarding listen-address'
@@ -295,6 +381,67 @@ class ConfigTree(object):
         else:
             raise ConfigTreeError("Path [{}] doesn't exist".format(path_str))
 
+    def apply_ops(self, ops):
+        """Apply a batch of operations to the tree.
+
+        ops: iterable of tuples, any of
+             ('set', path[, value[, replace]])
+             ('delete', path)
+             ('delete_value', path, value)
+             ('rename', path, new_name)
+             ('copy', old_path, new_path)
+             ('set_tag', path)
+             with the same meaning as the methods of the same name, e.g. as
+             yielded by parse_commands()
+
+        Unlike the individual methods, a failing operation does not stop the
+        batch: all operations are attempted and a list of (index, message)
+        for the failed ones is returned, empty if all succeeded. Setting a
+        value which is already present is reported as a failure.
+        """
+        config = self.__config
+        exists = self.__exists
+        encode = lambda path: " ".join(map(str, path)).encode()
+
+        errors = []
+        for index, op in enumerate(ops):
+            try:
+                name, path, *args = op
+                check_path(path)
+                path_str = encode(path)
+                if name == 'set':
+                    value = args[0] if args else None
+                    replace = args[1] if len(args) > 1 else True
+                    if value is None:
+                        res = self.__set_valueless(config, path_str)
+                    elif replace:
+                        res = self.__set_replace_value(config, path_str, str(value).encode())
+                    else:
+                        res = self.__set_add_value(config, path_str, str(value).encode())
+                elif name == 'delete':
+                    res = self.__delete(config, path_str)
+                elif name == 'delete_value':
+                    res = self.__delete_value(config, path_str, str(args[0]).encode())
+                elif name == 'rename':
+                    if exists(config, encode(path[:-1] + [args[0]])):
+                        raise ConfigTreeError("Path [{}] already exists".format(path[:-1] + [args[0]]))
+                    res = self.__rename(config, path_str, str(args[0]).encode())
+                elif name == 'copy':
+                    check_path(args[0])
+                    if exists(config, encode(args[0])):
+                        raise ConfigTreeError("Path [{}] already exists".format(args[0]))
+                    res = self.__copy(config, path_str, encode(args[0]))
+                elif name == 'set_tag':
+                    res = self.__set_tag(config, path_str)
+                else:
+                    raise ConfigTreeError("Unknown operation {}".format(name))
+                if res != 0:
+                    raise ConfigTreeError("Failed to {} [{}]".format(name, path))
+            except (ConfigTreeError, TypeError, ValueError, IndexError) as e:
+                errors.append((index, str(e)))
+
+        return errors
+
     def get_subtree(self, path, with_node=False):
         check_path(path)
         path_str = " ".join(map(str, path)).encode()
@@ -0,0 +1,211 @@
+# Copyright 2022 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# Streaming reader of the conntrack table for op-mode commands.
+#
+# The XML output of conntrack is parsed incrementally and every flow is
+# yielded as a Flow tuple once its closing tag was read, then dropped from
+# the document: memory use does not grow with the size of the table.
+#
+# Filters are passed to conntrack so the kernel only dumps the matching
+# flows, and applied again to the flows of a file or pipe.
+
+import shlex
+
+from collections import Counter
+from collections import namedtuple
+from subprocess import DEVNULL
+from subprocess import PIPE
+from subprocess import Popen
+from xml.etree.ElementTree import iterparse
+from xml.etree.ElementTree import ParseError
+
+conntrack = 'sudo conntrack'
+
+Flow = namedtuple('Flow', [
+    'id', 'family', 'proto',
+    'orig_src', 'orig_dst', 'orig_sport', 'orig_dport',
+    'reply_src', 'reply_dst', 'reply_sport', 'reply_dport',
+    'state', 'timeout', 'mark', 'zone', 'use', 'type',
+    'orig_packets', 'orig_bytes', 'reply_packets', 'reply_bytes'])
+
+# fields a flow can be aggregated by with top()
+top_keys = {
+    'source': lambda f: f.orig_src,
+    'destination': lambda f: f.orig_dst,
+    'destination-port': lambda f: f'{f.orig_dport}/{f.proto}' if f.orig_dport else f.proto,
+    'protocol': lambda f: f.proto,
+    'state': lambda f: f.state,
+    'zone': lambda f: f.zone,
+}
+
+def _int(text):
+    return int(text) if text else None
+
+def _flow(elem):
+    """ Flow of a <flow> element """
+    tmp = dict.fromkeys(Flow._fields)
+    tmp['type'] = elem.get('type')
+    for meta in elem.iterfind('meta'):
+        direction = meta.get('direction')
+        if direction in ['original', 'reply']:
+            prefix = 'orig' if direction == 'original' else 'reply'
+            layer3 = meta.find('layer3')
+            if layer3 is not None:
+                tmp['family'] = layer3.get('protoname')
+                tmp[f'{prefix}_src'] = layer3.findtext('src')
+                tmp[f'{prefix}_dst'] = layer3.findtext('dst')
+            layer4 = meta.find('layer4')
+            if layer4 is not None:
+                tmp['proto'] = layer4.get('protoname')
+                tmp[f'{prefix}_sport'] = _int(layer4.findtext('sport'))
+                tmp[f'{prefix}_dport'] = _int(layer4.findtext('dport'))
+            counters = meta.find('counters')
+            if counters is not None:
+                tmp[f'{prefix}_packets'] = _int(counters.findtext('packets'))
+                tmp[f'{prefix}_bytes'] = _int(counters.findtext('bytes'))
+        elif direction == 'independent':
+            tmp['state'] = meta.findtext('state')
+            for key in ['id', 'timeout', 'mark', 'zone', 'use']:
+                tmp[key] = _int(meta.findtext(key))
+    return Flow(**tmp)
+
+def _document(elem):
+    """ elem converted like xmltodict.parse(attr_prefix='') does """
+    out = dict(elem.attrib)
+    for child in elem:
+        value = _document(child)
+        if child.tag not in out:
+            out[child.tag] = value
+        elif isinstance(out[child.tag], list):
+            out[child.tag].append(value)
+        else:
+            # repeated elements, e.g. the meta of every direction
+            out[child.tag] = [out[child.tag], value]
+    text = (elem.text or '').strip()
+    if not out:
+        return text or None
+    if text:
+        out['#text'] = text
+    return out
+
+def parse(source, as_dict=False):
+    """
+    Flows of the conntrack XML document read from the file object source,
+    as Flow, or with as_dict as the dict of the <flow> element, in the shape
+    of the raw output of the op-mode commands.
+    Stops at the end of the document, the rest of source is left unread.
+    """
+    convert = _document if as_dict else _flow
+    root = None
+    try:
+        for event, elem in iterparse(source, events=('start', 'end')):
+            if root is None:
+                root = elem
+            elif event == 'end' and elem.tag == 'flow':
+                yield convert(elem)
+                # drop the flows already yielded from the document
+                root.clear()
+            if event == 'end' and elem is root:
+                return
+    except ParseError:
+        # no flows, conntrack does not even print the root element
+        if root is None:
+            return
+        raise
+
+def match(flow, src=None, dst=None, proto=None, zone=None):
+    """ True if flow matches all given filters """
+    return ((src is None or flow.orig_src == src) and
+            (dst is None or flow.orig_dst == dst) and
+            (proto is None or flow.proto == proto) and
+            (zone is None or flow.zone == int(zone)))
+
+def dump_command(family=None, nat=None, src=None, dst=None, proto=None, zone=None):
+    """
+    conntrack command dumping the flows of the family ('ipv4' or 'ipv6')
+    matching the filters, nat being 'source' or 'destination' for the
+    flows translated by source or destination NAT only
+    """
+    command = f'{conntrack} --dump --output xml'
+    if family:
+        command += f' --family {family}'
+    if nat == 'source':
+        command += ' --src-nat'
+    elif nat == 'destination':
+        command += ' --dst-nat'
+    if src:
+        command += f' --orig-src {shlex.quote(str(src))}'
+    if dst:
+        command += f' --orig-dst {shlex.quote(str(dst))}'
+    if proto:
+        command += f' --proto {shlex.quote(proto)}'
+    if zone is not None:
+        command += f' --zone {int(zone)}'
+    return command
+
+def get_flows(family=None, nat=None, src=None, dst=None, proto=None, zone=None,
+              as_dict=False):
+    """
+    Flows of the conntrack table matching the filters, see dump_command(),
+    and parse() for as_dict. Raises OSError if conntrack failed.
+    """
+    command = dump_command(family, nat, src, dst, proto, zone)
+    process = Popen(shlex.split(command), stdout=PIPE, stderr=DEVNULL)
+    try:
+        yield from parse(process.stdout, as_dict)
+        # the end of the document, let conntrack write the rest and exit
+        process.stdout.read()
+    except BaseException:
+        # the consumer stopped early or the output is broken, do not wait
+        # for the whole dump
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode:
+        raise OSError(process.returncode, f'"{command}" failed')
+
+def raw_document(flows):
+    """
+    The raw output of the op-mode commands for flows (dicts, see parse()):
+    the conntrack document as converted by xmltodict, with a list of flows
+    """
+    flows = list(flows)
+    if not flows:
+        return {'conntrack': {'error': True, 'reason': 'entries not found'}}
+    return {'conntrack': {'flow': flows}}
+
+def top(flows, key, count=10, by='flows'):
+    """
+    The count largest values of key (see top_keys) over flows, by number
+    of flows, or by their 'packets' or 'bytes' in both directions, as a
+    list of (value, total). Only the totals per value are kept in memory.
+    """
+    if key not in top_keys:
+        raise ValueError(f'Unknown key "{key}", must be one of {", ".join(top_keys)}')
+    if by not in ['flows', 'packets', 'bytes']:
+        raise ValueError(f'Unknown aggregate "{by}"')
+
+    value = top_keys[key]
+    totals = Counter()
+    for flow in flows:
+        if by == 'flows':
+            totals[value(flow)] += 1
+        else:
+            totals[value(flow)] += ((getattr(flow, f'orig_{by}') or 0) +
+                                    (getattr(flow, f'reply_{by}') or 0))
+    return totals.most_common(count)
@@ -38,6 +38,8 @@ cfg_vintage = 'vyos'
 
 commit_lock = '/opt/vyatta/config/.lock'
 
+commit_timing_log = '/run/vyos-commit-timing.log'
+
 component_version_json = os.path.join(directories['data'], 'component-versions.json')
 
 https_data = {
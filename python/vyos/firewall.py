@@ -16,9 +16,16 @@
 
 import csv
 import gzip
+import json
 import os
 import re
+import struct
 
+from ipaddress import IPv4Address
+from ipaddress import IPv6Address
+from ipaddress import collapse_addresses
+from ipaddress import ip_address
+from ipaddress import ip_network
 from pathlib import Path
 from socket import AF_INET
 from socket import AF_INET6
@@ -26,11 +33,15 @@ from socket import getaddrinfo
 from time import strftime
 
 from vyos.remote import download
+from vyos.remote import download_if_modified
+from vyos.resolver import cache_load as resolver_cache_load
+from vyos.resolver import cache_lookup as resolver_cache_lookup
 from vyos.task_scheduler import task_scheduler_apply
 from vyos.task_scheduler import task_scheduler_generate
 from vyos.task_scheduler import task_scheduler_verify
 from vyos.template import is_ipv4
 from vyos.template import is_ipv6
+from vyos.template import nft_intra_zone_action
 from vyos.template import render
 from vyos.util import call
 from vyos.util import cmd
@@ -55,6 +66,49 @@ def fqdn_config_parse(firewall):
         elif path[0] == 'ipv6_name':
             firewall['ip6_fqdn'][set_name] = domain
 
+def domain_sets(firewall):
+    """
+    (set name, address family, domains) of every set filled with the
+    addresses of domains, as parsed by fqdn_config_parse()
+    """
+    sets = []
+
+    domain_groups = dict_search_args(firewall, 'group', 'domain_group')
+    if domain_groups:
+        for set_name, domain_config in domain_groups.items():
+            if 'address' not in domain_config:
+                continue
+            for family in [AF_INET, AF_INET6]:
+                sets.append((f'D_{set_name}', family, domain_config['address']))
+
+    for set_name, domain in firewall['ip_fqdn'].items():
+        sets.append((f'FQDN_{set_name}', AF_INET, [domain]))
+
+    for set_name, domain in firewall['ip6_fqdn'].items():
+        sets.append((f'FQDN_{set_name}', AF_INET6, [domain]))
+
+    return sets
+
+def domain_sets_cached(firewall):
+    """
+    Addresses of the domain sets known to the resolver cache, keyed by
+    'ipv4'/'ipv6' and set name. Expired entries are only used with
+    resolver-cache, as the resolver does on failures.
+    """
+    cache = resolver_cache_load()
+    stale = 'resolver_cache' in firewall
+
+    out = {'ipv4': {}, 'ipv6': {}}
+    for set_name, family, domains in domain_sets(firewall):
+        addresses = set()
+        for domain in domains:
+            tmp = resolver_cache_lookup(cache, domain, family, stale)
+            if tmp:
+                addresses |= tmp[0]
+        if addresses:
+            out['ipv4' if family == AF_INET else 'ipv6'][set_name] = sorted(addresses)
+    return out
+
 def fqdn_resolve(fqdn, ipv6=False):
     try:
         res = getaddrinfo(fqdn, None, AF_INET6 if ipv6 else AF_INET)
@@ -120,7 +174,10 @@ def parse_rule(rule_conf, fw_name, rule_id, ip_name):
 
             if 'address' in side_conf:
                 suffix = side_conf['address']
-                if suffix[0] == '!':
+                if isinstance(suffix, list):
+                    # rules merged by optimize_rules()
+                    suffix = f'{{ {", ".join(suffix)} }}'
+                elif suffix[0] == '!':
                     suffix = f'!= {suffix[1:]}'
                 output.append(f'{ip_name} {prefix}addr {suffix}')
 
@@ -237,10 +294,14 @@ def parse_rule(rule_conf, fw_name, rule_id, ip_name):
 
     if 'inbound_interface' in rule_conf:
         iiface = rule_conf['inbound_interface']
+        if isinstance(iiface, list):
+            iiface = f'{{ {", ".join(iiface)} }}'
         output.append(f'iifname {iiface}')
 
     if 'outbound_interface' in rule_conf:
         oiface = rule_conf['outbound_interface']
+        if isinstance(oiface, list):
+            oiface = f'{{ {", ".join(oiface)} }}'
         output.append(f'oifname {oiface}')
 
     if 'ttl' in rule_conf:
@@ -377,12 +438,216 @@ def parse_policy_set(set_conf, def_suffix):
         out.append(f'tcp option maxseg size set {mss}')
     return " ".join(out)
 
+# Ruleset optimisation
+
+# Rule values that can be merged into an anonymous set, as dict paths
+optimize_paths = [
+    ['source', 'address'],
+    ['destination', 'address'],
+    ['source', 'port'],
+    ['destination', 'port'],
+    ['inbound_interface'],
+    ['outbound_interface']
+]
+
+def _optimize_rule_mergeable(rule_conf):
+    # these refer to per rule sets or carry the rule number
+    if rule_conf.get('log') == 'enable' or 'recent' in rule_conf:
+        return False
+    for side in ['source', 'destination']:
+        if {'fqdn', 'geoip'} & set(rule_conf.get(side, {})):
+            return False
+    return True
+
+def _optimize_rule_values(rule_conf, path):
+    value = dict_search_args(rule_conf, *path)
+    if not isinstance(value, str):
+        return None
+    values = value.split(',') if path[-1] == 'port' else [value]
+    for v in values:
+        if v[0] == '!' or v[-1] == '*' or (path[-1] == 'address' and '-' in v):
+            return None
+    return values
+
+def _optimize_rule_without(rule_conf, path):
+    out = dict(rule_conf)
+    tmp = out
+    for key in path[:-1]:
+        tmp[key] = dict(tmp[key])
+        tmp = tmp[key]
+    del tmp[path[-1]]
+    return out
+
+def _optimize_merge_values(path, values):
+    """
+    Elements of the anonymous set matching any of values, None if they
+    do not form a valid set: overlapping intervals are rejected by nft
+    """
+    values = list(dict.fromkeys(values))
+    if path[-1] == 'address':
+        try:
+            networks = [ip_network(v, strict=False) for v in values]
+        except ValueError:
+            return None
+        if len({n.version for n in networks}) != 1:
+            return None
+        return [str(n.network_address) if n.num_addresses == 1 else str(n)
+                for n in collapse_addresses(networks)]
+
+    if path[-1] == 'port':
+        ranges = []
+        for v in values:
+            lo, _, hi = v.partition('-')
+            if not lo.isdigit() or (hi and not hi.isdigit()):
+                return None
+            ranges.append((int(lo), int(hi or lo)))
+        ranges.sort()
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            if start <= end:
+                return None
+        return [','.join(values)]
+
+    return values
+
+def _optimize_merge(group, rule_id, rule_conf):
+    if not _optimize_rule_mergeable(group['conf']) or not _optimize_rule_mergeable(rule_conf):
+        return False
+
+    paths = [group['path']] if group['path'] else optimize_paths
+    for path in paths:
+        if group['path']:
+            first, rest = group['values'], group['rest']
+        else:
+            first = _optimize_rule_values(group['conf'], path)
+            if not first:
+                continue
+            rest = _optimize_rule_without(group['conf'], path)
+
+        values = _optimize_rule_values(rule_conf, path)
+        if not values or _optimize_rule_without(rule_conf, path) != rest:
+            continue
+        merged = _optimize_merge_values(path, first + values)
+        if not merged:
+            continue
+
+        group.update(path=path, rest=rest, values=first + values, merged=merged)
+        group['ids'].append(rule_id)
+        return True
+
+    return False
+
+def optimize_rules(rules):
+    """
+    Merge runs of adjacent enabled rules which only differ by the value of
+    one of optimize_paths into a single rule matching the set of values.
+    Rule order, and therefore the verdict of every packet, is unchanged.
+
+    Returns the rules keyed by the comma separated ids of the rules they
+    replace, and the number of rules saved.
+    """
+    groups = []
+    for rule_id, rule_conf in rules.items():
+        if 'disable' in rule_conf:
+            continue
+        if groups and _optimize_merge(groups[-1], rule_id, rule_conf):
+            continue
+        groups.append({'ids': [rule_id], 'conf': rule_conf, 'path': None})
+
+    out = {}
+    for group in groups:
+        rule_conf = group['conf']
+        if group['path']:
+            path = group['path']
+            rule_conf = _optimize_rule_without(rule_conf, path)
+            tmp = rule_conf
+            for key in path[:-1]:
+                tmp = tmp[key]
+            merged = group['merged']
+            tmp[path[-1]] = merged[0] if path[-1] == 'port' else merged
+        out[','.join(group['ids'])] = rule_conf
+
+    saved = sum(len(group['ids']) - 1 for group in groups)
+    return out, saved
+
+# Zones
+#
+# The zone firewall is compiled into verdict maps. The forward hook looks
+# up the (input, output) interface pair of a packet in a single map, the
+# input and output hooks of the local zone the interface alone, so the
+# cost per packet does not depend on the number of zones. A chain of a
+# firewall name is reached with goto: when it returns, the packet gets the
+# policy of the hook, as it did with the former jump and return rules.
+
+def _zone_verdict(from_conf, fw_name, prefix):
+    name = dict_search_args(from_conf, 'firewall', fw_name)
+    return f'goto {prefix}{name}' if name else None
+
+def zone_verdict_maps(zones, ipv6=False):
+    """
+    Elements of the verdict maps of the zones for nftables-zone.j2, in a
+    single pass over the zones and their 'from' entries:
+
+      forward:         {(iifname, oifname): verdict} between zones
+      forward_default: {oifname: zone} to the default action of the zone
+      local:           name of the local zone, None if there is none
+      local_in:        {iifname: verdict} towards the local zone
+      local_out:       {oifname: verdict} from the local zone
+    """
+    fw_name = 'ipv6_name' if ipv6 else 'name'
+    prefix = 'NAME6_' if ipv6 else 'NAME_'
+
+    local = next((zone for zone, zone_conf in zones.items() if 'local_zone' in zone_conf), None)
+    out = {
+        'forward': {},
+        'forward_default': {},
+        'local': local,
+        'local_in': {'lo': 'accept'} if local else {},
+        'local_out': {'lo': 'accept'} if local else {}
+    }
+
+    for zone, zone_conf in zones.items():
+        if zone == local:
+            for from_zone, from_conf in zone_conf.get('from', {}).items():
+                verdict = _zone_verdict(from_conf, fw_name, prefix)
+                if verdict:
+                    for iif in zones[from_zone].get('interface', []):
+                        out['local_in'].setdefault(iif, verdict)
+            continue
+
+        interfaces = zone_conf.get('interface', [])
+        intra = nft_intra_zone_action(zone_conf, ipv6)
+        intra = 'accept' if intra == 'return' else intra.replace('jump ', 'goto ')
+        for oif in interfaces:
+            out['forward_default'][oif] = zone
+            for iif in interfaces:
+                out['forward'][(iif, oif)] = intra
+
+        for from_zone, from_conf in zone_conf.get('from', {}).items():
+            verdict = _zone_verdict(from_conf, fw_name, prefix)
+            if not verdict:
+                continue
+            if from_zone == local:
+                for oif in interfaces:
+                    out['local_out'].setdefault(oif, verdict)
+                continue
+            for iif in zones[from_zone].get('interface', []):
+                for oif in interfaces:
+                    out['forward'].setdefault((iif, oif), verdict)
+
+    return out
+
 # Lists
 
 nftables_external_list_conf = '/run/nftables-external-list.conf'
 external_list_file_dir = '/usr/share/vyos-external-list'
 external_list_lock_file = '/run/vyos-external-list.lock'
 external_list_crontab_file = '/etc/cron.d/vyos-external-list'
+# last applied elements of every external list set, gone with the sets on reboot
+external_list_state_dir = '/run/vyos-external-list'
+# reload a set in full if the delta exceeds this share of its elements
+external_list_delta_threshold = 0.5
+# maximum number of lists downloaded at the same time
+external_list_download_workers = 4
 
 def external_list_load_data(lists=[]):
     if not lists:
@@ -406,21 +671,115 @@ def external_list_load_data(lists=[]):
     return out
 
 def external_list_download(list=None, url=None):
+    """
+    Download a list, unless the copy downloaded earlier from the same url is
+    still current: the HTTP validators of the copy are kept next to it.
+    """
     if not list or not url:
         return False
 
     try:
-        if not os.path.exists(external_list_file_dir):
-            os.mkdir(external_list_file_dir)
+        os.makedirs(external_list_file_dir, exist_ok=True)
 
         list_file = os.path.join(external_list_file_dir, list + '.csv')
-        download(list_file, url)
+        validators_file = os.path.join(external_list_file_dir, list + '.validators')
+        validators = {}
+        try:
+            with open(validators_file) as f:
+                validators = json.load(f)
+            if validators.get('url') != url:
+                validators = {}
+        except (OSError, ValueError):
+            pass
+
+        modified, validators = download_if_modified(list_file, url, validators)
+        if not modified:
+            print(f'External list {list} is up to date')
+            return True
+
+        with open(validators_file, 'w') as f:
+            json.dump({**validators, 'url': url}, f)
         print(f'Downloaded {list} external list')
         return True
     except Exception as e:
         print(f'Error: Failed to download {list} external list.\n{e}')
     return False
 
+def external_list_download_all(lists):
+    """
+    Download the lists of {name: url} concurrently, returns the names of the
+    lists available
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not lists:
+        return []
+
+    workers = min(len(lists), external_list_download_workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(lambda item: external_list_download(*item), lists.items())
+        return [name for name, result in zip(lists, results) if result]
+
+def _external_list_state_file(family, name):
+    return os.path.join(external_list_state_dir, f'{family}_{name}.json')
+
+def external_list_state_clear():
+    """ Forget the applied elements, e.g. once the sets were recreated empty """
+    if not os.path.isdir(external_list_state_dir):
+        return
+    for f in os.listdir(external_list_state_dir):
+        os.unlink(os.path.join(external_list_state_dir, f))
+
+def _external_list_state_load(family, name):
+    try:
+        with open(_external_list_state_file(family, name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _external_list_state_save(family, name, elements):
+    os.makedirs(external_list_state_dir, exist_ok=True)
+    tmp = _external_list_state_file(family, name) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(elements, f)
+    os.replace(tmp, _external_list_state_file(family, name))
+
+def external_list_aggregate(entries):
+    """ Sorted list of the smallest set of prefixes covering all entries """
+    return [str(n) for n in collapse_addresses(ip_network(e, strict=False) for e in entries)]
+
+def external_list_delta(sets, family):
+    """
+    Compare the aggregated elements of every set with the last applied ones.
+    Returns the sets to reload in full, the add/delete delta of the others and
+    the elements of all sets once applied. Sets without known state, or with
+    a delta above the threshold, are reloaded in full; unchanged sets are left
+    alone.
+    """
+    full = {}
+    delta = {}
+    applied = {}
+    for name, entries in sets.items():
+        new = external_list_aggregate(entries)
+        old = _external_list_state_load(family, name)
+        applied[name] = new
+        if old is None:
+            full[name] = new
+            continue
+
+        old_set = set(old)
+        new_set = set(new)
+        add = [n for n in new if n not in old_set]
+        delete = [n for n in old if n not in new_set]
+        if not add and not delete:
+            continue
+        if len(add) + len(delete) > external_list_delta_threshold * max(len(new), 1):
+            full[name] = new
+        else:
+            delta[name] = {'add': add, 'delete': delete}
+
+    return full, delta, applied
+
 class ExternalListLock(object):
     def __init__(self, file):
         self.file = file
@@ -436,6 +795,21 @@ class ExternalListLock(object):
         os.unlink(self.file)
 
 def external_list_update(firewall, name=None, force=False):
+    # download first, the lock is only held while applying the lists
+    names = []
+    downloads = {}
+    for key in dict_search_args(firewall, 'group', 'external_list') or []:
+        if name and name != key:
+            continue
+        list_file = os.path.join(external_list_file_dir, key + '.csv')
+        if os.path.exists(list_file) and not force:
+            names.append(key)
+            continue
+        url = dict_search_args(firewall, 'group', 'external_list', key, 'url')
+        if url:
+            downloads[key] = url
+    names += external_list_download_all(downloads)
+
     with ExternalListLock(external_list_lock_file) as lock:
         if not lock:
             print('Script is already running')
@@ -453,7 +827,6 @@ def external_list_update(firewall, name=None, force=False):
             print('No external list(s) are configured')
             return True
 
-        names = []
         tasks = []
         for key in firewall['group']['external_list']:
             interval = dict_search_args(firewall, 'group', 'external_list', key, 'interval')
@@ -467,15 +840,6 @@ def external_list_update(firewall, name=None, force=False):
                         "args": f'--force --name {key}'
                        }
                 tasks.append(task)
-            if not name or name == key:
-                list_file = os.path.join(external_list_file_dir, key + '.csv')
-                if not os.path.exists(list_file) or force:
-                    url = dict_search_args(firewall, 'group', 'external_list', key, 'url')
-                    if not url:
-                        continue
-                    if not external_list_download(key, url):
-                        continue
-                names.append(key)
 
         if tasks:
             try:
@@ -493,8 +857,9 @@ def external_list_update(firewall, name=None, force=False):
 
         lists_data = external_list_load_data(names)
 
-        ipv4_sets = {}
-        ipv6_sets = {}
+        # a list which became empty must still be emptied
+        ipv4_sets = {name: [] for name in names}
+        ipv6_sets = {name: [] for name in names}
 
         # Iterate IP blocks to assign to sets
         for setname, entry in lists_data:
@@ -507,42 +872,139 @@ def external_list_update(firewall, name=None, force=False):
             elif is_ipv6(entry):
                 ipv6_sets.setdefault(setname, []).append(entry)
 
+        ipv4_full, ipv4_delta, ipv4_applied = external_list_delta(ipv4_sets, 'ipv4')
+        ipv6_full, ipv6_delta, ipv6_applied = external_list_delta(ipv6_sets, 'ipv6')
+
+        if not (ipv4_full or ipv4_delta or ipv6_full or ipv6_delta):
+            return True
+
+        # deletions are rendered before additions, nft applies the file as a
+        # single transaction: the sets are never seen partially updated
         render(nftables_external_list_conf, 'firewall/nftables-external-list-update.j2', {
-            'ipv4_sets': ipv4_sets,
-            'ipv6_sets': ipv6_sets
+            'ipv4_sets': ipv4_full,
+            'ipv4_delta': ipv4_delta,
+            'ipv6_sets': ipv6_full,
+            'ipv6_delta': ipv6_delta
         })
 
         # need full path, /usr/sbin isn't in the cron PATH
         result = run(f'/usr/sbin/nft -f {nftables_external_list_conf}')
         if result != 0:
+            # the elements in the kernel are unknown now, reload in full next time
+            for family, applied in [('ipv4', ipv4_applied), ('ipv6', ipv6_applied)]:
+                for name in applied:
+                    if os.path.exists(_external_list_state_file(family, name)):
+                        os.unlink(_external_list_state_file(family, name))
             print('Error: External list(s) failed to update firewall')
             return False
 
+        for family, applied in [('ipv4', ipv4_applied), ('ipv6', ipv6_applied)]:
+            for name, elements in applied.items():
+                _external_list_state_save(family, name, elements)
+
         return True
 
 # GeoIP
 
 nftables_geoip_conf = '/run/nftables-geoip.conf'
 geoip_database = '/usr/share/vyos-geoip/dbip-country-lite.csv.gz'
+geoip_index = '/usr/share/vyos-geoip/dbip-country-lite.idx'
 geoip_lock_file = '/run/vyos-geoip.lock'
 
-def geoip_load_data(codes=[]):
-    data = None
+# The GeoIP index holds the ranges of the database per country, sorted with
+# adjacent and overlapping ranges merged, as integer start/end pairs:
+#   header:    magic, number of countries
+#   countries: code, offset and count of its IPv4 and IPv6 ranges
+#   data:      IPv4 ranges as 2 x 32 bit, IPv6 ranges as 4 x 64 bit (hi, lo)
+geoip_index_magic = b'VYOSGEO1'
+_geoip_header = struct.Struct('<8sI')
+_geoip_country = struct.Struct('<4sIIII')
+_geoip_range = {4: struct.Struct('<II'), 6: struct.Struct('<QQQQ')}
+
+def _merge_ranges(ranges):
+    out = []
+    for start, end in sorted(ranges):
+        if out and start <= out[-1][1] + 1:
+            if end > out[-1][1]:
+                out[-1][1] = end
+            continue
+        out.append([start, end])
+    return out
 
-    if not os.path.exists(geoip_database):
-        return []
+def geoip_build_index(database=geoip_database, index=geoip_index):
+    """ Convert the GeoIP CSV database to the per country binary index """
+    ranges = {}
+    with gzip.open(database, mode='rt') as csv_fh:
+        for start, end, code in csv.reader(csv_fh):
+            start = ip_address(start)
+            family = ranges.setdefault(code.lower(), {4: [], 6: []})[start.version]
+            family.append((int(start), int(ip_address(end))))
+
+    countries = []
+    data = []
+    offset = _geoip_header.size + _geoip_country.size * len(ranges)
+    for code in sorted(ranges):
+        entry = [code.encode()]
+        for version in [4, 6]:
+            merged = _merge_ranges(ranges[code][version])
+            if version == 4:
+                data.extend(_geoip_range[4].pack(s, e) for s, e in merged)
+            else:
+                data.extend(_geoip_range[6].pack(s >> 64, s & (2**64 - 1),
+                            e >> 64, e & (2**64 - 1)) for s, e in merged)
+            entry += [offset, len(merged)]
+            offset += _geoip_range[version].size * len(merged)
+        countries.append(_geoip_country.pack(*entry))
+
+    tmp = f'{index}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_geoip_header.pack(geoip_index_magic, len(countries)))
+        f.write(b''.join(countries))
+        f.write(b''.join(data))
+    os.replace(tmp, index)
+
+def _geoip_format_range(start, end):
+    return f'{start}-{end}' if start != end else str(start)
+
+def geoip_load_data(codes=[], index=geoip_index):
+    """
+    Return {code: {'ipv4': [...], 'ipv6': [...]}} with the address ranges of
+    the given country codes as nftables set elements, read from the index
+    """
+    if not os.path.exists(index) and os.path.exists(geoip_database):
+        # database downloaded before the index was introduced
+        try:
+            geoip_build_index(geoip_database, index)
+        except Exception as e:
+            print(f'Error: Failed to index GeoIP database\n{e}')
+            return {}
 
+    if not os.path.exists(index):
+        return {}
+
+    out = {}
     try:
-        with gzip.open(geoip_database, mode='rt') as csv_fh:
-            reader = csv.reader(csv_fh)
-            out = []
-            for start, end, code in reader:
-                if code.lower() in codes:
-                    out.append([start, end, code.lower()])
-            return out
-    except:
-        print('Error: Failed to open GeoIP database')
-    return []
+        with open(index, 'rb') as f:
+            magic, count = _geoip_header.unpack(f.read(_geoip_header.size))
+            if magic != geoip_index_magic:
+                raise ValueError('unknown index format')
+            directory = f.read(_geoip_country.size * count)
+            for code, v4_offset, v4_count, v6_offset, v6_count in _geoip_country.iter_unpack(directory):
+                code = code.rstrip(b'\0').decode()
+                if code not in codes:
+                    continue
+
+                f.seek(v4_offset)
+                ipv4 = [_geoip_format_range(IPv4Address(s), IPv4Address(e))
+                        for s, e in _geoip_range[4].iter_unpack(f.read(_geoip_range[4].size * v4_count))]
+                f.seek(v6_offset)
+                ipv6 = [_geoip_format_range(IPv6Address(sh << 64 | sl), IPv6Address(eh << 64 | el))
+                        for sh, sl, eh, el in _geoip_range[6].iter_unpack(f.read(_geoip_range[6].size * v6_count))]
+                out[code] = {'ipv4': ipv4, 'ipv6': ipv6}
+    except Exception as e:
+        print(f'Error: Failed to open GeoIP database\n{e}')
+        return {}
+    return out
 
 def geoip_download_data():
     url = 'https://download.db-ip.com/free/dbip-country-lite-{}.csv.gz'.format(strftime("%Y-%m"))
@@ -552,6 +1014,7 @@ def geoip_download_data():
             os.mkdir(dirname)
 
         download(geoip_database, url)
+        geoip_build_index(geoip_database, geoip_index)
         print("Downloaded GeoIP database")
         return True
     except:
@@ -611,17 +1074,15 @@ def geoip_update(firewall, force=False):
 
         geoip_data = geoip_load_data([*ipv4_codes, *ipv6_codes])
 
-        # Iterate IP blocks to assign to sets
-        for start, end, code in geoip_data:
-            ipv4 = is_ipv4(start)
-            if code in ipv4_codes and ipv4:
-                ip_range = f'{start}-{end}' if start != end else start
-                for setname in ipv4_codes[code]:
-                    ipv4_sets.setdefault(setname, []).append(ip_range)
-            if code in ipv6_codes and not ipv4:
-                ip_range = f'{start}-{end}' if start != end else start
-                for setname in ipv6_codes[code]:
-                    ipv6_sets.setdefault(setname, []).append(ip_range)
+        # Assign the IP blocks of each country to its sets
+        for codes, family, sets in [(ipv4_codes, 'ipv4', ipv4_sets),
+                                    (ipv6_codes, 'ipv6', ipv6_sets)]:
+            for code, setnames in codes.items():
+                ranges = geoip_data.get(code, {}).get(family)
+                if not ranges:
+                    continue
+                for setname in setnames:
+                    sets.setdefault(setname, []).extend(ranges)
 
         render(nftables_geoip_conf, 'firewall/nftables-geoip-update.j2', {
             'ipv4_sets': ipv4_sets,
@@ -63,11 +63,28 @@ Apply the new configuration:
 >>>     print(e)
 >>>     exit(1)
 ```
+
+Gather the changes of several scripts and apply them at once:
+```
+>>> transaction.begin(commit_id)
+>>> ... FRRConfig load_configuration()/commit_configuration() calls ...
+>>> changed_daemons = transaction.commit()
+```
+
+Skip the daemons whose section did not change since the last commit:
+```
+>>> if not section_unchanged('bgpd', 'router bgp', new_bgp_section):
+>>>     ... load/modify/commit_configuration('bgpd', {'router bgp': new_bgp_section})
+```
 """
 
+import codecs
+import hashlib
+import json
 import tempfile
 import re
 from vyos import util
+from vyos import vty
 from vyos.util import chown
 from vyos.util import cmd
 import logging
@@ -75,6 +92,11 @@ from logging.handlers import SysLogHandler
 import os
 import sys
 
+from ipaddress import ip_network
+from subprocess import DEVNULL
+from subprocess import PIPE
+from subprocess import Popen
+
 LOG = logging.getLogger(__name__)
 DEBUG = False
 
@@ -90,6 +112,8 @@ _frr_daemons = ['zebra', 'bgpd', 'fabricd', 'isisd', 'ospf6d', 'ospfd', 'pbrd',
 path_vtysh = '/usr/bin/vtysh'
 path_frr_reload = '/usr/lib/frr/frr-reload.py'
 path_config = '/run/frr'
+path_transaction = '/run/frr/vyos-transaction.json'
+path_fingerprints = '/run/frr/vyos-fingerprints.json'
 
 default_add_before = r'(ip prefix-list .*|route-map .*|line vty|end)'
 
@@ -128,6 +152,21 @@ def init_debugging():
     if DEBUG:
         LOG.setLevel(logging.DEBUG)
 
+def _vty_execute(daemon, command):
+    """ Output of command run by daemon over its vty socket, None if the
+    socket cannot be used and vtysh has to run the command """
+    if not vty.available(daemon):
+        return None
+    try:
+        return vty.execute(daemon, command).replace('\r', '')
+    except vty.VtyError as e:
+        raise OSError(e.status, e.output)
+    except OSError as e:
+        # the stale socket of a crashed daemon, or a user without access to
+        # the socket: vtysh reports these like before
+        LOG.debug(f'vty connection to {daemon} failed, using vtysh: {e}')
+        return None
+
 def get_configuration(daemon=None, marked=False):
     """ Get current running FRR configuration
     daemon:  Collect only configuration for the specified FRR daemon,
@@ -140,17 +179,30 @@ def get_configuration(daemon=None, marked=False):
     if daemon and daemon not in _frr_daemons:
         raise ValueError(f'The specified daemon type is not supported {repr(daemon)}')
 
-    cmd = f"{path_vtysh} -c 'show run'"
-    if daemon:
-        cmd += f' -d {daemon}'
+    config = _vty_execute(daemon, 'show running-config') if daemon else None
+    if config is not None:
+        # Remove the header lines from FRR config, if any, and terminate it
+        # like vtysh does
+        lines = config.split('\n')
+        if 'Current configuration:' in lines[:4]:
+            lines = lines[lines.index('Current configuration:') + 1:]
+        while lines and not lines[-1].strip():
+            lines.pop()
+        if not lines or lines[-1] != 'end':
+            lines.append('end')
+        config = '\n'.join(lines)
+    else:
+        cmd = f"{path_vtysh} -c 'show run'"
+        if daemon:
+            cmd += f' -d {daemon}'
 
-    output, code = util.popen(cmd, stderr=util.STDOUT)
-    if code:
-        raise OSError(code, output)
+        output, code = util.popen(cmd, stderr=util.STDOUT)
+        if code:
+            raise OSError(code, output)
 
-    config = output.replace('\r', '')
-    # Remove first header lines from FRR config
-    config = config.split("\n", 3)[-1]
+        config = output.replace('\r', '')
+        # Remove first header lines from FRR config
+        config = config.split("\n", 3)[-1]
     # Mark the configuration with end tags
     if marked:
         config = mark_configuration(config)
@@ -166,6 +218,8 @@ def mark_configuration(config):
     config:  The configuration string to mark/test
     return:  The marked configuration from FRR
     """
+    # Marking is done by the configuration parser of vtysh itself, not by the
+    # daemons, this still runs vtysh
     output, code = util.popen(f"{path_vtysh} -m -f -", stderr=util.STDOUT, input=config)
 
     if code == 2:
@@ -208,8 +262,9 @@ def reload_configuration(config, daemon=None):
     LOG.debug(f'reload_configuration: Executing command against frr-reload: "{cmd}"')
     output, code = util.popen(cmd, stderr=util.STDOUT)
     f.close()
-    for i, e in enumerate(output.split('\n')):
-        LOG.debug(f'frr-reload output: {i:3} {e}')
+    if DEBUG:
+        for i, e in enumerate(output.split('\n')):
+            LOG.debug(f'frr-reload output: {i:3} {e}')
     if code == 1:
         raise CommitError('FRR configuration failed while running commit. Please ' \
                           'enable debugging to examine logs.\n\n\n' \
@@ -221,6 +276,27 @@ def reload_configuration(config, daemon=None):
     return output
 
 
+def reload_configuration_retry(config, daemon=None, count_max=5):
+    """ reload_configuration() retried count_max times, see the FRR issues below
+    return:  None
+    """
+    # https://github.com/FRRouting/frr/issues/10132
+    # https://github.com/FRRouting/frr/issues/10133
+    count = 0
+    while count < count_max:
+        count += 1
+        try:
+            reload_configuration(config, daemon=daemon)
+            break
+        except:
+            # we just need to re-try the commit of the configuration
+            # for the listed FRR issues above
+            LOG.debug(f'reload_configuration_retry: attempt {count} failed')
+            pass
+    if count >= count_max:
+        raise ConfigurationNotValid(f'Config commit retry counter ({count_max}) exceeded')
+
+
 def save_configuration():
     """ T3217: Save FRR configuration to /run/frr/config/frr.conf """
     return cmd(f'{path_vtysh} -n -w')
@@ -233,6 +309,13 @@ def execute(command):
     if not isinstance(command, str):
         raise ValueError(f'command needs to be a string: {repr(command)}')
 
+    # commands answered by a single daemon are sent to its vty socket, over
+    # a connection kept open for the next commands
+    daemon = vty.command_daemon(command)
+    output = _vty_execute(daemon, command.strip()) if daemon else None
+    if output is not None:
+        return output.strip()
+
     cmd = f"{path_vtysh} -c '{command}'"
 
     output, code = util.popen(cmd, stderr=util.STDOUT)
@@ -277,6 +360,158 @@ def configure(lines, daemon=False):
     return config
 
 
+def execute_stream(command):
+    """ Run a command inside vtysh, like execute(), and yield its output as it
+    is read, in str chunks
+    command:  str containing the command to execute
+    """
+    daemon = vty.command_daemon(command)
+    if daemon and vty.available(daemon):
+        started = False
+        try:
+            for chunk in vty.stream(daemon, command.strip()):
+                started = True
+                yield chunk
+            return
+        except vty.VtyError as e:
+            raise OSError(e.status, e.output)
+        except OSError as e:
+            # output already passed on cannot be taken back
+            if started:
+                raise
+            LOG.debug(f'vty connection to {daemon} failed, using vtysh: {e}')
+
+    process = Popen([path_vtysh, '-c', command], stdout=PIPE, stderr=DEVNULL)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    try:
+        for chunk in iter(lambda: process.stdout.read1(65536), b''):
+            yield decoder.decode(chunk)
+    except BaseException:
+        # the consumer stopped early, do not wait for the whole output
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode:
+        raise OSError(process.returncode, f'"{command}" failed')
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+class _JSONStream:
+    """ Incremental reader of a JSON document from str chunks, decoding the
+    values it is asked for one at a time """
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = ''
+        self._pos = 0
+
+    def _fill(self):
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self, eof=False):
+        """ Next character which is not white space, None at the end of the
+        document if eof is allowed """
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos].isspace():
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                if eof:
+                    return None
+                raise ValueError('Unexpected end of the JSON document')
+
+    def next(self):
+        char = self.peek()
+        self._pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, self._pos = self._decoder.raw_decode(self._buffer, self._pos)
+                return value
+            except json.JSONDecodeError:
+                # the value continues in the next chunk
+                if not self._fill():
+                    raise
+
+
+def _routes(stream):
+    if stream.next() != '{':
+        raise ValueError('Route table is not a JSON object')
+    if stream.peek() == '}':
+        stream.next()
+        return
+    while True:
+        stream.value()
+        if stream.next() != ':':
+            raise ValueError('Malformed route table')
+        if stream.peek() == '[':
+            stream.next()
+            if stream.peek() == ']':
+                stream.next()
+            else:
+                while True:
+                    yield stream.value()
+                    char = stream.next()
+                    if char == ']':
+                        break
+                    elif char != ',':
+                        raise ValueError('Malformed route table')
+        else:
+            # the route table of a VRF
+            yield from _routes(stream)
+        char = stream.next()
+        if char == '}':
+            return
+        elif char != ',':
+            raise ValueError('Malformed route table')
+
+
+def parse_routes(chunks):
+    """ Routes of the JSON output of "show ip[v6] route [vrf all] json", as
+    read in str chunks, yielded one at a time: only one route is decoded at
+    once whatever the size of the table
+    """
+    stream = _JSONStream(chunks)
+    if stream.peek(eof=True) is None:
+        return
+    yield from _routes(stream)
+
+
+def route_filter(prefix=None, protocol=None, nexthop=None):
+    """ Function matching the routes of parse_routes() within prefix, of
+    protocol and with a next hop address or interface nexthop """
+    network = ip_network(prefix, strict=False) if prefix else None
+
+    def match(route):
+        if protocol and route.get('protocol') != protocol:
+            return False
+        if nexthop and not any(nexthop in [hop.get('ip'), hop.get('interfaceName')]
+                               for hop in route.get('nexthops', [])):
+            return False
+        if network:
+            try:
+                return ip_network(route['prefix']).subnet_of(network)
+            except (KeyError, ValueError, TypeError):
+                return False
+        return True
+
+    return match
+
+
 def _replace_section(config, replacement, replace_re, before_re):
     r"""Replace a section of FRR config
     config:      full original configuration
@@ -345,26 +580,24 @@ def _find_first_block(config, start_pattern, stop_pattern, start_at=0):
     On a successful match it continues the search for the regex <stop_pattern> until it is found.
     After a successful run a set is returned containing the start and stop line numbers.
     '''
-    LOG.debug(f'_find_first_block: find start={repr(start_pattern)} stop={repr(stop_pattern)} start_at={start_at}')
-    _start = None
-    for i, element in enumerate(config[start_at:], start=start_at):
-        # LOG.debug(f'_find_first_block: running line {i:3} "{element}"')
-        if not _start:
-            if not re.match(start_pattern, element):
-                LOG.debug(f'_find_first_block: no match     {i:3} "{element}"')
-                continue
-            _start = i
-            LOG.debug(f'_find_first_block: Found start  {i:3} "{element}"')
-            continue
-
-        if not re.match(stop_pattern, element):
-            LOG.debug(f'_find_first_block: no match     {i:3} "{element}"')
+    if DEBUG:
+        LOG.debug(f'_find_first_block: find start={repr(start_pattern)} stop={repr(stop_pattern)} start_at={start_at}')
+    start_match = re.compile(start_pattern).match
+    stop_match = re.compile(stop_pattern).match
+    for i in range(start_at, len(config)):
+        if not start_match(config[i]):
             continue
+        if DEBUG:
+            LOG.debug(f'_find_first_block: Found start  {i:3} "{config[i]}"')
+        for j in range(i + 1, len(config)):
+            if stop_match(config[j]):
+                if DEBUG:
+                    LOG.debug(f'_find_first_block: Found stop   {j:3} "{config[j]}"')
+                return (i, j)
+        break
 
-        LOG.debug(f'_find_first_block: Found stop   {i:3} "{element}"')
-        return (_start, i)
-
-    LOG.debug('_find_first_block: exit start={repr(start_pattern)} stop={repr(stop_pattern)} start_at={start_at}')
+    if DEBUG:
+        LOG.debug(f'_find_first_block: exit start={repr(start_pattern)} stop={repr(stop_pattern)} start_at={start_at}')
     return None
 
 
@@ -379,13 +612,16 @@ def _find_first_element(config, pattern, start_at=0):
     TODO: for now it returns -1 on a no-match because 0 also returns as False
     TODO: that means that we can not use False matching to tell if its
     '''
-    LOG.debug(f'_find_first_element: find start="{pattern}" start_at={start_at}')
-    for i, element in enumerate(config[start_at:], start=0):
-        if re.match(pattern + '$', element):
-            LOG.debug(f'_find_first_element: Found stop {i:3} "{element}"')
-            return i
-        LOG.debug(f'_find_first_element: no match   {i:3} "{element}"')
-    LOG.debug(f'_find_first_element: Did not find any match, exiting')
+    if DEBUG:
+        LOG.debug(f'_find_first_element: find start="{pattern}" start_at={start_at}')
+    match = re.compile(pattern + '$').match
+    for i in range(start_at, len(config)):
+        if match(config[i]):
+            if DEBUG:
+                LOG.debug(f'_find_first_element: Found stop {i:3} "{config[i]}"')
+            return i - start_at
+    if DEBUG:
+        LOG.debug(f'_find_first_element: Did not find any match, exiting')
     return -1
 
 
@@ -396,9 +632,9 @@ def _find_elements(config, pattern, start_at=0):
     start_at:      (int) The index to start searching at in the <config>
 
     return:    A list of line indexes containing the searched pattern
-    TODO: refactor this to return a generator instead
     '''
-    return [i for i, element in enumerate(config[start_at:], start=0) if re.match(pattern + '$', element)]
+    match = re.compile(pattern + '$').match
+    return [i - start_at for i in range(start_at, len(config)) if match(config[i])]
 
 
 class FRRConfig:
@@ -407,6 +643,10 @@ class FRRConfig:
     '''
     def __init__(self, config=[]):
         self.imported_config = ''
+        # parsed configuration, replacing the list of lines while contexts
+        # are modified, see modify_section()
+        self._tree = None
+        self._lines = []
 
         if isinstance(config, list):
             self.config = config.copy()
@@ -418,11 +658,32 @@ class FRRConfig:
             raise ValueError(
                 'The config element needs to be a string or list type object')
 
-        if config:
+        if config and DEBUG:
             LOG.debug(f'__init__: frr library initiated with initial config')
             for i, e in enumerate(self.config):
                 LOG.debug(f'__init__: initial              {i:3} {e}')
 
+    @property
+    def config(self):
+        '''The configuration as a list of lines'''
+        if self._tree is not None:
+            # the lines may be edited in place from here on
+            self._lines = self._tree.render()
+            self._tree = None
+        return self._lines
+
+    @config.setter
+    def config(self, config):
+        self._lines = config
+        self._tree = None
+
+    def _parsed(self):
+        '''The configuration as a tree of FRRSection, to be edited in place'''
+        if self._tree is None:
+            self._tree = parse_configuration(self._lines, top_level=True)
+            self._lines = None
+        return self._tree
+
     def load_configuration(self, daemon=None):
         '''Load the running configuration from FRR into the config object
         daemon: str with name of the FRR Daemon to load configuration from or
@@ -432,7 +693,15 @@ class FRRConfig:
         '''
         init_debugging()
 
-        self.imported_config = get_configuration(daemon=daemon)
+        # continue with the configuration left by the previous scripts
+        pending = transaction.load(daemon) if transaction.active() else None
+        if pending is not None:
+            LOG.debug(f'load_configuration: Configuration of {daemon} taken from the active transaction')
+            self.imported_config = pending
+        else:
+            self.imported_config = get_configuration(daemon=daemon)
+            if transaction.active():
+                transaction.store(daemon, self.imported_config.split('\n'), original=True)
         if daemon:
             LOG.debug(f'load_configuration: Configuration loaded from FRR daemon {daemon}')
         else:
@@ -441,8 +710,9 @@ class FRRConfig:
         self.original_config = self.imported_config.split('\n')
         self.config = self.original_config.copy()
 
-        for i, e in enumerate(self.imported_config.split('\n')):
-            LOG.debug(f'load_configuration:  loaded    {i:3} {e}')
+        if DEBUG:
+            for i, e in enumerate(self.original_config):
+                LOG.debug(f'load_configuration:  loaded    {i:3} {e}')
         return
 
     def test_configuration(self):
@@ -452,74 +722,115 @@ class FRRConfig:
         LOG.debug('test_configation: Testing configuration')
         mark_configuration('\n'.join(self.config))
 
-    def commit_configuration(self, daemon=None):
+    def commit_configuration(self, daemon=None, sections={}):
         '''
         Commit the current configuration to FRR daemon: str with name of the
         FRR daemon to commit to or None to use the consolidated config.
 
+        sections: dict of the rendered configuration of the sections this
+        commit manages by context, e.g. {'router bgp vrf red': '...'},
+        fingerprinted once applied, see section_unchanged()
+
         Configuration is automatically saved after apply
         '''
         LOG.debug('commit_configuration:  Commiting configuration')
-        for i, e in enumerate(self.config):
-            LOG.debug(f'commit_configuration: new_config {i:3} {e}')
-
-        # https://github.com/FRRouting/frr/issues/10132
-        # https://github.com/FRRouting/frr/issues/10133
-        count = 0
-        count_max = 5
-        while count < count_max:
-            count += 1
-            try:
-                reload_configuration('\n'.join(self.config), daemon=daemon)
-                break
-            except:
-                # we just need to re-try the commit of the configuration
-                # for the listed FRR issues above
-                pass
-        if count >= count_max:
-            raise ConfigurationNotValid(f'Config commit retry counter ({count_max}) exceeded')
+        if DEBUG:
+            for i, e in enumerate(self.config):
+                LOG.debug(f'commit_configuration: new_config {i:3} {e}')
+
+        if transaction.active():
+            # the reload comes at the end of the commit, a syntax error still
+            # fails the script which made it
+            mark_configuration('\n'.join(self.config))
+            LOG.debug('commit_configuration:  Deferred to the active transaction')
+            transaction.store(daemon, self.config, sections=sections)
+            return
+
+        try:
+            reload_configuration_retry('\n'.join(self.config), daemon=daemon)
+        except:
+            fingerprints.discard(daemon)
+            raise
 
         # Save configuration to /run/frr/config/frr.conf
         save_configuration()
+        fingerprints.update(daemon, {context: fingerprint(rendered)
+                                     for context, rendered in sections.items()}, replace=True)
 
 
     def modify_section(self, start_pattern, replacement='!', stop_pattern=r'\S+', remove_stop_mark=False, count=0):
+        '''Replace the blocks starting with a line matching start_pattern and ending
+        before (or with, if remove_stop_mark is set) the next line matching
+        stop_pattern, at most count blocks if count is set.
+
+        The top level contexts closed by an exit line, e.g. '^router ospf'
+        with stop_pattern '^exit' and remove_stop_mark, are looked up and
+        replaced in the parsed configuration, by their header only. Other
+        blocks are searched line by line, the configuration is rebuilt in a
+        single pass whatever the number of blocks replaced.
+
+        return: number of blocks replaced
+        '''
         if isinstance(replacement, str):
             replacement = replacement.split('\n')
         elif not isinstance(replacement, list):
             return ValueError("The replacement element needs to be a string or list type object")
-        LOG.debug(f'modify_section: starting search for {repr(start_pattern)} until {repr(stop_pattern)}')
-
+        if DEBUG:
+            LOG.debug(f'modify_section: starting search for {repr(start_pattern)} until {repr(stop_pattern)}')
+
+        if (start_pattern.startswith('^') and stop_pattern == '^exit' and
+                remove_stop_mark and not count):
+            tree = self._parsed()
+            _count = 0
+            for key in tree.find(start_pattern):
+                if DEBUG:
+                    LOG.debug(f'modify_section:   found context "{key}"')
+                _count += tree.remove(key, replacement)
+            return _count
+
+        # While searching, always assume that the user wants to search for the exact pattern he entered
+        # To be more specific the user needs a override, eg. a "pattern.*"
+        start_match = re.compile(start_pattern + '$').match
+        stop_match = re.compile(stop_pattern).match
+
+        config = self.config
+        out = []
         _count = 0
-        _next_start = 0
-        while True:
+        i = 0
+        while i < len(config):
             if count and count <= _count:
                 # Break out of the loop after specified amount of matches
-                LOG.debug(f'modify_section: reached limit ({_count}), exiting loop at line {_next_start}')
+                if DEBUG:
+                    LOG.debug(f'modify_section: reached limit ({_count}), exiting loop at line {i}')
                 break
-            # While searching, always assume that the user wants to search for the exact pattern he entered
-            # To be more specific the user needs a override, eg. a "pattern.*"
-            _w = _find_first_block(
-                self.config, start_pattern+'$', stop_pattern, start_at=_next_start)
-            if not _w:
-                # Reached the end, no more elements to remove
-                LOG.debug(f'modify_section: No more config sections found, exiting')
+            if not start_match(config[i]):
+                out.append(config[i])
+                i += 1
+                continue
+
+            stop = i + 1
+            while stop < len(config) and not stop_match(config[stop]):
+                stop += 1
+            if stop == len(config):
+                # no complete block from here on
                 break
-            start_element, end_element = _w
-            LOG.debug(f'modify_section:   found match between {start_element} and {end_element}')
-            for i, e in enumerate(self.config[start_element:end_element+1 if remove_stop_mark else end_element],
-                                  start=start_element):
-                LOG.debug(f'modify_section:   remove       {i:3} {e}')
-            del self.config[start_element:end_element +
-                            1 if remove_stop_mark else end_element]
-            if replacement:
-                # Append the replacement config at the current position
-                for i, e in enumerate(replacement, start=start_element):
-                    LOG.debug(f'modify_section:   add          {i:3} {e}')
-                self.config[start_element:start_element] = replacement
+
+            end = stop + 1 if remove_stop_mark else stop
+            if DEBUG:
+                LOG.debug(f'modify_section:   found match between {i} and {stop}')
+                for j, e in enumerate(config[i:end], start=i):
+                    LOG.debug(f'modify_section:   remove       {j:3} {e}')
+                for j, e in enumerate(replacement, start=len(out)):
+                    LOG.debug(f'modify_section:   add          {j:3} {e}')
+            # Append the replacement config at the current position
+            out.extend(replacement)
             _count += 1
-            _next_start = start_element + len(replacement)
+            i = end
 
+        if DEBUG and i == len(config):
+            LOG.debug(f'modify_section: No more config sections found, exiting')
+        out.extend(config[i:])
+        self.config = out
         return _count
 
     def add_before(self, before_pattern, addition):
@@ -532,8 +843,9 @@ class FRRConfig:
         start = _find_first_element(self.config, before_pattern)
         if start < 0:
             return False
-        for i, e in enumerate(addition, start=start):
-            LOG.debug(f'add_before:   add          {i:3} {e}')
+        if DEBUG:
+            for i, e in enumerate(addition, start=start):
+                LOG.debug(f'add_before:   add          {i:3} {e}')
         self.config[start:start] = addition
         return True
 
@@ -542,3 +854,417 @@ class FRRConfig:
 
     def __repr__(self):
         return f'frr({repr(str(self))})'
+
+
+_exit_match = re.compile(r'exit(-\S+)?$').match
+
+
+class FRRSection:
+    '''Context of a parsed FRR configuration (see parse_configuration())
+    header: the line opening the context, None for the whole configuration
+    lines:  the lines (str) and sub contexts (FRRSection) of the context, in order
+    end:    the line closing the context (exit, exit-address-family, ...), if any
+
+    The sub contexts are indexed by their header without indentation, e.g.
+    'router bgp 65000 vrf red' or 'route-map FOO permit 10': looking up,
+    replacing or removing a context does not depend on the size of the
+    configuration.
+    '''
+    __slots__ = ('header', 'lines', 'end', 'index', 'removed')
+
+    def __init__(self, header=None):
+        self.header = header
+        self.lines = []
+        self.end = None
+        self.index = {}
+        self.removed = False
+
+    @property
+    def key(self):
+        return self.header.strip() if self.header is not None else None
+
+    def append(self, item):
+        self.lines.append(item)
+        if isinstance(item, FRRSection):
+            self.index.setdefault(item.key, []).append(item)
+
+    def get(self, *keys):
+        '''The sub context at the path of headers keys, None if there is none'''
+        section = self
+        for key in keys:
+            found = section.index.get(key)
+            if not found:
+                return None
+            section = found[0]
+        return section
+
+    def keys(self):
+        '''Headers of the sub contexts, in order of first appearance'''
+        return list(self.index)
+
+    def find(self, pattern):
+        '''Headers of the sub contexts matching the regex pattern'''
+        match = re.compile(pattern + '$').match
+        return [key for key in self.index if match(key)]
+
+    def remove(self, key, replacement=None):
+        '''Remove the sub contexts with header key, or replace each of them by
+        the lines replacement. Returns the number of contexts removed.'''
+        found = self.index.pop(key, None)
+        if not found:
+            return 0
+        for section in found:
+            if replacement is None:
+                # left in lines until the next render, which skips it
+                section.removed = True
+            else:
+                # rendered as the bare lines of the replacement
+                section.header, section.lines, section.end, section.index = \
+                    None, list(replacement), None, {}
+        return len(found)
+
+    def replace(self, section, before_pattern=None):
+        '''Replace the sub context with the header of section by it, or insert it
+        before the first line matching before_pattern (at the end if there is
+        none) if the context does not exist yet. Returns True if it existed.
+        '''
+        found = self.index.get(section.key)
+        if found:
+            existing = found[0]
+            existing.header, existing.lines, existing.end, existing.index = \
+                section.header, section.lines, section.end, section.index
+            for duplicate in found[1:]:
+                duplicate.removed = True
+            del found[1:]
+            return True
+
+        self.index[section.key] = [section]
+        if before_pattern:
+            match = re.compile(before_pattern + '$').match
+            for i, item in enumerate(self.lines):
+                line = item.header if isinstance(item, FRRSection) else item
+                if not getattr(item, 'removed', False) and match(line):
+                    self.lines.insert(i, section)
+                    return False
+        self.lines.append(section)
+        return False
+
+    def render(self, out=None):
+        '''Lines of the context, appended to out if given'''
+        if out is None:
+            out = []
+        if self.removed:
+            return out
+        if self.header is not None:
+            out.append(self.header)
+        for item in self.lines:
+            if isinstance(item, FRRSection):
+                item.render(out)
+            else:
+                out.append(item)
+        if self.end is not None:
+            out.append(self.end)
+        return out
+
+    def __str__(self):
+        return '\n'.join(self.render())
+
+    def __repr__(self):
+        return f'FRRSection({repr(self.key)})'
+
+
+def _parse_top_level(lines):
+    root = FRRSection()
+    section = None
+    for i, line in enumerate(lines):
+        if section is not None:
+            if not line or line[0] == ' ':
+                section.lines.append(line)
+                continue
+            if _exit_match(line):
+                section.end = line
+                section = None
+                continue
+            section = None
+
+        following = lines[i + 1] if i + 1 < len(lines) else ''
+        if (line and line[0] != '!' and not _exit_match(line) and
+                (following[:1] == ' ' or _exit_match(following))):
+            section = FRRSection(line)
+            root.append(section)
+        else:
+            root.append(line)
+    return root
+
+
+def parse_configuration(config, top_level=False):
+    '''Parse an FRR configuration (str or list of lines) into a tree of FRRSection
+    A line is the header of a context if the next line is more indented, or
+    is an exit line of the same indentation. The context holds all following
+    more indented lines and ends with them or with an exit line of the
+    indentation of its header.
+
+    top_level: only parse the top level contexts, their lines are kept as
+               they are
+
+    return:  FRRSection of the whole configuration
+    '''
+    lines = config.split('\n') if isinstance(config, str) else config
+    if top_level:
+        return _parse_top_level(lines)
+
+    root = FRRSection()
+    # open contexts and the indentation of their header
+    stack = [(root, -1)]
+    for i, line in enumerate(lines):
+        stripped = line.lstrip(' ')
+        indent = len(line) - len(stripped)
+
+        closed = False
+        while stripped and indent <= stack[-1][1]:
+            section, level = stack.pop()
+            if indent == level and _exit_match(stripped):
+                section.end = line
+                closed = True
+                break
+        if closed:
+            continue
+
+        parent = stack[-1][0]
+        if (i + 1 < len(lines) and stripped and not stripped.startswith('!') and
+                not _exit_match(stripped)):
+            following = lines[i + 1]
+            following_indent = len(following) - len(following.lstrip(' '))
+            # an empty context is closed right away, e.g. 'interface eth0'
+            if following.strip() and (following_indent > indent or (
+                    following_indent == indent and _exit_match(following.lstrip(' ')))):
+                section = FRRSection(line)
+                parent.append(section)
+                stack.append((section, indent))
+                continue
+        parent.append(line)
+
+    return root
+
+
+class FRRTransaction:
+    '''Commit scoped FRR configuration changes
+    While a transaction is active, FRRConfig.commit_configuration() stores the
+    configuration of the daemon in the transaction instead of reloading it, and
+    FRRConfig.load_configuration() continues with the stored configuration: the
+    scripts of a commit edit the sections of the daemons one after the other.
+    commit() then runs frr-reload once for every daemon whose configuration
+    changed, and saves the configuration once.
+
+    The state is kept in a file, tagged with the id of the commit which began
+    the transaction. It is only active in the process which began it, for the
+    scripts vyos-configd runs for that commit: any other process calling
+    FRRConfig meanwhile applies its configuration right away. The scripts are
+    named by setting source, to report which ones changed a daemon whose
+    reload failed.
+    '''
+    def __init__(self, fname=path_transaction):
+        self.fname = fname
+        self.source = None
+        self._commit = None
+
+    def _read(self):
+        try:
+            with open(self.fname) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, state):
+        tmp = f'{self.fname}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.fname)
+
+    def begin(self, commit):
+        '''Start the transaction of commit (id) in the current process, dropping
+        any previous one'''
+        self._commit = str(commit)
+        self._write({'commit': self._commit, 'daemons': {}})
+
+    def active(self):
+        if self._commit is None:
+            return False
+        state = self._read()
+        return bool(state) and state.get('commit') == self._commit
+
+    def load(self, daemon):
+        '''The pending configuration of daemon, None if no script edited it yet'''
+        state = self._read() or {'daemons': {}}
+        entry = state['daemons'].get(daemon or 'integrated')
+        return entry['config'] if entry else None
+
+    def store(self, daemon, config, original=False, sections={}):
+        '''Store config (list of lines) as the pending configuration of daemon,
+        and as its running configuration if original is set. The fingerprints
+        of sections are stored once the transaction is committed.'''
+        state = self._read()
+        key = daemon or 'integrated'
+        entry = state['daemons'].setdefault(key, {})
+        config = '\n'.join(config)
+        if original:
+            entry['original'] = config
+        entry['config'] = config
+        entry.setdefault('sections', {}).update(
+            {context: fingerprint(rendered) for context, rendered in sections.items()})
+        if not original and self.source and self.source not in entry.setdefault('sources', []):
+            entry['sources'].append(self.source)
+        self._write(state)
+
+    def pending(self, daemon):
+        '''True if a script of the transaction changed the configuration of daemon'''
+        state = self._read() or {'daemons': {}}
+        entry = state['daemons'].get(daemon or 'integrated')
+        return bool(entry) and entry['config'] != entry.get('original')
+
+    def changed(self):
+        '''Daemons whose configuration was changed, in order of first edit'''
+        state = self._read() or {'daemons': {}}
+        return [daemon for daemon, entry in state['daemons'].items()
+                if entry['config'] != entry.get('original')]
+
+    def discard(self):
+        try:
+            os.unlink(self.fname)
+        except FileNotFoundError:
+            pass
+
+    def commit(self):
+        '''Apply and save the changed configurations, ending the transaction.
+        A daemon failing to reload does not keep the others from being applied,
+        CommitError then names every failed daemon with the scripts which
+        changed it.
+        return:  list of the daemons whose configuration changed
+        '''
+        state = self._read()
+        self.discard()
+        if not state:
+            return []
+
+        changed = []
+        failed = []
+        for daemon, entry in state['daemons'].items():
+            if entry['config'] == entry.get('original'):
+                continue
+            LOG.debug(f'FRRTransaction.commit: Reloading {daemon}')
+            try:
+                reload_configuration_retry(entry['config'],
+                                           daemon=None if daemon == 'integrated' else daemon)
+            except Exception as e:
+                sources = ', '.join(entry.get('sources', [])) or 'unknown'
+                failed.append(f'{daemon} (changed by {sources}): {e}')
+                # which sections made it into FRR is unknown
+                fingerprints.discard(None if daemon == 'integrated' else daemon)
+                continue
+            changed.append(daemon)
+
+        if changed:
+            # Save configuration to /run/frr/config/frr.conf
+            save_configuration()
+
+        for daemon, entry in state['daemons'].items():
+            if daemon in changed or entry['config'] == entry.get('original'):
+                fingerprints.update(None if daemon == 'integrated' else daemon,
+                                    entry.get('sections', {}), replace=daemon in changed)
+
+        if failed:
+            raise CommitError('Failed to apply the FRR configuration of '
+                              + '\n'.join(failed))
+        return changed
+
+
+transaction = FRRTransaction()
+
+
+def fingerprint(config):
+    '''Fingerprint of the rendered configuration config (str)'''
+    return hashlib.sha256(config.encode()).hexdigest()
+
+
+class FRRFingerprints:
+    '''Fingerprints of the sections applied to the FRR daemons
+    Every commit stores the fingerprint of the rendered sections it applied, by
+    daemon and context (e.g. 'router bgp vrf red'), together with the PID of
+    the daemon. A section is unchanged if its new render has the same
+    fingerprint, no other section of the daemon was applied since, and the
+    daemon was not restarted: its running configuration is still the one
+    committed, the scripts can skip loading, modifying and reloading it.
+    '''
+    def __init__(self, fname=path_fingerprints):
+        self.fname = fname
+
+    def _read(self):
+        try:
+            with open(self.fname) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, state):
+        tmp = f'{self.fname}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.fname)
+
+    def _pid(self, daemon):
+        try:
+            with open(f'{path_config}/{daemon}.pid') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def unchanged(self, daemon, context, config):
+        if not daemon:
+            return False
+        entry = self._read().get(daemon)
+        if not entry or entry['pid'] != self._pid(daemon):
+            return False
+        return entry['sections'].get(context) == fingerprint(config)
+
+    def update(self, daemon, sections, replace=False):
+        '''Store the fingerprints of sections ({context: fingerprint}) applied
+        to daemon. With replace, the daemon was reloaded and the fingerprints
+        of its other sections are dropped, as the reload may have changed them.'''
+        state = self._read()
+        pid = self._pid(daemon) if daemon else None
+        entry = state.get(daemon)
+        if not pid or not sections:
+            if replace and entry:
+                del state[daemon]
+                self._write(state)
+            return
+        if replace or not entry or entry['pid'] != pid:
+            entry = state[daemon] = {'pid': pid, 'sections': {}}
+        entry['sections'].update(sections)
+        self._write(state)
+
+    def discard(self, daemon=None):
+        '''Drop the fingerprints of daemon, of all daemons if None'''
+        state = self._read()
+        if daemon is None:
+            state = {}
+        else:
+            state.pop(daemon, None)
+        self._write(state)
+
+
+fingerprints = FRRFingerprints()
+
+
+def section_unchanged(daemon, context, config):
+    '''True if config (str) is the rendered configuration of context last
+    committed to daemon, and the daemon still runs it: the commit of the
+    section can be skipped. Always False while a script of the active
+    transaction has pending changes to the daemon.
+    '''
+    if transaction.active() and transaction.pending(daemon):
+        return False
+    unchanged = fingerprints.unchanged(daemon, context, config)
+    if unchanged:
+        LOG.debug(f'section_unchanged: {context} of {daemon} unchanged, skipping')
+    return unchanged
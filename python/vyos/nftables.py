@@ -0,0 +1,169 @@
+# Copyright 2022 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# Rule counters of the nftables ruleset for op-mode commands.
+#
+# The ruleset is read with a single nft call and the counters of the rules
+# are indexed by table ('ip vyos_filter'), chain and rule comment, which
+# the VyOS templates set to identify the rule of the configuration.
+
+import json
+import os
+import re
+import stat
+import tempfile
+import time
+
+from vyos.util import cmd
+
+# snapshots of the counters, per user as op-mode commands run with and
+# without sudo; root keeps them out of the world writable temp directory
+if os.geteuid() == 0:
+    snapshot_dir = '/run/vyos-nft-counters'
+else:
+    snapshot_dir = os.path.join(tempfile.gettempdir(), f'vyos-nft-counters-{os.geteuid()}')
+
+def get_ruleset(table=None):
+    """
+    JSON objects of the ruleset, or of a single table ('ip vyos_filter').
+    Set elements are left out, they are of no use for counters.
+    """
+    command = f'sudo nft --json --terse list table {table}' if table else \
+              'sudo nft --json --terse list ruleset'
+    return json.loads(cmd(command))['nftables']
+
+def get_rules_text(table):
+    """
+    Statements of the rules of table as listed by nft, keyed by chain and
+    comment, without their counter and comment
+    """
+    out = {}
+    chain = None
+    for line in cmd(f'sudo nft --terse list table {table}').split('\n'):
+        line = line.strip()
+        if line.startswith('chain ') and line.endswith('{'):
+            chain = line.split()[1]
+            continue
+        comment = re.search(r'comment "([^"]*)"', line)
+        if chain and comment:
+            text = re.sub(r'(\bcounter packets \d+ bytes \d+\b|comment "[^"]*")', '', line)
+            out[(chain, comment[1])] = ' '.join(text.split())
+    return out
+
+def _snapshot_dir():
+    """
+    The snapshot directory, created private to the user. Raises
+    PermissionError if it is a symlink, belongs to another user, or others
+    can write to it: they could plant the files written by save().
+    """
+    os.makedirs(snapshot_dir, mode=0o700, exist_ok=True)
+    tmp = os.lstat(snapshot_dir)
+    if (not stat.S_ISDIR(tmp.st_mode) or tmp.st_uid != os.geteuid() or
+            tmp.st_mode & (stat.S_IWGRP | stat.S_IWOTH)):
+        raise PermissionError(f'Unsafe counter snapshot directory "{snapshot_dir}"')
+    return snapshot_dir
+
+def rule_counter(rule):
+    """ Packets and bytes of the first counter of a JSON rule, None if it has none """
+    for expr in rule.get('expr', []):
+        counter = expr.get('counter') if isinstance(expr, dict) else None
+        if isinstance(counter, dict):
+            return counter.get('packets', 0), counter.get('bytes', 0)
+    return None
+
+class Counters:
+    """
+    Counters of the commented rules of a ruleset, by (table, chain, comment).
+    Rules sharing a comment are summed up.
+    """
+    def __init__(self, ruleset=None, table=None):
+        if ruleset is None:
+            ruleset = get_ruleset(table)
+        self.time = time.time()
+        self._index = {}
+        for obj in ruleset:
+            rule = obj.get('rule')
+            if not rule or 'comment' not in rule:
+                continue
+            counter = rule_counter(rule)
+            if counter is None:
+                continue
+            key = (f'{rule["family"]} {rule["table"]}', rule['chain'], rule['comment'])
+            packets, _bytes = self._index.get(key, (0, 0))
+            self._index[key] = (packets + counter[0], _bytes + counter[1])
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, table, chain, comment):
+        """ {'packets': int, 'bytes': int} of a rule, None if there is none """
+        tmp = self._index.get((table, chain, comment))
+        if tmp is None:
+            return None
+        return {'packets': tmp[0], 'bytes': tmp[1]}
+
+    def chain(self, table, chain):
+        """ (comment, counters) of the rules of a chain, in ruleset order """
+        return [(key[2], {'packets': v[0], 'bytes': v[1]})
+                for key, v in self._index.items() if key[:2] == (table, chain)]
+
+    def delta(self, previous):
+        """
+        Counters of every rule with their increase since the previous
+        Counters and the rate per second. A counter lower than before was
+        reset by a reload of the ruleset and is counted from zero.
+        """
+        interval = self.time - previous.time if previous else 0
+        out = {}
+        for key, (packets, _bytes) in self._index.items():
+            entry = {'packets': packets, 'bytes': _bytes}
+            if interval > 0:
+                old_packets, old_bytes = previous._index.get(key, (0, 0))
+                if packets < old_packets or _bytes < old_bytes:
+                    old_packets, old_bytes = 0, 0
+                entry['packets_delta'] = packets - old_packets
+                entry['bytes_delta'] = _bytes - old_bytes
+                entry['packets_per_second'] = round(entry['packets_delta'] / interval, 3)
+                entry['bytes_per_second'] = round(entry['bytes_delta'] / interval, 3)
+            out[key] = entry
+        return out
+
+    def save(self, name):
+        """ Store as snapshot name, for a later delta() """
+        fname = os.path.join(_snapshot_dir(), f'{name}.json')
+        fd = os.open(f'{fname}.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'time': self.time,
+                       'counters': [list(k) + list(v) for k, v in self._index.items()]}, f)
+        os.replace(f'{fname}.tmp', fname)
+
+    @classmethod
+    def load(cls, name):
+        """ Snapshot stored by save(), None if there is none """
+        try:
+            fname = os.path.join(_snapshot_dir(), f'{name}.json')
+            with open(os.open(fname, os.O_RDONLY | os.O_NOFOLLOW)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        out = cls(ruleset=[])
+        out.time = data['time']
+        for table, chain, comment, packets, _bytes in data['counters']:
+            out._index[(table, chain, comment)] = (packets, _bytes)
+        return out
@@ -16,6 +16,7 @@
 import re
 import sys
 import typing
+from collections.abc import Iterator
 from humps import decamelize
 
 
@@ -146,6 +147,23 @@ def _normalize_field_names(value):
     else:
         return value
 
+def stream_table(rows, headers, widths, empty='Entries not found'):
+    """ Format rows like tabulate() does, with fixed column widths instead
+        of the widths of the longest values: the lines are yielded as the rows
+        are read, the table is never held in memory.
+    """
+    widths = [max(w, len(h)) for w, h in zip(widths, headers)]
+    line = lambda values: '  '.join(f'{v:<{w}}' for v, w in zip(values, widths)).rstrip()
+    found = False
+    for row in rows:
+        if not found:
+            found = True
+            yield line(headers)
+            yield line('-' * w for w in widths)
+        yield line('' if v is None else str(v) for v in row)
+    if not found:
+        yield empty
+
 def run(module):
     from argparse import ArgumentParser
 
@@ -199,7 +217,20 @@ def run(module):
         # or a raw dict that we need to serialize in JSON for printing
         res = func(**args)
         if not args["raw"]:
+            if isinstance(res, Iterator):
+                # Streamed formatted output is printed line by line
+                for line in res:
+                    sys.stdout.write(line + '\n')
+                return None
             return res
+        elif isinstance(res, Iterator):
+            # Streamed raw output is printed as it is produced,
+            # one JSON document per line (NDJSON)
+            from json import dumps
+            for item in res:
+                item = _normalize_field_names(decamelize(item))
+                sys.stdout.write(dumps(item) + '\n')
+            return None
         else:
             res = decamelize(res)
             res = _normalize_field_names(res)
@@ -248,6 +248,35 @@ class HttpC:
                     #  files (like entire VyOS images) don't occupy much memory.
                     shutil.copyfileobj(r.raw, f)
 
+    def download_if_modified(self, location: str, validators: dict):
+        """
+        Download unless the remote file still matches the validators of the
+        local copy (ETag, Last-Modified) of an earlier download. The file is
+        replaced atomically. Returns (modified, validators of the local copy).
+        """
+        with self._establish() as s:
+            s.headers.update({'Accept-Encoding': 'identity'})
+            if os.path.exists(location):
+                if validators.get('etag'):
+                    s.headers.update({'If-None-Match': validators['etag']})
+                if validators.get('last_modified'):
+                    s.headers.update({'If-Modified-Since': validators['last_modified']})
+            with s.get(self.urlstring, stream=True, allow_redirects=True) as r:
+                if r.status_code == 304:
+                    return False, validators
+                r.raise_for_status()
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(location) or '.')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        shutil.copyfileobj(r.raw, f)
+                    os.chmod(tmp, 0o644)
+                    os.replace(tmp, location)
+                except:
+                    os.unlink(tmp)
+                    raise
+                return True, {'etag': r.headers.get('ETag'),
+                              'last_modified': r.headers.get('Last-Modified')}
+
     def upload(self, location: str):
         # Does not yet support progressbars.
         with self._establish() as s, open(location, 'rb') as f:
@@ -311,6 +340,17 @@ def urlc(urlstring, *args, **kwargs):
 def download(local_path, urlstring, *args, **kwargs):
     urlc(urlstring, *args, **kwargs).download(local_path)
 
+def download_if_modified(local_path, urlstring, validators={}, *args, **kwargs):
+    """
+    Conditional download for HTTP(S), see HttpC.download_if_modified(); other
+    protocols always download. Returns (modified, validators).
+    """
+    client = urlc(urlstring, *args, **kwargs)
+    if isinstance(client, HttpC):
+        return client.download_if_modified(local_path, validators)
+    client.download(local_path)
+    return True, {}
+
 def upload(local_path, urlstring, *args, **kwargs):
     urlc(urlstring, *args, **kwargs).upload(local_path)
 
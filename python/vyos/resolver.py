@@ -0,0 +1,306 @@
+# Copyright 2022 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# Asynchronous stub resolver for A and AAAA records.
+#
+# getaddrinfo() blocks and does not return the TTL of the records, so
+# names are looked up in /etc/hosts and then sent as a plain DNS query to
+# the nameservers of /etc/resolv.conf, over UDP, or TCP for truncated
+# answers. Names are expected to be fully qualified, search domains are
+# not applied.
+
+import asyncio
+import json
+import os
+import random
+import struct
+import time
+
+from ipaddress import ip_address
+from socket import AF_INET
+from socket import AF_INET6
+
+hosts_file = '/etc/hosts'
+resolv_conf = '/etc/resolv.conf'
+cache_file = '/run/vyos-resolver-cache.json'
+
+query_timeout = 2.0
+query_attempts = 2
+
+# TTL of a negative answer without SOA record
+negative_ttl = 60
+
+_qtype = {AF_INET: 1, AF_INET6: 28}
+_type_soa = 6
+_class_in = 1
+
+_header = struct.Struct('!HHHHHH')
+_question = struct.Struct('!HH')
+_rr = struct.Struct('!HHIH')
+
+_rcode_noerror = 0
+_rcode_nxdomain = 3
+
+class ResolveError(Exception):
+    pass
+
+class _Truncated(ResolveError):
+    pass
+
+def get_nameservers(fname=resolv_conf):
+    """ Nameservers of resolv.conf, the local host if there are none """
+    servers = []
+    try:
+        with open(fname) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == 'nameserver':
+                    servers.append(fields[1])
+    except FileNotFoundError:
+        pass
+    return servers or ['127.0.0.1']
+
+_hosts = {'mtime': None, 'names': {}}
+
+def hosts_lookup(name, family, fname=hosts_file):
+    """
+    Addresses of name in the hosts file, None if it has none for the
+    family. The file is only parsed again once it changed.
+    """
+    try:
+        mtime = os.stat(fname).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    if _hosts['mtime'] != (fname, mtime):
+        names = {}
+        with open(fname) as f:
+            for line in f:
+                fields = line.split('#', 1)[0].split()
+                if len(fields) < 2:
+                    continue
+                try:
+                    address = ip_address(fields[0].split('%', 1)[0])
+                except ValueError:
+                    continue
+                fam = AF_INET if address.version == 4 else AF_INET6
+                for host in fields[1:]:
+                    names.setdefault((host.lower(), fam), set()).add(str(address))
+        _hosts['mtime'] = (fname, mtime)
+        _hosts['names'] = names
+
+    return _hosts['names'].get((name.lower().rstrip('.'), family))
+
+def build_query(qid, name, family):
+    labels = b''
+    for label in name.rstrip('.').split('.'):
+        label = label.encode('idna')
+        if not label or len(label) > 63:
+            raise ResolveError(f'Invalid name "{name}"')
+        labels += bytes([len(label)]) + label
+    # recursion desired
+    return (_header.pack(qid, 0x0100, 1, 0, 0, 0) + labels + b'\x00' +
+            _question.pack(_qtype[family], _class_in))
+
+def _skip_name(data, offset):
+    while True:
+        length = data[offset]
+        if length & 0xc0 == 0xc0:
+            return offset + 2
+        offset += 1
+        if length == 0:
+            return offset
+        offset += length
+
+def parse_response(data, qid, family):
+    """
+    Addresses and TTL of an answer to build_query(), the TTL being the
+    lowest of the chain of records (CNAME included) that led to them
+    """
+    try:
+        rid, flags, qdcount, ancount, nscount, _ = _header.unpack_from(data, 0)
+        if rid != qid or not flags & 0x8000:
+            raise ResolveError('Unexpected answer')
+        if flags & 0x0200:
+            raise _Truncated('Truncated answer')
+
+        rcode = flags & 0x000f
+        if rcode not in [_rcode_noerror, _rcode_nxdomain]:
+            raise ResolveError(f'Server failure (rcode {rcode})')
+
+        offset = _header.size
+        for _ in range(qdcount):
+            offset = _skip_name(data, offset) + _question.size
+
+        addresses = set()
+        ttl = None
+        qtype = _qtype[family]
+        for _ in range(ancount):
+            offset = _skip_name(data, offset)
+            rtype, rclass, rttl, rdlength = _rr.unpack_from(data, offset)
+            offset += _rr.size
+            rdata = data[offset:offset + rdlength]
+            offset += rdlength
+            if rclass != _class_in:
+                continue
+            if rtype == qtype and len(rdata) in [4, 16]:
+                addresses.add(str(ip_address(rdata)))
+            ttl = rttl if ttl is None else min(ttl, rttl)
+
+        if addresses:
+            return addresses, ttl
+
+        # negative answer, cached as long as told by the SOA record
+        ttl = negative_ttl
+        for _ in range(nscount):
+            offset = _skip_name(data, offset)
+            rtype, rclass, rttl, rdlength = _rr.unpack_from(data, offset)
+            offset += _rr.size
+            if rtype == _type_soa and rdlength >= 4:
+                minimum, = struct.unpack_from('!I', data, offset + rdlength - 4)
+                ttl = min(rttl, minimum)
+                break
+            offset += rdlength
+        return set(), ttl
+    except (IndexError, struct.error, ValueError) as e:
+        raise ResolveError(f'Malformed answer: {e}')
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, qid):
+        self.qid = qid
+        self.answer = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data, addr):
+        # ignore anything that does not answer our query
+        if len(data) >= 2 and data[:2] == struct.pack('!H', self.qid):
+            if not self.answer.done():
+                self.answer.set_result(data)
+
+    def error_received(self, exc):
+        if not self.answer.done():
+            self.answer.set_exception(exc)
+
+async def _query_udp(server, packet, qid):
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: _DatagramProtocol(qid), remote_addr=(server, 53))
+    try:
+        transport.sendto(packet)
+        return await asyncio.wait_for(protocol.answer, query_timeout)
+    finally:
+        transport.close()
+
+async def _query_tcp(server, packet):
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(server, 53), query_timeout)
+    try:
+        writer.write(struct.pack('!H', len(packet)) + packet)
+        length, = struct.unpack('!H', await asyncio.wait_for(
+            reader.readexactly(2), query_timeout))
+        return await asyncio.wait_for(reader.readexactly(length), query_timeout)
+    finally:
+        writer.close()
+
+async def resolve(name, family, nameservers=None):
+    """
+    Addresses of name for the address family (AF_INET or AF_INET6) and the
+    number of seconds they are valid, None for the entries of the hosts
+    file which have no TTL. Raises ResolveError if no nameserver answered.
+    """
+    try:
+        address = ip_address(name)
+        if (address.version == 4) == (family == AF_INET):
+            return {str(address)}, None
+        return set(), None
+    except ValueError:
+        pass
+
+    addresses = hosts_lookup(name, family)
+    if addresses:
+        return set(addresses), None
+
+    if nameservers is None:
+        nameservers = get_nameservers()
+
+    error = None
+    for _ in range(query_attempts):
+        for server in nameservers:
+            qid = random.getrandbits(16)
+            packet = build_query(qid, name, family)
+            try:
+                try:
+                    return parse_response(await _query_udp(server, packet, qid),
+                                          qid, family)
+                except _Truncated:
+                    return parse_response(await _query_tcp(server, packet),
+                                          qid, family)
+            except (ResolveError, OSError, asyncio.TimeoutError,
+                    asyncio.IncompleteReadError) as e:
+                error = e
+
+    raise ResolveError(f'Failed to resolve "{name}": {error}')
+
+# Resolution cache, shared between processes through cache_file.
+#
+# Entries are keyed by address family and name and hold the last non empty
+# resolution with its expiry time. Expired entries are kept as the last
+# good value to fall back to when the name can not be resolved.
+
+def _cache_key(name, family):
+    return f'{4 if family == AF_INET else 6} {name.lower().rstrip(".")}'
+
+def cache_load(fname=cache_file):
+    """ Cache stored in fname, empty if there is none """
+    try:
+        with open(fname) as f:
+            cache = json.load(f)
+        if isinstance(cache, dict):
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {}
+
+def cache_save(cache, fname=cache_file):
+    """ Replace fname atomically, readers never see a partial file """
+    tmp = f'{fname}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp, fname)
+
+def cache_lookup(cache, name, family, stale=False):
+    """
+    Cached addresses of name and the seconds until they expire, None if
+    there are none, or if they expired and stale is not set
+    """
+    entry = cache.get(_cache_key(name, family))
+    if not entry:
+        return None
+    ttl = entry['expires'] - time.time()
+    if ttl <= 0 and not stale:
+        return None
+    return set(entry['addresses']), ttl
+
+def cache_update(cache, name, family, addresses, ttl):
+    """ Store a successful resolution, valid for ttl seconds """
+    cache[_cache_key(name, family)] = {
+        'addresses': sorted(addresses),
+        'expires': round(time.time() + ttl, 3)
+    }
+
+def cache_prune(cache, names):
+    """ Drop the entries of all but the (name, family) pairs in names """
+    keep = {_cache_key(name, family) for name, family in names}
+    for key in [k for k in cache if k not in keep]:
+        del cache[key]
@@ -27,6 +27,10 @@ from subprocess import PIPE
 from subprocess import STDOUT
 from subprocess import DEVNULL
 
+# number of processes spawned by popen() in this process, used by vyos-configd
+# to account subprocesses to the conf_mode script stages
+popen_count = 0
+
 def popen(command, flag='', shell=None, input=None, timeout=None, env=None,
           stdout=PIPE, stderr=PIPE, decode='utf-8'):
     """
@@ -62,6 +66,7 @@ def popen(command, flag='', shell=None, input=None, timeout=None, env=None,
     # a circual import dependency
     from vyos import debug
     from vyos import airbag
+    global popen_count
 
     # log if the flag is set, otherwise log if command is set
     if not debug.enabled(flag):
@@ -85,6 +90,7 @@ def popen(command, flag='', shell=None, input=None, timeout=None, env=None,
 
     p = Popen(command, stdin=stdin, stdout=stdout, stderr=stderr,
               env=env, shell=use_shell)
+    popen_count += 1
 
     pipe = p.communicate(input, timeout)
 
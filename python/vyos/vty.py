@@ -0,0 +1,255 @@
+# Copyright 2022 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# Client of the vty sockets of the FRR daemons.
+#
+# This speaks the protocol vtysh uses with the daemons directly: every command
+# is sent NUL terminated on the /run/frr/<daemon>.vty unix socket, the daemon
+# answers with the output of the command, three NUL bytes and the status of
+# the command. Connections are kept open in a pool and reused by the next
+# commands of the process, several commands can be sent at once and their
+# replies read in order.
+#
+# Example:
+# >>> from vyos.vty import execute_json
+# >>> execute_json('bgpd', 'show bgp ipv4 summary json')
+
+import codecs
+import json
+import os
+import socket
+import threading
+
+from contextlib import contextmanager
+
+path_vty = '/run/frr'
+
+# status of the commands, lib/command.h
+CMD_SUCCESS = 0
+CMD_WARNING = 1
+CMD_ERR_NO_MATCH = 2
+CMD_ERR_AMBIGUOUS = 3
+CMD_ERR_INCOMPLETE = 4
+CMD_SUCCESS_DAEMON = 10
+
+_terminator = b'\0\0\0'
+
+# daemon answering a command, by the words the command starts with; vtysh
+# sends the other commands to several daemons at once
+_command_daemons = [
+    (['show', 'ip', 'route'], 'zebra'),
+    (['show', 'ipv6', 'route'], 'zebra'),
+    (['show', 'interface'], 'zebra'),
+    (['show', 'bgp'], 'bgpd'),
+    (['show', 'ip', 'bgp'], 'bgpd'),
+    (['show', 'ip', 'ospf'], 'ospfd'),
+    (['show', 'ipv6', 'ospf6'], 'ospf6d'),
+    (['show', 'isis'], 'isisd'),
+    (['show', 'ip', 'rip'], 'ripd'),
+    (['show', 'ipv6', 'ripng'], 'ripngd'),
+    (['show', 'bfd'], 'bfdd'),
+    (['show', 'mpls', 'ldp'], 'ldpd'),
+    (['show', 'ip', 'eigrp'], 'eigrpd'),
+]
+
+class VtyError(Exception):
+    """ A command failed, status is its CMD_* status and output the message
+    of the daemon """
+    def __init__(self, command, status, output):
+        self.command = command
+        self.status = status
+        self.output = output
+        super().__init__(f'"{command}" failed ({status}): {output.strip()}')
+
+def command_daemon(command):
+    """ The daemon answering command, None if vtysh would ask several daemons """
+    words = command.split()
+    for prefix, daemon in _command_daemons:
+        if words[:len(prefix)] == prefix:
+            return daemon
+    return None
+
+class VtyConnection:
+    """ Connection to the vty socket of daemon """
+    def __init__(self, daemon, timeout=120):
+        self.daemon = daemon
+        self._buffer = b''
+        # replies not read yet
+        self._pending = 0
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(os.path.join(path_vty, f'{daemon}.vty'))
+            # the configuration commands need the enable node, like vtysh
+            self.execute('enable')
+        except:
+            self._sock.close()
+            raise
+
+    def close(self):
+        self._sock.close()
+
+    def send(self, commands):
+        """ Send all commands at once, see receive() for the replies """
+        self._sock.sendall(b''.join(c.encode() + b'\0' for c in commands))
+        self._pending += len(commands)
+
+    def chunks(self, command):
+        """ The output of a command sent with send(), as it is read from the
+        socket, in bytes; raises VtyError once the output ended if the command
+        failed """
+        while True:
+            end = self._buffer.find(_terminator)
+            if end >= 0 and len(self._buffer) > end + 3:
+                output, status = self._buffer[:end], self._buffer[end + 3]
+                self._buffer = self._buffer[end + 4:]
+                self._pending -= 1
+                if status not in [CMD_SUCCESS, CMD_SUCCESS_DAEMON]:
+                    raise VtyError(command, status, output.decode(errors='replace'))
+                if output:
+                    yield output
+                return
+
+            if end < 0:
+                # pass on what was read but the start of a split terminator
+                keep = len(self._buffer) - len(self._buffer.rstrip(b'\0'))
+                if len(self._buffer) > keep:
+                    yield self._buffer[:len(self._buffer) - keep]
+                    self._buffer = self._buffer[len(self._buffer) - keep:]
+
+            data = self._sock.recv(65536)
+            if not data:
+                raise ConnectionResetError(f'{self.daemon} closed the vty connection')
+            self._buffer += data
+
+    def receive(self, command):
+        """ The output of a command sent with send() """
+        return b''.join(self.chunks(command)).decode(errors='replace')
+
+    def execute(self, command):
+        """ Run command, return its output """
+        self.send([command])
+        return self.receive(command)
+
+    def execute_many(self, commands):
+        """ Run all commands pipelined, return their outputs in order. A failed
+        command raises VtyError once the replies of all commands were read. """
+        self.send(commands)
+        outputs = []
+        error = None
+        for command in commands:
+            try:
+                outputs.append(self.receive(command))
+            except VtyError as e:
+                outputs.append(None)
+                error = error or e
+        if error:
+            raise error
+        return outputs
+
+class VtyPool:
+    """ Idle connections to the daemons, reused by the commands of the process
+    and of its threads. A forked child starts over with its own connections. """
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._pid = os.getpid()
+
+    def _get(self, daemon):
+        with self._lock:
+            if self._pid != os.getpid():
+                # the connections belong to the parent
+                self._idle = {}
+                self._pid = os.getpid()
+            idle = self._idle.get(daemon)
+            if idle:
+                return idle.pop()
+        return VtyConnection(daemon)
+
+    def _put(self, connection):
+        with self._lock:
+            idle = self._idle.setdefault(connection.daemon, [])
+            if self._pid == os.getpid() and len(idle) < self.max_idle:
+                idle.append(connection)
+                return
+        connection.close()
+
+    @contextmanager
+    def connection(self, daemon):
+        """ A connection to daemon for the commands of the with block, a broken
+        or interrupted connection is not reused """
+        connection = self._get(daemon)
+        reuse = False
+        try:
+            yield connection
+            reuse = True
+        except VtyError:
+            reuse = True
+            raise
+        finally:
+            # unless replies were left unread
+            if reuse and not connection._pending:
+                self._put(connection)
+            else:
+                connection.close()
+
+    def clear(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for connection in idle:
+                    connection.close()
+            self._idle = {}
+
+    def execute_many(self, daemon, commands):
+        try:
+            with self.connection(daemon) as connection:
+                return connection.execute_many(commands)
+        except (BrokenPipeError, ConnectionResetError):
+            # the daemon restarted since the connection was opened
+            self.clear()
+            with self.connection(daemon) as connection:
+                return connection.execute_many(commands)
+
+pool = VtyPool()
+
+def available(daemon):
+    """ True if daemon has a vty socket """
+    return os.path.exists(os.path.join(path_vty, f'{daemon}.vty'))
+
+def execute(daemon, command):
+    """ Output of command run by daemon """
+    return pool.execute_many(daemon, [command])[0]
+
+def execute_many(daemon, commands):
+    """ Outputs of the commands, sent to daemon at once """
+    return pool.execute_many(daemon, commands)
+
+def stream(daemon, command):
+    """ Output of command run by daemon as it is read, in str chunks; for the
+    large outputs which are parsed while they are received """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with pool.connection(daemon) as connection:
+        connection.send([command])
+        for chunk in connection.chunks(command):
+            yield decoder.decode(chunk)
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def execute_json(daemon, command):
+    """ Output of the JSON command run by daemon, parsed """
+    output = execute(daemon, command)
+    return json.loads(output) if output.strip() else {}
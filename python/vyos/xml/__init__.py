@@ -13,6 +13,7 @@
 
 
 from vyos.xml import definition
+from vyos.xml import index
 from vyos.xml import load
 from vyos.xml import kw
 
@@ -24,8 +25,7 @@ def load_configuration(cache=[]):
     xml = definition.XML()
 
     try:
-        from vyos.xml.cache import configuration
-        xml.update(configuration.definition)
+        xml.load_index(index.Index(load.configuration_index))
         cache.append(xml)
     except Exception:
         xml = definition.XML()
@@ -46,6 +46,9 @@ def is_tag(lpath):
 def is_leaf(lpath, flat=True):
     return load_configuration().is_leaf(lpath, flat)
 
+def cache_info():
+    return load_configuration().cache_info()
+
 def component_version():
     return load_configuration().component_version()
 
@@ -57,6 +60,14 @@ def multi_to_list(lpath, conf):
     return load_configuration().multi_to_list(lpath, conf)
 
 
+def config_dict(lpath, conf, get_first_key=False, key_mangling=None,
+                no_multi_convert=False, no_tag_node_value_mangle=False,
+                with_defaults=False):
+    return load_configuration().config_dict(lpath, conf, get_first_key,
+        key_mangling, no_multi_convert, no_tag_node_value_mangle,
+        with_defaults)
+
+
 if __name__ == '__main__':
     print(defaults(['service'], flat=True))
     print(defaults(['service'], flat=False))
@@ -11,6 +11,8 @@
 # You should have received a copy of the GNU Lesser General Public License along with this library;
 # if not, write to the Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA 
 
+import re
+
 from vyos.xml import kw
 
 # As we index by key, the name is first and then the data:
@@ -55,6 +57,43 @@ class XML(dict):
         # what kind of node are we in plain vs data not
         self.plain = True
 
+        # binary definition index the data is read from, see load_index()
+        self._binary = None
+        # schema lookup caches, see _tree()
+        self._index = None
+        self._lookup = {}
+        self._lookup_hits = 0
+        self._lookup_misses = 0
+        self._lookup_evictions = 0
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        # the definition changed, any cached lookup may now be wrong
+        self._index = None
+        self._lookup = {}
+
+    def load_index(self, index):
+        """
+        use a vyos.xml.index.Index as definition: the tree is read lazily,
+        node by node, the other root entries when first accessed
+        """
+        for k in list(self):
+            del self[k]
+        self._binary = index
+        self._index = None
+        self._lookup = {}
+        self[kw.tree] = index.node(())
+        self.tree = self[kw.tree]
+
+    def __missing__(self, key):
+        if self._binary is None:
+            raise KeyError(key)
+        value = self._binary.section(key)
+        if value is None:
+            raise KeyError(key)
+        self[key] = value
+        return value
+
     def reset(self):
         self.tree = self[kw.tree]
         self.options = []
@@ -291,6 +330,128 @@ class XML(dict):
 
         return _flatten(lpath, len(lpath), d)
 
+    def config_dict(self, lpath, conf, get_first_key=False, key_mangling=None,
+                    no_multi_convert=False, no_tag_node_value_mangle=False,
+                    with_defaults=False):
+        """
+        single pass equivalent of multi_to_list() followed by
+        vyos.util.mangle_dict_keys() and the merge of the default values
+        (with_defaults), as done by vyos.config.Config.get_config_dict()
+
+        conf is the configuration under lpath, as {lpath[-1]: {...}} or, if
+        get_first_key is set, as the content of lpath. Rather than looking up
+        every key from the root of the definition, the definition is followed
+        while descending into conf. A new dict is returned, conf is unchanged.
+
+        Default values are merged for the node at lpath (for all its values
+        if it is a tagNode) and the nodes below it, but not for the values of
+        any other tagNode below it.
+        """
+        if key_mangling:
+            sub = re.compile(key_mangling[0]).sub
+            replacement = key_mangling[1]
+            mangle = lambda key: sub(replacement, key)
+        else:
+            mangle = None
+
+        xmlpath = lpath if get_first_key else lpath[:-1]
+        tree = self[kw.tree]
+        default = self[kw.default] if with_defaults else None
+        tag = False
+        for p in xmlpath:
+            if tag:
+                tag = False
+                continue
+            tree = tree.get(p)
+            if default is not None:
+                default = default.get(p)
+                if not isinstance(default, dict):
+                    default = None
+            if tree is None:
+                default = None
+                break
+            tag = tree[kw.node] == kw.tagNode
+
+        return self._config_dict(conf, tree, tag, mangle, no_multi_convert,
+                                 no_tag_node_value_mangle, 0, default,
+                                 not get_first_key)
+
+    def _config_dict(self, conf, tree, tag, mangle, no_multi_convert,
+                     no_tag_node_value_mangle, mod, default, wrap):
+        """
+        conf: dict to convert
+        tree: definition of the node holding conf, or None if unknown
+        tag: the keys of conf are tagNode values
+        mod: key mangling state for no_tag_node_value_mangle
+        default: default values applying to conf, or None
+        wrap: conf is {lpath[-1]: {...}}, the defaults are for the value
+        """
+        r = {}
+        for k, value in conf.items():
+            if tree is None:
+                inner = None
+                is_tag = False
+            elif tag:
+                # a tagNode value, still described by the tagNode
+                inner = tree
+                is_tag = True
+            else:
+                inner = tree.get(k)
+                is_tag = inner is not None and inner[kw.node] == kw.tagNode
+
+            under = k
+            inner_mod = mod
+            if mangle and (not is_tag or not mod % 2):
+                under = mangle(k)
+            if is_tag and no_tag_node_value_mangle:
+                inner_mod += 1
+
+            if isinstance(value, dict):
+                if default is None:
+                    inner_default = None
+                elif tag:
+                    # only the case for the values of the node at lpath
+                    inner_default = default
+                elif wrap or not is_tag:
+                    inner_default = default.get(k)
+                else:
+                    inner_default = None
+                if not isinstance(inner_default, dict):
+                    inner_default = None
+                r[under] = self._config_dict(value, inner, is_tag and not tag,
+                    mangle, no_multi_convert, no_tag_node_value_mangle,
+                    inner_mod, inner_default, False)
+                continue
+
+            if isinstance(value, list):
+                value = list(value)
+            elif not no_multi_convert and inner is not None and inner.get(kw.multi) is True:
+                value = [value]
+            r[under] = value
+
+        if default is None or tag or wrap or tree is None:
+            return r
+
+        # add missing default values, but not for the values of tagNodes
+        for k, value in default.items():
+            inner = tree.get(k)
+            if inner is None or inner[kw.node] == kw.tagNode:
+                continue
+            under = mangle(k) if mangle else k
+            if under in r:
+                continue
+            if isinstance(value, dict):
+                value = self._config_dict({}, inner, False, mangle,
+                    no_multi_convert, no_tag_node_value_mangle, mod, value,
+                    False)
+                if not value:
+                    continue
+            elif not no_multi_convert and inner.get(kw.multi) is True:
+                value = value.split(' ')
+            r[under] = value
+
+        return r
+
     def multi_to_list(self, lpath, conf, defaults=False):
         r = {}
         for k in conf:
@@ -311,9 +472,51 @@ class XML(dict):
             r[under] = value
         return r
 
-    # from functools import lru_cache
-    # @lru_cache(maxsize=100)
-    # XXX: need to use cachetool instead - for later
+    # maximum number of schema paths remembered by _node() when the
+    # definition is read from a binary index
+    lookup_cache_size = 16384
+
+    def _build_index(self):
+        """
+        index every node of the definition by its schema path (a tuple of
+        node names without tagNode values), so that schema paths are resolved
+        with a single dict lookup
+        """
+        index = {}
+        todo = [((), self[kw.tree])]
+        while todo:
+            path, tree = todo.pop()
+            for name, inner in tree.items():
+                if kw.found(name) or not isinstance(inner, dict):
+                    continue
+                npath = path + (name,)
+                index[npath] = inner
+                todo.append((npath, inner))
+        self._index = index
+
+    def _node(self, spath):
+        """
+        the node at the schema path spath (a tuple), None if there is none
+        """
+        if self._binary is None:
+            if self._index is None:
+                self._build_index()
+            return self._index.get(spath)
+
+        # the binary index is searched, remember the nodes found
+        lookup = self._lookup
+        if spath in lookup:
+            self._lookup_hits += 1
+            return lookup[spath]
+
+        self._lookup_misses += 1
+        node = self._binary.node(spath)
+        if len(lookup) >= self.lookup_cache_size:
+            # bounded memory: forget the oldest lookup
+            del lookup[next(iter(lookup))]
+            self._lookup_evictions += 1
+        lookup[spath] = node
+        return node
 
     def _tree(self, lpath, with_tag=True):
         """
@@ -321,17 +524,42 @@ class XML(dict):
         if with_tag is set, this is a configuration path (with tagNode names)
         and tag name will be removed from the path when traversing the tree
         """
-        tree = self[kw.tree]
-        spath = lpath.copy()
-        while spath:
-            p = spath.pop(0)
-            if p not in tree:
+        if not lpath:
+            return self[kw.tree]
+        if not with_tag:
+            return self._node(tuple(lpath))
+
+        # normalise the configuration path to its schema path, a lookup per
+        # level, whatever the tagNode values
+        spath = ()
+        tree = None
+        tag = False
+        for p in lpath:
+            if tag:
+                # skip the tagNode value
+                tag = False
+                continue
+            spath += (p,)
+            tree = self._node(spath)
+            if tree is None:
                 return None
-            tree = tree[p]
-            if with_tag and spath and tree[kw.node] == kw.tagNode:
-                spath.pop(0)
+            tag = tree[kw.node] == kw.tagNode
         return tree
 
+    def cache_info(self) -> dict:
+        """
+        statistics about the schema lookup caches
+        """
+        return {
+            'index': len(self._binary) if self._binary is not None else
+                     len(self._index) if self._index is not None else 0,
+            'size': len(self._lookup),
+            'maxsize': self.lookup_cache_size,
+            'hits': self._lookup_hits,
+            'misses': self._lookup_misses,
+            'evictions': self._lookup_evictions,
+        }
+
     def _get(self, lpath, tag, with_tag=True):
         tree = self._tree(lpath, with_tag)
         if tree is None:
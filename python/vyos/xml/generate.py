@@ -19,6 +19,7 @@ import sys
 import pprint
 import argparse
 
+from vyos.xml import index
 from vyos.xml import kw
 from vyos.xml import load
 
@@ -30,18 +31,15 @@ from vyos.xml import load
 #         w.write(json.dumps(loaded))
 
 
-def save_dict(fname, loaded):
-    with open(fname, 'w') as w:
-        print(f'saving {fname}')
-        w.write(f'# generated by {__file__}\n\n')
-        w.write('definition = ')
-        w.write(str(loaded))
+def save_index(fname, loaded):
+    print(f'saving {fname}')
+    index.save(fname, loaded)
 
 
 def main():
-    parser = argparse.ArgumentParser(description='generate python file from xml defintions')
+    parser = argparse.ArgumentParser(description='generate binary index from xml defintions')
     parser.add_argument('--conf-folder', type=str, default=load.configuration_definition, help='XML interface definition folder')
-    parser.add_argument('--conf-cache', type=str, default=load.configuration_cache, help='python file with the conf mode dict')
+    parser.add_argument('--conf-cache', type=str, default=load.configuration_index, help='binary index of the conf mode definition')
 
     # parser.add_argument('--op-folder', type=str, default=load.operational_definition, help='XML interface definition folder')
     # parser.add_argument('--op-cache', type=str, default=load.operational_cache, help='python file with the conf mode dict')
@@ -50,8 +48,11 @@ def main():
 
     args = parser.parse_args()
 
+    # python dict generated by previous versions
     if os.path.exists(load.configuration_cache):
         os.remove(load.configuration_cache)
+    if os.path.exists(args.conf_cache):
+        os.remove(args.conf_cache)
     # if os.path.exists(load.operational_cache):
 	#     os.remove(load.operational_cache)
 
@@ -62,7 +63,7 @@ def main():
         pprint.pprint(conf)
         return
 
-    save_dict(args.conf_cache, conf)
+    save_index(args.conf_cache, conf)
     # save_dict(args.op_cache, op)
 
 
@@ -0,0 +1,176 @@
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This library is free software; you can redistribute it and/or modify it under the terms of
+# the GNU Lesser General Public License as published by the Free Software Foundation;
+# either version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License along with this library;
+# if not, write to the Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+
+import ast
+import json
+import mmap
+import struct
+
+from collections.abc import Mapping
+
+from vyos.xml import kw
+
+# Binary, memory mappable, form of the XML definition.
+#
+# The file is a table of records sorted by key, found with a binary search:
+#
+#   header:  magic, version, number of records
+#   table:   per record the offset and length of its key and of its data
+#   blob:    the keys and the data
+#
+# Every node of the definition tree is a record, keyed by its schema path
+# (node names without tagNode values) joined with SEPARATOR, the root being
+# the empty key. Its data is the JSON encoded list [properties, children]:
+# the keyword entries of the node and the names of its child nodes.
+#
+# The other root entries of the definition ([default], [priorities], ...)
+# are records keyed with SECTION followed by their keyword, their data is
+# their python literal, as [priorities] is indexed by integers.
+#
+# A process only reads the pages holding the records it looks up.
+
+MAGIC = b'VYOSXIDX'
+VERSION = 1
+
+SEPARATOR = '\x1f'
+SECTION = '\x00'
+
+_header = struct.Struct('<8sII')
+_record = struct.Struct('<IIII')
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def save(fname, definition):
+    """
+    write the definition as returned by vyos.xml.load.xml() to fname
+    """
+    records = {}
+    todo = [((), definition[kw.tree])]
+    while todo:
+        path, tree = todo.pop()
+        properties = {k: v for k, v in tree.items() if kw.found(k)}
+        children = [k for k in tree if not kw.found(k)]
+        records[SEPARATOR.join(path).encode()] = _dumps([properties, children])
+        for k in children:
+            todo.append((path + (k,), tree[k]))
+
+    for k, v in definition.items():
+        if k != kw.tree:
+            records[(SECTION + k).encode()] = repr(v).encode()
+
+    keys = sorted(records)
+    offset = _header.size + _record.size * len(keys)
+    table = []
+    blob = []
+    for key in keys:
+        data = records[key]
+        table.append(_record.pack(offset, len(key), offset + len(key), len(data)))
+        blob.append(key)
+        blob.append(data)
+        offset += len(key) + len(data)
+
+    with open(fname, 'wb') as f:
+        f.write(_header.pack(MAGIC, VERSION, len(keys)))
+        f.write(b''.join(table))
+        f.write(b''.join(blob))
+
+
+class Index:
+    """
+    read only access to a file written by save()
+    """
+    def __init__(self, fname):
+        with open(fname, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self._count = _header.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{fname} is not a version {VERSION} definition index')
+
+    def __len__(self):
+        return self._count
+
+    def _lookup(self, key):
+        """
+        the data of the record with the given key, None if there is none
+        """
+        mm = self._map
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            koff, klen, doff, dlen = _record.unpack_from(mm, _header.size + mid * _record.size)
+            found = mm[koff:koff + klen]
+            if found == key:
+                return mm[doff:doff + dlen]
+            if found < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def node(self, path):
+        """
+        the node at the schema path, None if there is none
+        """
+        data = self._lookup(SEPARATOR.join(path).encode())
+        if data is None:
+            return None
+        return Node(self, tuple(path), *json.loads(data))
+
+    def section(self, name):
+        """
+        the value of a root entry of the definition other than [tree]
+        """
+        data = self._lookup((SECTION + name).encode())
+        if data is None:
+            return None
+        return ast.literal_eval(data.decode())
+
+
+class Node(Mapping):
+    """
+    read only, lazily loaded, view of a node of the definition tree: the
+    child nodes are only read from the index once accessed
+    """
+    def __init__(self, index, path, properties, children):
+        self._index = index
+        self._path = path
+        self._properties = properties
+        self._children = dict.fromkeys(children)
+
+    def __getitem__(self, key):
+        if key in self._properties:
+            return self._properties[key]
+        if key not in self._children:
+            raise KeyError(key)
+        child = self._children[key]
+        if child is None:
+            child = self._index.node(self._path + (key,))
+            self._children[key] = child
+        return child
+
+    def __contains__(self, key):
+        return key in self._properties or key in self._children
+
+    def __iter__(self):
+        yield from self._properties
+        yield from self._children
+
+    def __len__(self):
+        return len(self._properties) + len(self._children)
+
+    def __repr__(self):
+        return f'Node({list(self._path)})'
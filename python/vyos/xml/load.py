@@ -30,6 +30,7 @@ _here = dirname(__file__)
 
 configuration_definition = abspath(join(_here, '..', '..' ,'..', 'interface-definitions'))
 configuration_cache = abspath(join(_here, 'cache', 'configuration.py'))
+configuration_index = abspath(join(_here, 'cache', 'configuration.idx'))
 
 operational_definition = abspath(join(_here, '..', '..' ,'..', 'op-mode-definitions'))
 operational_cache = abspath(join(_here, 'cache', 'operational.py'))
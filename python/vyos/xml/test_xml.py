@@ -277,3 +277,119 @@ class TestSearch(TestCase):
         self.assertEqual(self.xml.plain, False)
 
     # Need to add a check for a valuless leafNode
+
+
+class TestLookup(TestCase):
+    def setUp(self):
+        self.xml = load_configuration()
+
+    def test_is_tag(self):
+        self.assertTrue(self.xml.is_tag(['interfaces', 'ethernet']))
+        self.assertTrue(self.xml.is_tag(['interfaces', 'ethernet', 'eth0']))
+        self.assertFalse(self.xml.is_tag(['interfaces', 'ethernet', 'eth0', 'mtu']))
+        self.assertIsNone(self.xml.is_tag(['interfaces', 'ethernet', 'eth0', 'foo']))
+
+    def test_is_multi(self):
+        self.assertTrue(self.xml.is_multi(['interfaces', 'ethernet', 'eth0', 'address']))
+        self.assertTrue(self.xml.is_multi(['interfaces', 'ethernet', 'address'], with_tag=False))
+        self.assertFalse(self.xml.is_multi(['interfaces', 'ethernet', 'eth0', 'mtu']))
+
+    def test_is_leaf(self):
+        self.assertTrue(self.xml.is_leaf(['interfaces', 'ethernet', 'eth0', 'mtu']))
+        self.assertFalse(self.xml.is_leaf(['interfaces']))
+
+    def test_tag_values(self):
+        # every configuration path resolves through the schema path index,
+        # whatever its tagNode values
+        for i in range(1000):
+            self.assertTrue(self.xml.is_leaf(['interfaces', 'ethernet', f'eth{i}',
+                                              'vif', str(i), 'mtu']))
+        self.assertTrue(self.xml.is_tag(['interfaces', 'ethernet', 'eth0', 'vif']))
+        self.assertGreater(self.xml.cache_info()['index'], 0)
+
+    def test_config_dict(self):
+        from vyos.util import mangle_dict_keys
+
+        conf = {'ethernet': {'eth0': {'address': '192.0.2.1/24',
+                                      'vif': {'10': {'ip': {'arp-cache-timeout': '10'}}}}},
+                'dummy': {'dum-0': {'address': ['192.0.2.9/32']}}}
+        for no_tag_node_value_mangle in [False, True]:
+            old = self.xml.multi_to_list(['interfaces'], conf)
+            old = mangle_dict_keys(old, '-', '_', abs_path=['interfaces'],
+                                   no_tag_node_value_mangle=no_tag_node_value_mangle)
+            new = self.xml.config_dict(['interfaces'], conf, get_first_key=True,
+                                       key_mangling=('-', '_'),
+                                       no_tag_node_value_mangle=no_tag_node_value_mangle)
+            self.assertEqual(new, old)
+
+
+class TestIndex(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from tempfile import NamedTemporaryFile
+        from vyos.xml import definition
+        from vyos.xml import index
+
+        cls.xml = load_configuration()
+        cls.tmp = NamedTemporaryFile(suffix='.idx')
+        index.save(cls.tmp.name, cls.xml)
+        cls.binary = definition.XML()
+        cls.binary.load_index(index.Index(cls.tmp.name))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.close()
+
+    def test_lookup(self):
+        for path in [['interfaces', 'ethernet'],
+                     ['interfaces', 'ethernet', 'eth0'],
+                     ['interfaces', 'ethernet', 'eth0', 'address'],
+                     ['interfaces', 'ethernet', 'eth0', 'vif', '10', 'mtu'],
+                     ['interfaces', 'ethernet', 'eth0', 'foo']]:
+            self.assertEqual(self.binary.is_tag(path), self.xml.is_tag(path))
+            self.assertEqual(self.binary.is_leaf(path), self.xml.is_leaf(path))
+            self.assertEqual(self.binary.is_multi(path), self.xml.is_multi(path))
+
+    def test_cache_info(self):
+        from vyos.xml import definition
+
+        xml = definition.XML()
+        xml.load_index(self.binary._binary)
+        for i in range(100):
+            self.assertTrue(xml.is_leaf(['interfaces', 'ethernet', f'eth{i}', 'mtu']))
+        info = xml.cache_info()
+        # one lookup per schema path, not per configuration path
+        self.assertEqual(info['size'], 3)
+        self.assertEqual(info['misses'], 3)
+        self.assertEqual(info['hits'], 297)
+        self.assertGreater(info['index'], 0)
+
+    def test_cache_bounded(self):
+        from vyos.xml import definition
+
+        xml = definition.XML()
+        xml.load_index(self.binary._binary)
+        xml.lookup_cache_size = 4
+        for name in ['ethernet', 'dummy', 'bridge', 'bonding', 'loopback']:
+            xml.is_tag(['interfaces', name, 'foo0', 'mtu'])
+        info = xml.cache_info()
+        self.assertEqual(info['size'], 4)
+        self.assertEqual(info['evictions'], info['misses'] - 4)
+
+    def test_sections(self):
+        self.assertEqual(self.binary.component_version(), self.xml.component_version())
+        self.assertEqual(self.binary.defaults(['service', 'ssh'], flat=False),
+                         self.xml.defaults(['service', 'ssh'], flat=False))
+
+    def test_traverse(self):
+        for cmd in ['', 'interfaces ', 'interfaces ethernet lan0 ad']:
+            self.assertEqual(self.binary.traverse(cmd), self.xml.traverse(cmd))
+            self.assertEqual(self.binary.options, self.xml.options)
+
+    def test_config_dict(self):
+        conf = {'ethernet': {'eth0': {'address': '192.0.2.1/24'}}}
+        self.assertEqual(
+            self.binary.config_dict(['interfaces'], conf, key_mangling=('-', '_'),
+                                    with_defaults=True),
+            self.xml.config_dict(['interfaces'], conf, key_mangling=('-', '_'),
+                                 with_defaults=True))
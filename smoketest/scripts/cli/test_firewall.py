@@ -190,6 +190,34 @@ class TestFirewall(VyOSUnitTestSHIM.TestCase):
 
         self.verify_nftables(nftables_search, 'ip vyos_filter')
 
+    def test_partial_update(self):
+        self.cli_set(['firewall', 'group', 'port-group', 'smoketest_port', 'port', '53'])
+        self.cli_set(['firewall', 'name', 'smoketest', 'rule', '1', 'action', 'accept'])
+        self.cli_set(['firewall', 'name', 'smoketest', 'rule', '1', 'destination', 'group', 'port-group', 'smoketest_port'])
+        self.cli_set(['firewall', 'name', 'smoketest', 'rule', '1', 'protocol', 'udp'])
+        self.cli_set(['firewall', 'interface', 'eth0', 'in', 'name', 'smoketest'])
+        self.cli_commit()
+
+        # rule and group member changes only replace the chain and the set
+        self.cli_set(['firewall', 'group', 'port-group', 'smoketest_port', 'port', '123'])
+        self.cli_set(['firewall', 'name', 'smoketest', 'rule', '2', 'action', 'drop'])
+        self.cli_set(['firewall', 'name', 'smoketest', 'rule', '2', 'source', 'address', '172.16.20.10'])
+        self.cli_commit()
+
+        nftables_search = [
+            ['iifname "eth0"', 'jump NAME_smoketest'],
+            ['udp dport @P_smoketest_port', 'return'],
+            ['ip saddr 172.16.20.10', 'drop'],
+            ['elements = { 53, 123 }']
+        ]
+
+        self.verify_nftables(nftables_search, 'ip vyos_filter')
+
+        self.cli_delete(['firewall', 'name', 'smoketest', 'rule', '2'])
+        self.cli_commit()
+
+        self.verify_nftables([['ip saddr 172.16.20.10', 'drop']], 'ip vyos_filter', inverse=True)
+
     def test_ipv4_basic_rules(self):
         name = 'smoketest'
         interface = 'eth0'
@@ -450,11 +478,12 @@ class TestFirewall(VyOSUnitTestSHIM.TestCase):
             ['chain VZONE_smoketest-eth0'],
             ['chain VZONE_smoketest-local_IN'],
             ['chain VZONE_smoketest-local_OUT'],
-            ['oifname "eth0"', 'jump VZONE_smoketest-eth0'],
+            ['oifname vmap', '"eth0" : jump VZONE_smoketest-eth0'],
+            ['iifname . oifname vmap', '"eth0" . "eth0" : accept'],
             ['jump VZONE_smoketest-local_IN'],
             ['jump VZONE_smoketest-local_OUT'],
-            ['iifname "eth0"', 'jump NAME_smoketest'],
-            ['oifname "eth0"', 'jump NAME_smoketest']
+            ['iifname vmap', '"eth0" : goto NAME_smoketest'],
+            ['oifname vmap', '"eth0" : goto NAME_smoketest']
         ]
 
         nftables_output = cmd('sudo nft list table ip vyos_filter')
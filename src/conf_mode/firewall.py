@@ -23,14 +23,18 @@ from sys import exit
 
 from vyos.base import Warning
 from vyos.config import Config
-from vyos.configdict import dict_merge
 from vyos.configdict import node_changed
 from vyos.configdiff import get_config_diff, Diff
+from vyos.configdiff import get_diff_index, Change
 # from vyos.configverify import verify_interface_exists
+from vyos.firewall import domain_sets_cached
 from vyos.firewall import fqdn_config_parse
 from vyos.firewall import external_list_update
+from vyos.firewall import external_list_state_clear
 from vyos.firewall import external_list_file_dir
 from vyos.firewall import geoip_update
+from vyos.firewall import optimize_rules
+from vyos.firewall import zone_verdict_maps
 from vyos.template import render
 from vyos.util import call
 from vyos.util import cmd
@@ -38,7 +42,6 @@ from vyos.util import dict_search_args
 from vyos.util import dict_search_recursive
 from vyos.util import process_named_running
 from vyos.util import rc_cmd
-from vyos.xml import defaults
 from vyos import ConfigError
 from vyos import airbag
 airbag.enable()
@@ -47,6 +50,10 @@ nat_conf_script = '/usr/libexec/vyos/conf_mode/nat.py'
 policy_route_conf_script = '/usr/libexec/vyos/conf_mode/policy-route.py'
 
 nftables_conf = '/run/nftables.conf'
+nftables_partial_conf = '/run/nftables-partial.conf'
+
+# reported in the commit timing log by vyos-configd
+commit_notes = {}
 
 sysfs_config = {
     'all_ping': {'sysfs': '/proc/sys/net/ipv4/icmp_echo_ignore_all', 'enable': '0', 'disable': '1'},
@@ -75,6 +82,17 @@ nested_group_types = [
     'port_group', 'ipv6_address_group', 'ipv6_network_group'
 ]
 
+# group types whose member changes are applied to the existing sets, with
+# the prefix of their set names
+partial_group_types = {
+    'address-group': 'A_',
+    'ipv6-address-group': 'A6_',
+    'network-group': 'N_',
+    'ipv6-network-group': 'N6_',
+    'mac-group': 'M_',
+    'port-group': 'P_'
+}
+
 snmp_change_type = {
     'unknown': 0,
     'add': 1,
@@ -110,9 +128,10 @@ def external_list_updated(conf, firewall):
             updated = True
             out['deleted_name'].append(key)
             out['deleted_ipv6_name'].append(key)
-            list_file = os.path.join(external_list_file_dir, key + '.csv')
-            if os.path.exists(list_file):
-                os.remove(list_file)
+            for suffix in ['.csv', '.validators']:
+                list_file = os.path.join(external_list_file_dir, key + suffix)
+                if os.path.exists(list_file):
+                    os.remove(list_file)
 
     if updated:
         return out
@@ -153,6 +172,50 @@ def geoip_updated(conf, firewall):
 
     return False
 
+def partial_updated(conf, firewall):
+    """
+    Chains and group types changed by a commit which only edits the rules
+    of existing chains and the members of existing groups, None if the
+    ruleset has to be loaded in full
+    """
+    if not os.path.exists(nftables_conf):
+        return None
+
+    out = {'name': set(), 'ipv6_name': set(), 'group': set()}
+    changes = get_diff_index(conf).get_changed_paths(['firewall'])
+    for path, change in changes.items():
+        path = list(path[1:])
+        if path in [[], ['name'], ['ipv6-name'], ['group']]:
+            if change != Change.MODIFY:
+                return None
+        elif path[0] in ['name', 'ipv6-name']:
+            # new or deleted chain
+            if len(path) == 2 and change != Change.MODIFY:
+                return None
+            out[path[0].replace('-', '_')].add(path[1])
+        elif path[0] == 'group' and path[1] in partial_group_types:
+            # new or deleted group
+            if len(path) <= 3 and change != Change.MODIFY:
+                return None
+            out['group'].add(path[1])
+        else:
+            return None
+
+    # sets private to a rule are created along with the chain
+    for name_type in ['name', 'ipv6_name']:
+        for name in out[name_type]:
+            effective = conf.get_config_dict(['firewall', name_type.replace('_', '-'), name],
+                                             key_mangling=('-', '_'), effective=True)
+            for tmp in [firewall[name_type][name], effective]:
+                for key in ['recent', 'fqdn', 'geoip']:
+                    if next(dict_search_recursive(tmp, key), None):
+                        return None
+
+    if not any(out.values()):
+        return None
+
+    return out
+
 def get_config(config=None):
     if config:
         conf = config
@@ -161,40 +224,16 @@ def get_config(config=None):
     base = ['firewall']
 
     firewall = conf.get_config_dict(base, key_mangling=('-', '_'), get_first_key=True,
-                                    no_tag_node_value_mangle=True)
-
-    # We have gathered the dict representation of the CLI, but there are
-    # default options which we need to update into the dictionary retrived.
-    # XXX: T2665: we currently have no nice way for defaults under tag
-    # nodes, thus we load the defaults "by hand"
-    default_values = defaults(base)
-    for tmp in ['name', 'ipv6_name']:
-        if tmp in default_values:
-            del default_values[tmp]
-
-    if 'zone' in default_values:
-        del default_values['zone']
-
-    firewall = dict_merge(default_values, firewall)
-
-    # Merge in defaults for IPv4 ruleset
-    if 'name' in firewall:
-        default_values = defaults(base + ['name'])
-        for name in firewall['name']:
-            firewall['name'][name] = dict_merge(default_values,
-                                                firewall['name'][name])
-
-    # Merge in defaults for IPv6 ruleset
-    if 'ipv6_name' in firewall:
-        default_values = defaults(base + ['ipv6-name'])
-        for ipv6_name in firewall['ipv6_name']:
-            firewall['ipv6_name'][ipv6_name] = dict_merge(default_values,
-                                                          firewall['ipv6_name'][ipv6_name])
+                                    no_tag_node_value_mangle=True, with_defaults=True)
 
-    if 'zone' in firewall:
-        default_values = defaults(base + ['zone'])
-        for zone in firewall['zone']:
-            firewall['zone'][zone] = dict_merge(default_values, firewall['zone'][zone])
+    # XXX: T2665: default values are not merged into the values of nested
+    # tag nodes, retrieve the IPv4/IPv6 rulesets and zones with their defaults
+    for node in ['name', 'ipv6-name', 'zone']:
+        key = node.replace('-', '_')
+        if key in firewall:
+            firewall[key] = conf.get_config_dict(base + [node], key_mangling=('-', '_'),
+                                                 no_tag_node_value_mangle=True,
+                                                 with_defaults=True)[key]
 
     firewall['group_resync'] = bool('group' in firewall or node_changed(conf, base + ['group']))
 
@@ -205,6 +244,7 @@ def get_config(config=None):
                                         key_mangling=('-', '_'), get_first_key=True,
                                         no_tag_node_value_mangle=True)
 
+    firewall['partial_updated'] = partial_updated(conf, firewall)
     firewall['external_list_updated'] = external_list_updated(conf, firewall)
     firewall['geoip_updated'] = geoip_updated(conf, firewall)
 
@@ -431,21 +471,69 @@ def generate(firewall):
         firewall['first_install'] = True
 
     if 'zone' in firewall:
-        for local_zone, local_zone_conf in firewall['zone'].items():
-            if 'local_zone' not in local_zone_conf:
+        firewall['zone_maps'] = {
+            'ipv4': zone_verdict_maps(firewall['zone']),
+            'ipv6': zone_verdict_maps(firewall['zone'], ipv6=True)
+        }
+
+    if 'optimize' in firewall:
+        rules = saved = 0
+        for name_type in ['name', 'ipv6_name']:
+            if name_type not in firewall:
                 continue
-
-            local_zone_conf['from_local'] = {}
-
-            for zone, zone_conf in firewall['zone'].items():
-                if zone == local_zone or 'from' not in zone_conf:
+            for name_conf in firewall[name_type].values():
+                if 'rule' not in name_conf:
                     continue
-                if local_zone in zone_conf['from']:
-                    local_zone_conf['from_local'][zone] = zone_conf['from'][local_zone]
+                name_conf['rule'], tmp = optimize_rules(name_conf['rule'])
+                rules += len(name_conf['rule']) + tmp
+                saved += tmp
+        if saved:
+            print(f'Firewall optimize: {rules} rules collapsed into {rules - saved}')
+
+    # fill the domain sets with the last resolutions of vyos-domain-resolver
+    firewall['domain_resolved'] = domain_sets_cached(firewall)
 
     render(nftables_conf, 'firewall/nftables.j2', firewall)
+
+    if firewall['partial_updated']:
+        firewall['partial'] = generate_partial(firewall)
+        if firewall['partial']:
+            render(nftables_partial_conf, 'firewall/nftables-partial.j2', firewall)
     return None
 
+def generate_partial(firewall):
+    """
+    Chains and sets for nftables-partial.j2, the sets being those of the
+    changed group types in every table holding them (filter, nat, policy)
+    """
+    updated = firewall['partial_updated']
+    out = {
+        'name': sorted(updated['name']),
+        'ipv6_name': sorted(updated['ipv6_name']),
+        'group': {},
+        'sets': {}
+    }
+    if not updated['group']:
+        return out
+
+    try:
+        nft_sets = loads(cmd('nft -j list sets'))['nftables']
+    except:
+        return None
+
+    prefixes = []
+    for group_type in updated['group']:
+        key = group_type.replace('-', '_')
+        out['group'][key] = firewall['group'][key]
+        prefixes += [partial_group_types[group_type] + name for name in firewall['group'][key]]
+
+    for obj in nft_sets:
+        if 'set' in obj and obj['set']['name'] in prefixes:
+            table = f'{obj["set"]["family"]} {obj["set"]["table"]}'
+            out['sets'].setdefault(table, []).append(obj['set']['name'])
+
+    return out
+
 def apply_sysfs(firewall):
     for name, conf in sysfs_config.items():
         paths = glob(conf['sysfs'])
@@ -514,24 +602,47 @@ def resync_policy_route():
     if tmp > 0:
         Warning(f'Failed to re-apply policy route configuration! {out}')
 
+def apply_partial(firewall):
+    """
+    Replace the changed chains and group sets in a single transaction,
+    the tables and all other sets are kept. Returns True on success.
+    """
+    if not firewall.get('partial'):
+        return False
+
+    install_result, output = rc_cmd(f'nft -f {nftables_partial_conf}')
+    if install_result != 0:
+        Warning(f'Failed to update firewall, reloading the full ruleset: {output}')
+        return False
+    return True
+
 def apply(firewall):
-    install_result, output = rc_cmd(f'nft -f {nftables_conf}')
-    if install_result == 1:
-        raise ConfigError(f'Failed to apply firewall: {output}')
+    commit_notes['apply'] = 'partial' if apply_partial(firewall) else 'full'
+
+    if commit_notes['apply'] == 'full':
+        install_result, output = rc_cmd(f'nft -f {nftables_conf}')
+        if install_result == 1:
+            raise ConfigError(f'Failed to apply firewall: {output}')
+
+        # the tables were recreated, external list sets are empty again
+        external_list_state_clear()
 
     apply_sysfs(firewall)
 
-    if firewall['group_resync']:
+    # a partial update already refreshed the sets of nat and policy route
+    if firewall['group_resync'] and commit_notes['apply'] == 'full':
         resync_nat()
         resync_policy_route()
 
     # T970 Enable a resolver (systemd daemon) that checks
     # domain-group/fqdn addresses and update entries for domains by timeout
     # If router loaded without internet connection or for synchronization
-    domain_action = 'stop'
-    if dict_search_args(firewall, 'group', 'domain_group') or firewall['ip_fqdn'] or firewall['ip6_fqdn']:
-        domain_action = 'restart'
-    call(f'systemctl {domain_action} vyos-domain-resolver.service')
+    # A partial update leaves the domain sets and their config untouched.
+    if commit_notes['apply'] == 'full':
+        domain_action = 'stop'
+        if dict_search_args(firewall, 'group', 'domain_group') or firewall['ip_fqdn'] or firewall['ip6_fqdn']:
+            domain_action = 'restart'
+        call(f'systemctl {domain_action} vyos-domain-resolver.service')
 
     if firewall['external_list_updated']:
         # Call helper script to Update set contents
@@ -279,30 +279,32 @@ def apply(policy):
 
     # Save original configuration prior to starting any commit actions
     frr_cfg = frr.FRRConfig()
+    frr_config = policy.get('new_frr_config', '')
+
+    if not frr.section_unchanged(bgp_daemon, 'policy', frr_config):
+        frr_cfg.load_configuration(bgp_daemon)
+        frr_cfg.modify_section(r'^bgp as-path access-list .*')
+        frr_cfg.modify_section(r'^bgp community-list .*')
+        frr_cfg.modify_section(r'^bgp extcommunity-list .*')
+        frr_cfg.modify_section(r'^bgp large-community-list .*')
+        frr_cfg.modify_section(r'^route-map .*', stop_pattern='^exit',
+                               remove_stop_mark=True)
+        if 'new_frr_config' in policy:
+            frr_cfg.add_before(frr.default_add_before, policy['new_frr_config'])
+        frr_cfg.commit_configuration(bgp_daemon, {'policy': frr_config})
 
     # The route-map used for the FIB (zebra) is part of the zebra daemon
-    frr_cfg.load_configuration(bgp_daemon)
-    frr_cfg.modify_section(r'^bgp as-path access-list .*')
-    frr_cfg.modify_section(r'^bgp community-list .*')
-    frr_cfg.modify_section(r'^bgp extcommunity-list .*')
-    frr_cfg.modify_section(r'^bgp large-community-list .*')
-    frr_cfg.modify_section(r'^route-map .*', stop_pattern='^exit',
-                           remove_stop_mark=True)
-    if 'new_frr_config' in policy:
-        frr_cfg.add_before(frr.default_add_before, policy['new_frr_config'])
-    frr_cfg.commit_configuration(bgp_daemon)
-
-    # The route-map used for the FIB (zebra) is part of the zebra daemon
-    frr_cfg.load_configuration(zebra_daemon)
-    frr_cfg.modify_section(r'^access-list .*')
-    frr_cfg.modify_section(r'^ipv6 access-list .*')
-    frr_cfg.modify_section(r'^ip prefix-list .*')
-    frr_cfg.modify_section(r'^ipv6 prefix-list .*')
-    frr_cfg.modify_section(r'^route-map .*', stop_pattern='^exit',
-                           remove_stop_mark=True)
-    if 'new_frr_config' in policy:
-        frr_cfg.add_before(frr.default_add_before, policy['new_frr_config'])
-    frr_cfg.commit_configuration(zebra_daemon)
+    if not frr.section_unchanged(zebra_daemon, 'policy', frr_config):
+        frr_cfg.load_configuration(zebra_daemon)
+        frr_cfg.modify_section(r'^access-list .*')
+        frr_cfg.modify_section(r'^ipv6 access-list .*')
+        frr_cfg.modify_section(r'^ip prefix-list .*')
+        frr_cfg.modify_section(r'^ipv6 prefix-list .*')
+        frr_cfg.modify_section(r'^route-map .*', stop_pattern='^exit',
+                               remove_stop_mark=True)
+        if 'new_frr_config' in policy:
+            frr_cfg.add_before(frr.default_add_before, policy['new_frr_config'])
+        frr_cfg.commit_configuration(zebra_daemon, {'policy': frr_config})
 
     return None
 
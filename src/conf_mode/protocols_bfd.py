@@ -105,11 +105,13 @@ def apply(bfd):
 
     # Save original configuration prior to starting any commit actions
     frr_cfg = frr.FRRConfig()
-    frr_cfg.load_configuration(bfd_daemon)
-    frr_cfg.modify_section('^bfd', stop_pattern='^exit', remove_stop_mark=True)
-    if 'new_frr_config' in bfd:
-        frr_cfg.add_before(frr.default_add_before, bfd['new_frr_config'])
-    frr_cfg.commit_configuration(bfd_daemon)
+    frr_config = bfd.get('new_frr_config', '')
+    if not frr.section_unchanged(bfd_daemon, 'bfd', frr_config):
+        frr_cfg.load_configuration(bfd_daemon)
+        frr_cfg.modify_section('^bfd', stop_pattern='^exit', remove_stop_mark=True)
+        if 'new_frr_config' in bfd:
+            frr_cfg.add_before(frr.default_add_before, bfd['new_frr_config'])
+        frr_cfg.commit_configuration(bfd_daemon, {'bfd': frr_config})
 
     return None
 
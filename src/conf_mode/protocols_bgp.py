@@ -359,24 +359,30 @@ def apply(bgp):
     # Save original configuration prior to starting any commit actions
     frr_cfg = frr.FRRConfig()
 
-    # The route-map used for the FIB (zebra) is part of the zebra daemon
-    frr_cfg.load_configuration(zebra_daemon)
-    frr_cfg.modify_section(r'(\s+)?ip protocol bgp route-map [-a-zA-Z0-9.]+', stop_pattern='(\s|!)')
-    if 'frr_zebra_config' in bgp:
-        frr_cfg.add_before(frr.default_add_before, bgp['frr_zebra_config'])
-    frr_cfg.commit_configuration(zebra_daemon)
-
     # Generate empty helper string which can be ammended to FRR commands, it
     # will be either empty (default VRF) or contain the "vrf <name" statement
     vrf = ''
     if 'vrf' in bgp:
         vrf = ' vrf ' + bgp['vrf']
 
-    frr_cfg.load_configuration(bgp_daemon)
-    frr_cfg.modify_section(f'^router bgp \d+{vrf}', stop_pattern='^exit', remove_stop_mark=True)
-    if 'frr_bgpd_config' in bgp:
-        frr_cfg.add_before(frr.default_add_before, bgp['frr_bgpd_config'])
-    frr_cfg.commit_configuration(bgp_daemon)
+    # The route-map used for the FIB (zebra) is part of the zebra daemon
+    zebra_context = f'ip protocol bgp{vrf}'
+    zebra_config = bgp.get('frr_zebra_config', '')
+    if not frr.section_unchanged(zebra_daemon, zebra_context, zebra_config):
+        frr_cfg.load_configuration(zebra_daemon)
+        frr_cfg.modify_section(r'(\s+)?ip protocol bgp route-map [-a-zA-Z0-9.]+', stop_pattern='(\s|!)')
+        if 'frr_zebra_config' in bgp:
+            frr_cfg.add_before(frr.default_add_before, bgp['frr_zebra_config'])
+        frr_cfg.commit_configuration(zebra_daemon, {zebra_context: zebra_config})
+
+    bgp_context = f'router bgp{vrf}'
+    bgp_config = bgp.get('frr_bgpd_config', '')
+    if not frr.section_unchanged(bgp_daemon, bgp_context, bgp_config):
+        frr_cfg.load_configuration(bgp_daemon)
+        frr_cfg.modify_section(f'^router bgp \d+{vrf}', stop_pattern='^exit', remove_stop_mark=True)
+        if 'frr_bgpd_config' in bgp:
+            frr_cfg.add_before(frr.default_add_before, bgp['frr_bgpd_config'])
+        frr_cfg.commit_configuration(bgp_daemon, {bgp_context: bgp_config})
 
     return None
 
@@ -91,24 +91,30 @@ def apply(eigrp):
     # Save original configuration prior to starting any commit actions
     frr_cfg = frr.FRRConfig()
 
-    # The route-map used for the FIB (zebra) is part of the zebra daemon
-    frr_cfg.load_configuration(zebra_daemon)
-    frr_cfg.modify_section(r'(\s+)?ip protocol eigrp route-map [-a-zA-Z0-9.]+', stop_pattern='(\s|!)')
-    if 'frr_zebra_config' in eigrp:
-        frr_cfg.add_before(frr.default_add_before, eigrp['frr_zebra_config'])
-    frr_cfg.commit_configuration(zebra_daemon)
-
     # Generate empty helper string which can be ammended to FRR commands, it
     # will be either empty (default VRF) or contain the "vrf <name" statement
     vrf = ''
     if 'vrf' in eigrp:
         vrf = ' vrf ' + eigrp['vrf']
 
-    frr_cfg.load_configuration(eigrp_daemon)
-    frr_cfg.modify_section(f'^router eigrp \d+{vrf}', stop_pattern='^exit', remove_stop_mark=True)
-    if 'frr_eigrpd_config' in eigrp:
-        frr_cfg.add_before(frr.default_add_before, eigrp['frr_eigrpd_config'])
-    frr_cfg.commit_configuration(eigrp_daemon)
+    # The route-map used for the FIB (zebra) is part of the zebra daemon
+    zebra_context = f'ip protocol eigrp{vrf}'
+    zebra_config = eigrp.get('frr_zebra_config', '')
+    if not frr.section_unchanged(zebra_daemon, zebra_context, zebra_config):
+        frr_cfg.load_configuration(zebra_daemon)
+        frr_cfg.modify_section(r'(\s+)?ip protocol eigrp route-map [-a-zA-Z0-9.]+', stop_pattern='(\s|!)')
+        if 'frr_zebra_config' in eigrp:
+            frr_cfg.add_before(frr.default_add_before, eigrp['frr_zebra_config'])
+        frr_cfg.commit_configuration(zebra_daemon, {zebra_context: zebra_config})
+
+    eigrp_context = f'router eigrp{vrf}'
+    eigrp_config = eigrp.get('frr_eigrpd_config', '')
+    if not frr.section_unchanged(eigrp_daemon, eigrp_context, eigrp_config):
+        frr_cfg.load_configuration(eigrp_daemon)
+        frr_cfg.modify_section(f'^router eigrp \d+{vrf}', stop_pattern='^exit', remove_stop_mark=True)
+        if 'frr_eigrpd_config' in eigrp:
+            frr_cfg.add_before(frr.default_add_before, eigrp['frr_eigrpd_config'])
+        frr_cfg.commit_configuration(eigrp_daemon, {eigrp_context: eigrp_config})
 
     return None
 
@@ -244,32 +244,38 @@ def apply(isis):
     # Save original configuration prior to starting any commit actions
     frr_cfg = frr.FRRConfig()
 
-    # The route-map used for the FIB (zebra) is part of the zebra daemon
-    frr_cfg.load_configuration(zebra_daemon)
-    frr_cfg.modify_section('(\s+)?ip protocol isis route-map [-a-zA-Z0-9.]+', stop_pattern='(\s|!)')
-    if 'frr_zebra_config' in isis:
-        frr_cfg.add_before(frr.default_add_before, isis['frr_zebra_config'])
-    frr_cfg.commit_configuration(zebra_daemon)
-
     # Generate empty helper string which can be ammended to FRR commands, it
     # will be either empty (default VRF) or contain the "vrf <name" statement
     vrf = ''
     if 'vrf' in isis:
         vrf = ' vrf ' + isis['vrf']
 
-    frr_cfg.load_configuration(isis_daemon)
-    frr_cfg.modify_section(f'^router isis VyOS{vrf}', stop_pattern='^exit', remove_stop_mark=True)
-
-    for key in ['interface', 'interface_removed']:
-        if key not in isis:
-            continue
-        for interface in isis[key]:
-            frr_cfg.modify_section(f'^interface {interface}{vrf}', stop_pattern='^exit', remove_stop_mark=True)
+    # The route-map used for the FIB (zebra) is part of the zebra daemon
+    zebra_context = f'ip protocol isis{vrf}'
+    zebra_config = isis.get('frr_zebra_config', '')
+    if not frr.section_unchanged(zebra_daemon, zebra_context, zebra_config):
+        frr_cfg.load_configuration(zebra_daemon)
+        frr_cfg.modify_section('(\s+)?ip protocol isis route-map [-a-zA-Z0-9.]+', stop_pattern='(\s|!)')
+        if 'frr_zebra_config' in isis:
+            frr_cfg.add_before(frr.default_add_before, isis['frr_zebra_config'])
+        frr_cfg.commit_configuration(zebra_daemon, {zebra_context: zebra_config})
+
+    isis_context = f'router isis{vrf}'
+    isis_config = isis.get('frr_isisd_config', '')
+    if not frr.section_unchanged(isis_daemon, isis_context, isis_config):
+        frr_cfg.load_configuration(isis_daemon)
+        frr_cfg.modify_section(f'^router isis VyOS{vrf}', stop_pattern='^exit', remove_stop_mark=True)
+
+        for key in ['interface', 'interface_removed']:
+            if key not in isis:
+                continue
+            for interface in isis[key]:
+                frr_cfg.modify_section(f'^interface {interface}{vrf}', stop_pattern='^exit', remove_stop_mark=True)
 
-    if 'frr_isisd_config' in isis:
-        frr_cfg.add_before(frr.default_add_before, isis['frr_isisd_config'])
+        if 'frr_isisd_config' in isis:
+            frr_cfg.add_before(frr.default_add_before, isis['frr_isisd_config'])
 
-    frr_cfg.commit_configuration(isis_daemon)
+        frr_cfg.commit_configuration(isis_daemon, {isis_context: isis_config})
 
     return None
 
@@ -77,12 +77,14 @@ def apply(mpls):
     # Save original configuration prior to starting any commit actions
     frr_cfg = frr.FRRConfig()
 
-    frr_cfg.load_configuration(ldpd_damon)
-    frr_cfg.modify_section(f'^mpls ldp', stop_pattern='^exit', remove_stop_mark=True)
-
-    if 'frr_ldpd_config' in mpls:
-        frr_cfg.add_before(frr.default_add_before, mpls['frr_ldpd_config'])
-    frr_cfg.commit_configuration(ldpd_damon)
+    frr_config = mpls.get('frr_ldpd_config', '')
+    if not frr.section_unchanged(ldpd_damon, 'mpls ldp', frr_config):
+        frr_cfg.load_configuration(ldpd_damon)
+        frr_cfg.modify_section(f'^mpls ldp', stop_pattern='^exit', remove_stop_mark=True)
+
+        if 'frr_ldpd_config' in mpls:
+            frr_cfg.add_before(frr.default_add_before, mpls['frr_ldpd_config'])
+        frr_cfg.commit_configuration(ldpd_damon, {'mpls ldp': frr_config})
 
     # Set number of entries in the platform label tables
     labels = '0'
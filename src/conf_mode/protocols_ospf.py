@@ -268,31 +268,37 @@ def apply(ospf):
     # Save original configuration prior to starting any commit actions
     frr_cfg = frr.FRRConfig()
 
-    # The route-map used for the FIB (zebra) is part of the zebra daemon
-    frr_cfg.load_configuration(zebra_daemon)
-    frr_cfg.modify_section('(\s+)?ip protocol ospf route-map [-a-zA-Z0-9.]+', stop_pattern='(\s|!)')
-    if 'frr_zebra_config' in ospf:
-        frr_cfg.add_before(frr.default_add_before, ospf['frr_zebra_config'])
-    frr_cfg.commit_configuration(zebra_daemon)
-
     # Generate empty helper string which can be ammended to FRR commands, it
     # will be either empty (default VRF) or contain the "vrf <name" statement
     vrf = ''
     if 'vrf' in ospf:
         vrf = ' vrf ' + ospf['vrf']
 
-    frr_cfg.load_configuration(ospf_daemon)
-    frr_cfg.modify_section(f'^router ospf{vrf}', stop_pattern='^exit', remove_stop_mark=True)
-
-    for key in ['interface', 'interface_removed']:
-        if key not in ospf:
-            continue
-        for interface in ospf[key]:
-            frr_cfg.modify_section(f'^interface {interface}{vrf}', stop_pattern='^exit', remove_stop_mark=True)
-
-    if 'frr_ospfd_config' in ospf:
-        frr_cfg.add_before(frr.default_add_before, ospf['frr_ospfd_config'])
-    frr_cfg.commit_configuration(ospf_daemon)
+    # The route-map used for the FIB (zebra) is part of the zebra daemon
+    zebra_context = f'ip protocol ospf{vrf}'
+    zebra_config = ospf.get('frr_zebra_config', '')
+    if not frr.section_unchanged(zebra_daemon, zebra_context, zebra_config):
+        frr_cfg.load_configuration(zebra_daemon)
+        frr_cfg.modify_section('(\s+)?ip protocol ospf route-map [-a-zA-Z0-9.]+', stop_pattern='(\s|!)')
+        if 'frr_zebra_config' in ospf:
+            frr_cfg.add_before(frr.default_add_before, ospf['frr_zebra_config'])
+        frr_cfg.commit_configuration(zebra_daemon, {zebra_context: zebra_config})
+
+    ospf_context = f'router ospf{vrf}'
+    ospf_config = ospf.get('frr_ospfd_config', '')
+    if not frr.section_unchanged(ospf_daemon, ospf_context, ospf_config):
+        frr_cfg.load_configuration(ospf_daemon)
+        frr_cfg.modify_section(f'^router ospf{vrf}', stop_pattern='^exit', remove_stop_mark=True)
+
+        for key in ['interface', 'interface_removed']:
+            if key not in ospf:
+                continue
+            for interface in ospf[key]:
+                frr_cfg.modify_section(f'^interface {interface}{vrf}', stop_pattern='^exit', remove_stop_mark=True)
+
+        if 'frr_ospfd_config' in ospf:
+            frr_cfg.add_before(frr.default_add_before, ospf['frr_ospfd_config'])
+        frr_cfg.commit_configuration(ospf_daemon, {ospf_context: ospf_config})
 
     return None
 
@@ -157,19 +157,22 @@ def apply(ospfv3):
     if 'vrf' in ospfv3:
         vrf = ' vrf ' + ospfv3['vrf']
 
-    frr_cfg.load_configuration(ospf6_daemon)
-    frr_cfg.modify_section(f'^router ospf6{vrf}', stop_pattern='^exit', remove_stop_mark=True)
-
-    for key in ['interface', 'interface_removed']:
-        if key not in ospfv3:
-            continue
-        for interface in ospfv3[key]:
-            frr_cfg.modify_section(f'^interface {interface}{vrf}', stop_pattern='^exit', remove_stop_mark=True)
-
-    if 'new_frr_config' in ospfv3:
-        frr_cfg.add_before(frr.default_add_before, ospfv3['new_frr_config'])
-
-    frr_cfg.commit_configuration(ospf6_daemon)
+    ospf6_context = f'router ospf6{vrf}'
+    ospf6_config = ospfv3.get('new_frr_config', '')
+    if not frr.section_unchanged(ospf6_daemon, ospf6_context, ospf6_config):
+        frr_cfg.load_configuration(ospf6_daemon)
+        frr_cfg.modify_section(f'^router ospf6{vrf}', stop_pattern='^exit', remove_stop_mark=True)
+
+        for key in ['interface', 'interface_removed']:
+            if key not in ospfv3:
+                continue
+            for interface in ospfv3[key]:
+                frr_cfg.modify_section(f'^interface {interface}{vrf}', stop_pattern='^exit', remove_stop_mark=True)
+
+        if 'new_frr_config' in ospfv3:
+            frr_cfg.add_before(frr.default_add_before, ospfv3['new_frr_config'])
+
+        frr_cfg.commit_configuration(ospf6_daemon, {ospf6_context: ospf6_config})
 
     return None
 
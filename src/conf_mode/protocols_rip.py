@@ -113,23 +113,27 @@ def apply(rip):
     frr_cfg = frr.FRRConfig()
 
     # The route-map used for the FIB (zebra) is part of the zebra daemon
-    frr_cfg.load_configuration(zebra_daemon)
-    frr_cfg.modify_section('^ip protocol rip route-map [-a-zA-Z0-9.]+', stop_pattern='(\s|!)')
-    frr_cfg.commit_configuration(zebra_daemon)
-
-    frr_cfg.load_configuration(rip_daemon)
-    frr_cfg.modify_section('^key chain \S+', stop_pattern='^exit', remove_stop_mark=True)
-    frr_cfg.modify_section('^router rip', stop_pattern='^exit', remove_stop_mark=True)
-
-    for key in ['interface', 'interface_removed']:
-        if key not in rip:
-            continue
-        for interface in rip[key]:
-            frr_cfg.modify_section(f'^interface {interface}', stop_pattern='^exit', remove_stop_mark=True)
-
-    if 'new_frr_config' in rip:
-        frr_cfg.add_before(frr.default_add_before, rip['new_frr_config'])
-    frr_cfg.commit_configuration(rip_daemon)
+    route_map = rip.get('route_map', '')
+    if not frr.section_unchanged(zebra_daemon, 'ip protocol rip', route_map):
+        frr_cfg.load_configuration(zebra_daemon)
+        frr_cfg.modify_section('^ip protocol rip route-map [-a-zA-Z0-9.]+', stop_pattern='(\s|!)')
+        frr_cfg.commit_configuration(zebra_daemon, {'ip protocol rip': route_map})
+
+    rip_config = rip.get('new_frr_config', '')
+    if not frr.section_unchanged(rip_daemon, 'router rip', rip_config):
+        frr_cfg.load_configuration(rip_daemon)
+        frr_cfg.modify_section('^key chain \S+', stop_pattern='^exit', remove_stop_mark=True)
+        frr_cfg.modify_section('^router rip', stop_pattern='^exit', remove_stop_mark=True)
+
+        for key in ['interface', 'interface_removed']:
+            if key not in rip:
+                continue
+            for interface in rip[key]:
+                frr_cfg.modify_section(f'^interface {interface}', stop_pattern='^exit', remove_stop_mark=True)
+
+        if 'new_frr_config' in rip:
+            frr_cfg.add_before(frr.default_add_before, rip['new_frr_config'])
+        frr_cfg.commit_configuration(rip_daemon, {'router rip': rip_config})
 
     return None
 
@@ -104,17 +104,21 @@ def apply(ripng):
     frr_cfg = frr.FRRConfig()
 
     # The route-map used for the FIB (zebra) is part of the zebra daemon
-    frr_cfg.load_configuration(zebra_daemon)
-    frr_cfg.modify_section('^ipv6 protocol ripng route-map [-a-zA-Z0-9.]+', stop_pattern='(\s|!)')
-    frr_cfg.commit_configuration(zebra_daemon)
-
-    frr_cfg.load_configuration(ripng_daemon)
-    frr_cfg.modify_section('key chain \S+', stop_pattern='^exit', remove_stop_mark=True)
-    frr_cfg.modify_section('interface \S+', stop_pattern='^exit', remove_stop_mark=True)
-    frr_cfg.modify_section('^router ripng', stop_pattern='^exit', remove_stop_mark=True)
-    if 'new_frr_config' in ripng:
-        frr_cfg.add_before(frr.default_add_before, ripng['new_frr_config'])
-    frr_cfg.commit_configuration(ripng_daemon)
+    route_map = ripng.get('route_map', '')
+    if not frr.section_unchanged(zebra_daemon, 'ipv6 protocol ripng', route_map):
+        frr_cfg.load_configuration(zebra_daemon)
+        frr_cfg.modify_section('^ipv6 protocol ripng route-map [-a-zA-Z0-9.]+', stop_pattern='(\s|!)')
+        frr_cfg.commit_configuration(zebra_daemon, {'ipv6 protocol ripng': route_map})
+
+    ripng_config = ripng.get('new_frr_config', '')
+    if not frr.section_unchanged(ripng_daemon, 'router ripng', ripng_config):
+        frr_cfg.load_configuration(ripng_daemon)
+        frr_cfg.modify_section('key chain \S+', stop_pattern='^exit', remove_stop_mark=True)
+        frr_cfg.modify_section('interface \S+', stop_pattern='^exit', remove_stop_mark=True)
+        frr_cfg.modify_section('^router ripng', stop_pattern='^exit', remove_stop_mark=True)
+        if 'new_frr_config' in ripng:
+            frr_cfg.add_before(frr.default_add_before, ripng['new_frr_config'])
+        frr_cfg.commit_configuration(ripng_daemon, {'router ripng': ripng_config})
 
     return None
 
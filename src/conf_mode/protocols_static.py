@@ -105,21 +105,27 @@ def apply(static):
     frr_cfg = frr.FRRConfig()
 
     # The route-map used for the FIB (zebra) is part of the zebra daemon
-    frr_cfg.load_configuration(zebra_daemon)
-    frr_cfg.modify_section(r'^ip protocol static route-map [-a-zA-Z0-9.]+', '')
-    frr_cfg.commit_configuration(zebra_daemon)
-    frr_cfg.load_configuration(static_daemon)
-
-    if 'vrf' in static:
-        vrf = static['vrf']
-        frr_cfg.modify_section(f'^vrf {vrf}', stop_pattern='^exit', remove_stop_mark=True)
-    else:
-        frr_cfg.modify_section(r'^ip route .*')
-        frr_cfg.modify_section(r'^ipv6 route .*')
-
-    if 'new_frr_config' in static:
-        frr_cfg.add_before(frr.default_add_before, static['new_frr_config'])
-    frr_cfg.commit_configuration(static_daemon)
+    route_map = static.get('route_map', '')
+    if not frr.section_unchanged(zebra_daemon, 'ip protocol static', route_map):
+        frr_cfg.load_configuration(zebra_daemon)
+        frr_cfg.modify_section(r'^ip protocol static route-map [-a-zA-Z0-9.]+', '')
+        frr_cfg.commit_configuration(zebra_daemon, {'ip protocol static': route_map})
+
+    static_context = 'vrf ' + static['vrf'] if 'vrf' in static else 'ip route'
+    static_config = static.get('new_frr_config', '')
+    if not frr.section_unchanged(static_daemon, static_context, static_config):
+        frr_cfg.load_configuration(static_daemon)
+
+        if 'vrf' in static:
+            vrf = static['vrf']
+            frr_cfg.modify_section(f'^vrf {vrf}', stop_pattern='^exit', remove_stop_mark=True)
+        else:
+            frr_cfg.modify_section(r'^ip route .*')
+            frr_cfg.modify_section(r'^ipv6 route .*')
+
+        if 'new_frr_config' in static:
+            frr_cfg.add_before(frr.default_add_before, static['new_frr_config'])
+        frr_cfg.commit_configuration(static_daemon, {static_context: static_config})
 
     return None
 
@@ -46,11 +46,13 @@ def generate(vrf):
 def apply(vrf):
     # add configuration to FRR
     frr_cfg = frr.FRRConfig()
-    frr_cfg.load_configuration(frr_daemon)
-    frr_cfg.modify_section(f'^vrf .+', stop_pattern='^exit-vrf', remove_stop_mark=True)
-    if 'new_frr_config' in vrf:
-        frr_cfg.add_before(frr.default_add_before, vrf['new_frr_config'])
-    frr_cfg.commit_configuration(frr_daemon)
+    frr_config = vrf.get('new_frr_config', '')
+    if not frr.section_unchanged(frr_daemon, 'vrf', frr_config):
+        frr_cfg.load_configuration(frr_daemon)
+        frr_cfg.modify_section(f'^vrf .+', stop_pattern='^exit-vrf', remove_stop_mark=True)
+        if 'new_frr_config' in vrf:
+            frr_cfg.add_before(frr.default_add_before, vrf['new_frr_config'])
+        frr_cfg.commit_configuration(frr_daemon, {'vrf': frr_config})
 
     return None
 
@@ -14,17 +14,27 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
+import heapq
 import json
 import os
 import time
 
+from socket import AF_INET
+
 from vyos.configdict import dict_merge
 from vyos.configquery import ConfigTreeQuery
+from vyos.firewall import domain_sets
 from vyos.firewall import fqdn_config_parse
-from vyos.firewall import fqdn_resolve
+from vyos.resolver import ResolveError
+from vyos.resolver import cache_load
+from vyos.resolver import cache_lookup
+from vyos.resolver import cache_prune
+from vyos.resolver import cache_save
+from vyos.resolver import cache_update
+from vyos.resolver import resolve
 from vyos.util import cmd
 from vyos.util import commit_in_progress
-from vyos.util import dict_search_args
 from vyos.util import run
 from vyos.xml import defaults
 
@@ -32,7 +42,18 @@ base = ['firewall']
 timeout = 300
 cache = False
 
+# Number of names resolved at the same time
+concurrency = 32
+# Bounds of the time a resolution is kept, the upper one being timeout
+min_ttl = 5
+retry_interval = 30
+
+# Last resolution of (domain, family), kept across failures if cache is set
 domain_state = {}
+# Addresses currently used for (domain, family)
+domain_addresses = {}
+# Resolutions shared with firewall commits, see vyos.resolver
+dns_cache = {}
 
 ipv4_tables = {
     'ip mangle',
@@ -71,23 +92,62 @@ def get_config(conf):
 
     return firewall
 
-def resolve(domains, ipv6=False):
-    global domain_state
-
-    ip_list = set()
-
-    for domain in domains:
-        resolved = fqdn_resolve(domain, ipv6=ipv6)
-
-        if resolved and cache:
-            domain_state[domain] = resolved
-        elif not resolved:
-            if domain not in domain_state:
-                continue
-            resolved = domain_state[domain]
-
-        ip_list = ip_list | resolved
-    return ip_list
+def get_sets(firewall):
+    """ (table, set name, family, domains) of every set filled by the resolver """
+    sets = []
+    for set_name, family, domains in domain_sets(firewall):
+        if set_name.startswith('FQDN_'):
+            tables = ['ip vyos_filter' if family == AF_INET else 'ip6 vyos_filter']
+        else:
+            tables = ipv4_tables if family == AF_INET else ipv6_tables
+        for table in tables:
+            sets.append((table, set_name, family, domains))
+    return sets
+
+async def resolve_domain(semaphore, domain, family):
+    """ Resolve domain, returns the number of seconds until it is due again """
+    async with semaphore:
+        try:
+            resolved, ttl = await resolve(domain, family)
+        except ResolveError as e:
+            print(e)
+            resolved, ttl = None, None
+
+    key = (domain, family)
+    if resolved and cache:
+        domain_state[key] = resolved
+    elif not resolved:
+        resolved = domain_state.get(key, set())
+        domain_addresses[key] = resolved
+        return retry_interval
+    domain_addresses[key] = resolved
+
+    ttl = timeout if ttl is None else max(min_ttl, min(ttl, timeout))
+    cache_update(dns_cache, domain, family, resolved, ttl)
+    return ttl
+
+def load_cache(names):
+    """
+    Start from the resolutions cached by a previous run: names are only
+    resolved again once they expire, instead of all at once on restart
+    """
+    global dns_cache
+    dns_cache = cache_load()
+    cache_prune(dns_cache, names)
+
+    due = {}
+    for domain, family in names:
+        tmp = cache_lookup(dns_cache, domain, family, stale=True)
+        if not tmp:
+            due[(domain, family)] = 0
+            continue
+        addresses, ttl = tmp
+        if cache:
+            domain_state[(domain, family)] = addresses
+        if ttl > 0:
+            domain_addresses[(domain, family)] = addresses
+        due[(domain, family)] = max(0, ttl)
+    return due
 
 def nft_output(table, set_name, ip_list):
     output = [f'flush set {table} {set_name}']
@@ -97,8 +157,9 @@ def nft_output(table, set_name, ip_list):
     return output
 
 def nft_valid_sets():
+    """ Handle of every set by (table, name), a recreated set has a new one """
     try:
-        valid_sets = []
+        valid_sets = {}
         sets_json = cmd('nft -j list sets')
         sets_obj = json.loads(sets_json)
 
@@ -107,61 +168,83 @@ def nft_valid_sets():
                 family = obj['set']['family']
                 table = obj['set']['table']
                 name = obj['set']['name']
-                valid_sets.append((f'{family} {table}', name))
+                valid_sets[(f'{family} {table}', name)] = obj['set'].get('handle')
 
         return valid_sets
     except:
-        return []
+        return {}
 
-def update(firewall):
+def update(sets, pushed):
+    """ Push the sets whose content changed since the last update """
     conf_lines = []
-    count = 0
+    updated = []
 
     valid_sets = nft_valid_sets()
 
-    domain_groups = dict_search_args(firewall, 'group', 'domain_group')
-    if domain_groups:
-        for set_name, domain_config in domain_groups.items():
-            if 'address' not in domain_config:
-                continue
-
-            nft_set_name = f'D_{set_name}'
-            domains = domain_config['address']
+    for table, set_name, family, domains in sets:
+        key = (table, set_name)
+        if key not in valid_sets:
+            continue
 
-            ip_list = resolve(domains, ipv6=False)
-            for table in ipv4_tables:
-                if (table, nft_set_name) in valid_sets:
-                    conf_lines += nft_output(table, nft_set_name, ip_list)
+        ip_list = set()
+        for domain in domains:
+            ip_list |= domain_addresses.get((domain, family), set())
 
-            ip6_list = resolve(domains, ipv6=True)
-            for table in ipv6_tables:
-                if (table, nft_set_name) in valid_sets:
-                    conf_lines += nft_output(table, nft_set_name, ip6_list)
-            count += 1
+        state = (valid_sets[key], ip_list)
+        if pushed.get(key) == state:
+            continue
 
-    for set_name, domain in firewall['ip_fqdn'].items():
-        table = 'ip vyos_filter'
-        nft_set_name = f'FQDN_{set_name}'
+        conf_lines += nft_output(table, set_name, sorted(ip_list))
+        pushed[key] = state
+        updated.append(key)
 
-        ip_list = resolve([domain], ipv6=False)
-
-        if (table, nft_set_name) in valid_sets:
-            conf_lines += nft_output(table, nft_set_name, ip_list)
-        count += 1
-
-    for set_name, domain in firewall['ip6_fqdn'].items():
-        table = 'ip6 vyos_filter'
-        nft_set_name = f'FQDN_{set_name}'
-
-        ip_list = resolve([domain], ipv6=True)
-        if (table, nft_set_name) in valid_sets:
-            conf_lines += nft_output(table, nft_set_name, ip_list)
-        count += 1
+    if not conf_lines:
+        return
 
     nft_conf_str = "\n".join(conf_lines) + "\n"
     code = run(f'nft -f -', input=nft_conf_str)
-
-    print(f'Updated {count} sets - result: {code}')
+    if code != 0:
+        # push them again on the next update
+        for key in updated:
+            del pushed[key]
+
+    print(f'Updated {len(updated)} sets - result: {code}')
+
+async def resolver(firewall):
+    """
+    Resolve every domain again once its records expired, and push the
+    sets that changed after each round
+    """
+    sets = get_sets(firewall)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    due = load_cache({(d, fam) for _, _, fam, domains in sets for d in domains})
+    now = loop.time()
+    schedule = [(now + delay, domain, family) for (domain, family), delay in due.items()]
+    heapq.heapify(schedule)
+    pushed = {}
+
+    while schedule:
+        now = loop.time()
+        due = []
+        while schedule and schedule[0][0] <= now:
+            due.append(heapq.heappop(schedule)[1:])
+
+        delays = await asyncio.gather(*[resolve_domain(semaphore, domain, family)
+                                        for domain, family in due])
+        now = loop.time()
+        for (domain, family), delay in zip(due, delays):
+            heapq.heappush(schedule, (now + delay, domain, family))
+        if due:
+            try:
+                cache_save(dns_cache)
+            except OSError as e:
+                print(f'Failed to save resolver cache: {e}')
+
+        update(sets, pushed)
+
+        await asyncio.sleep(max(0, schedule[0][0] - loop.time()))
 
 if __name__ == '__main__':
     print(f'VyOS domain resolver')
@@ -178,6 +261,4 @@ if __name__ == '__main__':
 
     print(f'interval: {timeout}s - cache: {cache}')
 
-    while True:
-        update(firewall)
-        time.sleep(timeout)
+    asyncio.run(resolver(firewall))
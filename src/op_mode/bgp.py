@@ -82,8 +82,8 @@ def show_neighbors(raw: bool,
     frr_command = frr_command_template.render(kwargs)
     frr_command = re.sub(r'\s+', ' ', frr_command)
 
-    from vyos.util import cmd
-    output = cmd(f"vtysh -c '{frr_command}'")
+    from vyos.frr import execute
+    output = execute(frr_command)
 
     if raw:
         from json import loads
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import sys
+import typing
+
+import vyos.opmode
+from vyos.defaults import commit_timing_log
+
+stage_names = ['get_config', 'verify', 'generate', 'apply']
+result_names = {1: 'success', 2: 'error', 4: 'daemon error', 8: 'pass'}
+
+# number of slowest stages highlighted
+slowest_count = 10
+
+def _get_records():
+    """ Per script records of vyos-configd, in order of execution """
+    records = []
+    try:
+        with open(commit_timing_log) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+def _get_raw_data(count):
+    commits = {}
+    for r in _get_records():
+        commits.setdefault(r.get('commit') or 0, []).append(r)
+
+    res = []
+    for commit_id in sorted(commits)[-count:]:
+        scripts = commits[commit_id]
+        stages = [s for r in scripts for s in r['stages'].values()]
+        res.append({
+            'commit': commit_id,
+            'scripts': [{
+                'script': r['script'],
+                'tagnode': r['tagnode'],
+                'result': result_names.get(r['result'], r['result']),
+                'wall_ms': r['wall_ms'],
+                'stages': r['stages'],
+                'notes': r.get('notes', {})
+            } for r in scripts],
+            'wall_ms': round(sum(r['wall_ms'] for r in scripts), 3),
+            'cpu_ms': round(sum(s['cpu_ms'] for s in stages), 3),
+            'child_cpu_ms': round(sum(s['child_cpu_ms'] for s in stages), 3),
+            'subprocesses': sum(s['subprocesses'] for s in stages),
+            'maxrss_kib': max([s['maxrss_kib'] for s in stages], default=0)
+        })
+
+    return res
+
+def _get_slowest_stages(data):
+    stages = []
+    for commit in data:
+        for script in commit['scripts']:
+            for stage, usage in script['stages'].items():
+                stages.append((usage['wall_ms'], commit['commit'],
+                               script['script'], script['tagnode'], stage,
+                               usage))
+    stages.sort(key=lambda x: x[0], reverse=True)
+    return stages[:slowest_count]
+
+def _get_formatted_output(data):
+    from datetime import datetime
+    from tabulate import tabulate
+
+    if not data:
+        return 'No commit timing information available'
+
+    def script_name(script, tagnode):
+        return f'{script} ({tagnode})' if tagnode else script
+
+    out = []
+    for commit in data:
+        start = datetime.fromtimestamp(commit['commit']).strftime('%Y-%m-%d %H:%M:%S')
+        out.append(f'Commit {start}: {len(commit["scripts"])} scripts, '
+                   f'{commit["wall_ms"]:.1f} ms wall, '
+                   f'{commit["cpu_ms"]:.1f} ms CPU, '
+                   f'{commit["child_cpu_ms"]:.1f} ms subprocess CPU, '
+                   f'{commit["subprocesses"]} subprocesses, '
+                   f'peak RSS {commit["maxrss_kib"]} KiB')
+        headers = ['Script', 'Result'] + [f'{s} (ms)' for s in stage_names] + ['Total (ms)', 'Notes']
+        rows = []
+        for script in commit['scripts']:
+            notes = ', '.join(f'{k}: {v}' for k, v in script['notes'].items())
+            rows.append([script_name(script['script'], script['tagnode']),
+                         script['result']] +
+                        [script['stages'][s]['wall_ms'] if s in script['stages'] else '-'
+                         for s in stage_names] +
+                        [script['wall_ms'], notes])
+        out.append(tabulate(rows, headers, floatfmt='.1f'))
+        out.append('')
+
+    headers = ['Commit', 'Script', 'Stage', 'Wall (ms)', 'CPU (ms)',
+               'Subprocess CPU (ms)', 'Subprocesses', 'Peak RSS (KiB)']
+    rows = []
+    for wall, commit_id, script, tagnode, stage, usage in _get_slowest_stages(data):
+        rows.append([datetime.fromtimestamp(commit_id).strftime('%H:%M:%S'),
+                     script_name(script, tagnode), stage, wall, usage['cpu_ms'],
+                     usage['child_cpu_ms'], usage['subprocesses'],
+                     usage['maxrss_kib']])
+    out.append('Slowest stages:')
+    out.append(tabulate(rows, headers, floatfmt='.1f'))
+
+    return '\n'.join(out)
+
+def show_timing(raw: bool, count: typing.Optional[int]):
+    if count is None:
+        count = 1
+    if count < 1:
+        raise ValueError('Number of commits must be a positive integer')
+
+    data = _get_raw_data(count)
+    if raw:
+        return data
+
+    return _get_formatted_output(data)
+
+if __name__ == '__main__':
+    try:
+        res = vyos.opmode.run(sys.modules[__name__])
+        if res:
+            print(res)
+    except (ValueError, vyos.opmode.Error) as e:
+        print(e)
+        sys.exit(1)
@@ -15,48 +15,23 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import sys
-import xmltodict
+import typing
 
 from tabulate import tabulate
+from vyos.conntrack import get_flows
+from vyos.conntrack import raw_document
+from vyos.conntrack import top
 from vyos.util import cmd
-from vyos.util import run
 
 import vyos.opmode
 
 
-def _get_xml_data(family):
-    """
-    Get conntrack XML output
-    """
-    return cmd(f'sudo conntrack --dump --family {family} --output xml')
-
-
-def _xml_to_dict(xml):
-    """
-    Convert XML to dictionary
-    Return: dictionary
-    """
-    parse = xmltodict.parse(xml, attr_prefix='')
-    # If only one conntrack entry we must change dict
-    if 'meta' in parse['conntrack']['flow']:
-        return dict(conntrack={'flow': [parse['conntrack']['flow']]})
-    return parse
-
-
-def _get_raw_data(family):
+def _get_raw_data(family, source=None, destination=None, protocol=None, zone=None):
     """
     Return: dictionary
     """
-    xml = _get_xml_data(family)
-    if len(xml) == 0:
-        output = {'conntrack':
-            {
-                'error': True,
-                'reason': 'entries not found'
-            }
-        }
-        return output
-    return _xml_to_dict(xml)
+    return raw_document(get_flows(family, src=source, dst=destination,
+                                  proto=protocol, zone=zone, as_dict=True))
 
 
 def _get_raw_statistics():
@@ -74,65 +49,60 @@ def get_formatted_statistics(entries):
     return output
 
 
-def get_formatted_output(dict_data):
+def _address(address, port):
+    return f'{address}:{port}' if port else address
+
+
+def get_formatted_output(flows, family='ipv4'):
     """
-    :param xml:
-    :return: formatted output
+    :param flows: iterable of Flow
+    :return: formatted output, line by line
     """
-    data_entries = []
-    if 'error' in dict_data['conntrack']:
-        return 'Entries not found'
-    for entry in dict_data['conntrack']['flow']:
-        orig_src, orig_dst, orig_sport, orig_dport = {}, {}, {}, {}
-        reply_src, reply_dst, reply_sport, reply_dport = {}, {}, {}, {}
-        proto = {}
-        for meta in entry['meta']:
-            direction = meta['direction']
-            if direction in ['original']:
-                if 'layer3' in meta:
-                    orig_src = meta['layer3']['src']
-                    orig_dst = meta['layer3']['dst']
-                if 'layer4' in meta:
-                    if meta.get('layer4').get('sport'):
-                        orig_sport = meta['layer4']['sport']
-                    if meta.get('layer4').get('dport'):
-                        orig_dport = meta['layer4']['dport']
-                    proto = meta['layer4']['protoname']
-            if direction in ['reply']:
-                if 'layer3' in meta:
-                    reply_src = meta['layer3']['src']
-                    reply_dst = meta['layer3']['dst']
-                if 'layer4' in meta:
-                    if meta.get('layer4').get('sport'):
-                        reply_sport = meta['layer4']['sport']
-                    if meta.get('layer4').get('dport'):
-                        reply_dport = meta['layer4']['dport']
-                    proto = meta['layer4']['protoname']
-            if direction == 'independent':
-                conn_id = meta['id']
-                timeout = meta['timeout']
-                orig_src = f'{orig_src}:{orig_sport}' if orig_sport else orig_src
-                orig_dst = f'{orig_dst}:{orig_dport}' if orig_dport else orig_dst
-                reply_src = f'{reply_src}:{reply_sport}' if reply_sport else reply_src
-                reply_dst = f'{reply_dst}:{reply_dport}' if reply_dport else reply_dst
-                state = meta['state'] if 'state' in meta else ''
-                mark = meta['mark']
-                zone = meta['zone'] if 'zone' in meta else ''
-                data_entries.append(
-                    [conn_id, orig_src, orig_dst, reply_src, reply_dst, proto, state, timeout, mark, zone])
+    address = 21 if family == 'ipv4' else 45
     headers = ["Id", "Original src", "Original dst", "Reply src", "Reply dst", "Protocol", "State", "Timeout", "Mark",
                "Zone"]
-    output = tabulate(data_entries, headers, numalign="left")
-    return output
+    widths = [10, address, address, address, address, 8, 11, 7, 10, 5]
+    rows = ([flow.id,
+             _address(flow.orig_src, flow.orig_sport),
+             _address(flow.orig_dst, flow.orig_dport),
+             _address(flow.reply_src, flow.reply_sport),
+             _address(flow.reply_dst, flow.reply_dport),
+             flow.proto, flow.state, flow.timeout, flow.mark, flow.zone] for flow in flows)
+    return vyos.opmode.stream_table(rows, headers, widths)
+
+
+def get_formatted_top(entries, key, by):
+    if not entries:
+        return 'Entries not found'
+    headers = [key.capitalize().replace('-', ' '), by.capitalize()]
+    return tabulate(entries, headers, numalign="left")
+
+
+def show(raw: bool, family: str, source: typing.Optional[str],
+         destination: typing.Optional[str], protocol: typing.Optional[str],
+         zone: typing.Optional[int]):
+    family = 'ipv6' if family == 'inet6' else 'ipv4'
+    if raw:
+        return _get_raw_data(family, source, destination, protocol, zone)
+    else:
+        return get_formatted_output(get_flows(family, src=source, dst=destination,
+                                              proto=protocol, zone=zone), family)
 
 
-def show(raw: bool, family: str):
+def show_top(raw: bool, family: str, key: str, count: typing.Optional[int],
+             by: typing.Optional[str], protocol: typing.Optional[str],
+             zone: typing.Optional[int]):
     family = 'ipv6' if family == 'inet6' else 'ipv4'
-    conntrack_data = _get_raw_data(family)
+    if count is None:
+        count = 10
+    if by is None:
+        by = 'flows'
+    flows = get_flows(family, proto=protocol, zone=zone)
+    entries = top(flows, key, count, by)
     if raw:
-        return conntrack_data
+        return [{'value': value, by: total} for value, total in entries]
     else:
-        return get_formatted_output(conntrack_data)
+        return get_formatted_top(entries, key, by)
 
 
 def show_statistics(raw: bool):
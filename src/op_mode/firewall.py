@@ -16,14 +16,24 @@
 
 import argparse
 import ipaddress
-import json
 import re
 import tabulate
 
 from vyos.config import Config
-from vyos.util import cmd
+from vyos.nftables import Counters
+from vyos.nftables import get_rules_text
 from vyos.util import dict_search_args
 
+# counters of the whole ruleset and rule statements per table, read once
+_counters = None
+_rules_text = {}
+
+def get_counters():
+    global _counters
+    if _counters is None:
+        _counters = Counters()
+    return _counters
+
 def get_firewall_interfaces(firewall, name=None, ipv6=False):
     directions = ['in', 'out', 'local']
 
@@ -76,30 +86,37 @@ def get_config_firewall(conf, name=None, ipv6=False, interfaces=True):
         get_firewall_interfaces(firewall, name, ipv6)
     return firewall
 
-def get_nftables_details(name, ipv6=False):
+def get_nftables_details(name, ipv6=False, delta=None):
     suffix = '6' if ipv6 else ''
     name_prefix = 'NAME6_' if ipv6 else 'NAME_'
-    command = f'sudo nft list chain ip{suffix} vyos_filter {name_prefix}{name}'
+    table = f'ip{suffix} vyos_filter'
+    chain = f'{name_prefix}{name}'
+
     try:
-        results = cmd(command)
+        counters = get_counters()
+        if table not in _rules_text:
+            _rules_text[table] = get_rules_text(table)
     except:
         return {}
 
     out = {}
-    for line in results.split('\n'):
-        comment_search = re.search(rf'{name}[\- ](\d+|default-action)', line)
+    for comment, counter in counters.chain(table, chain):
+        # rules merged by "set firewall optimize" share one comment and counter
+        comment_search = re.match(rf'{re.escape(name)}[\- ](\d+(?:,\d+)*|default-action)', comment)
         if not comment_search:
             continue
 
-        rule = {}
-        rule_id = comment_search[1]
-        counter_search = re.search(r'counter packets (\d+) bytes (\d+)', line)
-        if counter_search:
-            rule['packets'] = counter_search[1]
-            rule['bytes'] = counter_search[2]
-
-        rule['conditions'] = re.sub(r'(\b(counter packets \d+ bytes \d+|drop|reject|return|log)\b|comment "[\w\-]+")', '', line).strip()
-        out[rule_id] = rule
+        rule = {
+            'packets': counter['packets'],
+            'bytes': counter['bytes'],
+            'conditions': re.sub(r'\b(drop|reject|return|log)\b', '',
+                                 _rules_text[table].get((chain, comment), '')).strip()
+        }
+        if delta and (table, chain, comment) in delta:
+            rule.update(delta[(table, chain, comment)])
+
+        for rule_id in comment_search[1].split(','):
+            out[rule_id] = rule
     return out
 
 def output_firewall_name(name, name_conf, ipv6=False, single_rule_id=None):
@@ -140,16 +157,22 @@ def output_firewall_name(name, name_conf, ipv6=False, single_rule_id=None):
         header = ['Rule', 'Action', 'Protocol', 'Packets', 'Bytes', 'Conditions']
         print(tabulate.tabulate(rows, header) + '\n')
 
-def output_firewall_name_statistics(name, name_conf, ipv6=False, single_rule_id=None):
+def output_firewall_name_statistics(name, name_conf, ipv6=False, single_rule_id=None, delta=None):
     ip_str = 'IPv6' if ipv6 else 'IPv4'
     print(f'\n---------------------------------\n{ip_str} Firewall "{name}"\n')
 
     if name_conf['interface']:
         print('Active on: {0}\n'.format(" ".join(name_conf['interface'])))
 
-    details = get_nftables_details(name, ipv6)
+    details = get_nftables_details(name, ipv6, delta)
     rows = []
 
+    def rates(rule_details):
+        if not delta:
+            return []
+        return [rule_details.get('packets_per_second', '-'),
+                rule_details.get('bytes_per_second', '-')]
+
     if 'rule' in name_conf:
         for rule_id, rule_conf in name_conf['rule'].items():
             if single_rule_id and rule_id != single_rule_id:
@@ -162,13 +185,10 @@ def output_firewall_name_statistics(name, name_conf, ipv6=False, single_rule_id=
             dest_addr = dict_search_args(rule_conf, 'destination', 'address') or '0.0.0.0/0'
 
             row = [rule_id]
-            if rule_id in details:
-                rule_details = details[rule_id]
-                row.append(rule_details.get('packets', 0))
-                row.append(rule_details.get('bytes', 0))
-            else:
-                row.append('0')
-                row.append('0')
+            rule_details = details.get(rule_id, {})
+            row.append(rule_details.get('packets', 0))
+            row.append(rule_details.get('bytes', 0))
+            row += rates(rule_details)
             row.append(rule_conf['action'])
             row.append(source_addr)
             row.append(dest_addr)
@@ -176,20 +196,18 @@ def output_firewall_name_statistics(name, name_conf, ipv6=False, single_rule_id=
 
     if 'default_action' in name_conf and not single_rule_id:
         row = ['default']
-        if 'default-action' in details:
-            rule_details = details['default-action']
-            row.append(rule_details.get('packets', 0))
-            row.append(rule_details.get('bytes', 0))
-        else:
-            row.append('0')
-            row.append('0')
+        rule_details = details.get('default-action', {})
+        row.append(rule_details.get('packets', 0))
+        row.append(rule_details.get('bytes', 0))
+        row += rates(rule_details)
         row.append(name_conf['default_action'])
         row.append('0.0.0.0/0') # Source
         row.append('0.0.0.0/0') # Dest
         rows.append(row)
 
     if rows:
-        header = ['Rule', 'Packets', 'Bytes', 'Action', 'Source', 'Destination']
+        header = ['Rule', 'Packets', 'Bytes'] + (['Packets/s', 'Bytes/s'] if delta else []) + \
+                 ['Action', 'Source', 'Destination']
         print(tabulate.tabulate(rows, header) + '\n')
 
 def show_firewall():
@@ -310,7 +328,7 @@ def show_summary():
 
     show_firewall_group()
 
-def show_statistics():
+def show_statistics(delta=False):
     print('Rulesets Statistics')
 
     conf = Config()
@@ -319,13 +337,25 @@ def show_statistics():
     if not firewall:
         return
 
+    counters_delta = None
+    if delta:
+        # rates since the previous "show firewall statistics delta"
+        counters = get_counters()
+        previous = Counters.load('firewall')
+        counters_delta = counters.delta(previous)
+        counters.save('firewall')
+        if previous:
+            print(f'Rates over the last {counters.time - previous.time:.1f} seconds')
+        else:
+            print('No previous statistics, rates are shown from the next run on')
+
     if 'name' in firewall:
         for name, name_conf in firewall['name'].items():
-            output_firewall_name_statistics(name, name_conf, ipv6=False)
+            output_firewall_name_statistics(name, name_conf, ipv6=False, delta=counters_delta)
 
     if 'ipv6_name' in firewall:
         for name, name_conf in firewall['ipv6_name'].items():
-            output_firewall_name_statistics(name, name_conf, ipv6=True)
+            output_firewall_name_statistics(name, name_conf, ipv6=True, delta=counters_delta)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -333,6 +363,7 @@ if __name__ == '__main__':
     parser.add_argument('--name', help='Firewall name', required=False, action='store', nargs='?', default='')
     parser.add_argument('--rule', help='Firewall Rule ID', required=False)
     parser.add_argument('--ipv6', help='IPv6 toggle', action='store_true')
+    parser.add_argument('--delta', help='Show rates since the previous run', action='store_true')
 
     args = parser.parse_args()
 
@@ -346,6 +377,6 @@ if __name__ == '__main__':
     elif args.action == 'show_group':
         show_firewall_group(args.name)
     elif args.action == 'show_statistics':
-        show_statistics()
+        show_statistics(args.delta)
     elif args.action == 'show_summary':
         show_summary()
@@ -15,16 +15,18 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import jmespath
-import json
 import sys
-import xmltodict
 
 from sys import exit
 from tabulate import tabulate
 
 from vyos.configquery import ConfigTreeQuery
 
-from vyos.util import cmd
+from vyos.conntrack import get_flows
+from vyos.conntrack import raw_document
+from vyos.nftables import Counters
+from vyos.nftables import get_ruleset
+from vyos.nftables import rule_counter
 from vyos.util import dict_search
 
 import vyos.opmode
@@ -34,68 +36,67 @@ base = 'nat'
 unconf_message = 'NAT is not configured'
 
 
-def _get_xml_translation(direction, family):
-    """
-    Get conntrack XML output --src-nat|--dst-nat
-    """
-    if direction == 'source':
-        opt = '--src-nat'
-    if direction == 'destination':
-        opt = '--dst-nat'
-    return cmd(f'sudo conntrack --dump --family {family} {opt} --output xml')
-
-
-def _xml_to_dict(xml):
-    """
-    Convert XML to dictionary
-    Return: dictionary
-    """
-    parse = xmltodict.parse(xml, attr_prefix='')
-    # If only one conntrack entry we must change dict
-    if 'meta' in parse['conntrack']['flow']:
-        return dict(conntrack={'flow': [parse['conntrack']['flow']]})
-    return parse
+def _get_table_chain(direction, family):
+    chain = 'POSTROUTING' if direction == 'source' else 'PREROUTING'
+    family = 'ip6' if family == 'inet6' else 'ip'
+    return f'{family} vyos_nat', chain
 
 
-def _get_json_data(direction, family):
+def _get_ruleset(direction, family):
     """
-    Get NAT format JSON
+    JSON objects of the NAT table, read once for rules and counters
     """
-    if direction == 'source':
-        chain = 'POSTROUTING'
-    if direction == 'destination':
-        chain = 'PREROUTING'
-    family = 'ip6' if family == 'inet6' else 'ip'
-    return cmd(f'sudo nft --json list chain {family} vyos_nat {chain}')
+    table, _ = _get_table_chain(direction, family)
+    return get_ruleset(table)
 
 
-def _get_raw_data_rules(direction, family):
+def _get_raw_data_rules(direction, family, ruleset=None):
     """Get interested rules
     :returns dict
     """
-    data = _get_json_data(direction, family)
-    data_dict = json.loads(data)
+    if ruleset is None:
+        ruleset = _get_ruleset(direction, family)
+    _, chain = _get_table_chain(direction, family)
     rules = []
-    for rule in data_dict['nftables']:
-        if 'rule' in rule and 'comment' in rule['rule']:
+    for rule in ruleset:
+        if 'rule' in rule and 'comment' in rule['rule'] and rule['rule']['chain'] == chain:
             rules.append(rule)
     return rules
 
 
+def _get_raw_data_statistics(direction, family, delta=False):
+    """
+    The rules with their counters, like _get_raw_data_rules(). In delta
+    mode every rule also holds the increase of its counters and their rate
+    since the previous run under 'delta'.
+    """
+    ruleset = _get_ruleset(direction, family)
+    rules = _get_raw_data_rules(direction, family, ruleset)
+    if not delta:
+        return rules
+
+    table, chain = _get_table_chain(direction, family)
+    counters = Counters(ruleset)
+    snapshot = f'nat-{direction}-{family}'
+    stats = counters.delta(Counters.load(snapshot))
+    counters.save(snapshot)
+    for rule in rules:
+        tmp = stats.get((table, chain, rule['rule']['comment']), {})
+        rule['delta'] = {k: v for k, v in tmp.items() if k not in ['packets', 'bytes']}
+    return rules
+
+
+def _get_rule_interface(rule):
+    if 'expr' in rule['rule'] and jmespath.search('rule.expr[*].match.left.meta', rule):
+        return rule.get('rule').get('expr')[0].get('match').get('right')
+    return 'any'
+
+
 def _get_raw_translation(direction, family):
     """
     Return: dictionary
     """
-    xml = _get_xml_translation(direction, family)
-    if len(xml) == 0:
-        output = {'conntrack':
-            {
-                'error': True,
-                'reason': 'entries not found'
-            }
-        }
-        return output
-    return _xml_to_dict(xml)
+    return raw_document(get_flows(family, nat=direction, as_dict=True))
 
 
 def _get_formatted_output_rules(data, direction, family):
@@ -213,74 +214,44 @@ port {port}'''
     return output
 
 
-def _get_formatted_output_statistics(data, direction):
+def _get_formatted_output_statistics(data, direction, delta=False):
     data_entries = []
     for rule in data:
-        if 'comment' in rule['rule']:
-            comment = rule.get('rule').get('comment')
-            rule_number = comment.split('-')[-1]
-            rule_number = rule_number.split(' ')[0]
-        if 'expr' in rule['rule']:
-            interface = rule.get('rule').get('expr')[0].get('match').get('right') \
-                if jmespath.search('rule.expr[*].match.left.meta', rule) else 'any'
-            packets = jmespath.search('rule.expr[*].counter.packets | [0]', rule)
-            _bytes = jmespath.search('rule.expr[*].counter.bytes | [0]', rule)
-        data_entries.append([rule_number, packets, _bytes, interface])
-    headers = ["Rule", "Packets", "Bytes", "Interface"]
+        comment = rule['rule']['comment']
+        rule_number = comment.split('-')[-1].split(' ')[0]
+        packets, _bytes = rule_counter(rule['rule']) or (None, None)
+        row = [rule_number, packets, _bytes]
+        if delta:
+            row += [rule['delta'].get('packets_per_second', '-'),
+                    rule['delta'].get('bytes_per_second', '-')]
+        data_entries.append(row + [_get_rule_interface(rule)])
+    headers = ["Rule", "Packets", "Bytes"]
+    if delta:
+        headers += ["Packets/s", "Bytes/s"]
+    headers.append("Interface")
     output = tabulate(data_entries, headers, numalign="left")
     return output
 
 
-def _get_formatted_translation(dict_data, nat_direction, family):
-    data_entries = []
-    if 'error' in dict_data['conntrack']:
-        return 'Entries not found'
-    for entry in dict_data['conntrack']['flow']:
-        orig_src, orig_dst, orig_sport, orig_dport = {}, {}, {}, {}
-        reply_src, reply_dst, reply_sport, reply_dport = {}, {}, {}, {}
-        proto = {}
-        for meta in entry['meta']:
-            direction = meta['direction']
-            if direction in ['original']:
-                if 'layer3' in meta:
-                    orig_src = meta['layer3']['src']
-                    orig_dst = meta['layer3']['dst']
-                if 'layer4' in meta:
-                    if meta.get('layer4').get('sport'):
-                        orig_sport = meta['layer4']['sport']
-                    if meta.get('layer4').get('dport'):
-                        orig_dport = meta['layer4']['dport']
-                    proto = meta['layer4']['protoname']
-            if direction in ['reply']:
-                if 'layer3' in meta:
-                    reply_src = meta['layer3']['src']
-                    reply_dst = meta['layer3']['dst']
-                if 'layer4' in meta:
-                    if meta.get('layer4').get('sport'):
-                        reply_sport = meta['layer4']['sport']
-                    if meta.get('layer4').get('dport'):
-                        reply_dport = meta['layer4']['dport']
-                    proto = meta['layer4']['protoname']
-            if direction == 'independent':
-                conn_id = meta['id']
-                timeout = meta['timeout']
-                orig_src = f'{orig_src}:{orig_sport}' if orig_sport else orig_src
-                orig_dst = f'{orig_dst}:{orig_dport}' if orig_dport else orig_dst
-                reply_src = f'{reply_src}:{reply_sport}' if reply_sport else reply_src
-                reply_dst = f'{reply_dst}:{reply_dport}' if reply_dport else reply_dst
-                state = meta['state'] if 'state' in meta else ''
-                mark = meta['mark']
-                zone = meta['zone'] if 'zone' in meta else ''
-                if nat_direction == 'source':
-                    data_entries.append(
-                        [orig_src, reply_dst, proto, timeout, mark, zone])
-                elif nat_direction == 'destination':
-                    data_entries.append(
-                        [orig_dst, reply_src, proto, timeout, mark, zone])
+def _address(address, port):
+    return f'{address}:{port}' if port else address
+
 
+def _get_formatted_translation(flows, nat_direction, family):
+    def rows():
+        for flow in flows:
+            if nat_direction == 'source':
+                pre_nat = _address(flow.orig_src, flow.orig_sport)
+                post_nat = _address(flow.reply_dst, flow.reply_dport)
+            elif nat_direction == 'destination':
+                pre_nat = _address(flow.orig_dst, flow.orig_dport)
+                post_nat = _address(flow.reply_src, flow.reply_sport)
+            yield [pre_nat, post_nat, flow.proto, flow.timeout, flow.mark, flow.zone]
+
+    address = 21 if family == 'ipv4' else 45
     headers = ["Pre-NAT", "Post-NAT", "Proto", "Timeout", "Mark", "Zone"]
-    output = tabulate(data_entries, headers, numalign="left")
-    return output
+    widths = [address, address, 8, 7, 10, 5]
+    return vyos.opmode.stream_table(rows(), headers, widths)
 
 
 def _verify(func):
@@ -306,22 +277,21 @@ def show_rules(raw: bool, direction: str, family: str):
 
 
 @_verify
-def show_statistics(raw: bool, direction: str, family: str):
-    nat_statistics = _get_raw_data_rules(direction, family)
+def show_statistics(raw: bool, direction: str, family: str, delta: bool):
+    nat_statistics = _get_raw_data_statistics(direction, family, delta)
     if raw:
         return nat_statistics
     else:
-        return _get_formatted_output_statistics(nat_statistics, direction)
+        return _get_formatted_output_statistics(nat_statistics, direction, delta)
 
 
 @_verify
 def show_translations(raw: bool, direction: str, family: str):
     family = 'ipv6' if family == 'inet6' else 'ipv4'
-    nat_translation = _get_raw_translation(direction, family)
     if raw:
-        return nat_translation
+        return _get_raw_translation(direction, family)
     else:
-        return _get_formatted_translation(nat_translation, direction, family)
+        return _get_formatted_translation(get_flows(family, nat=direction), direction, family)
 
 
 if __name__ == '__main__':
@@ -54,13 +54,24 @@ frr_command_template = Template("""
 {% endif %}
 """)
 
+def _summary(routes):
+    protocols = {}
+    for route in routes:
+        protocol = route.get('protocol')
+        protocols[protocol] = protocols.get(protocol, 0) + 1
+    return {'routes': sum(protocols.values()), 'protocols': protocols}
+
 def show(raw: bool,
          family: str,
          net: typing.Optional[str],
          table: typing.Optional[int],
          protocol: typing.Optional[str],
          vrf: typing.Optional[str],
-         tag: typing.Optional[str]):
+         tag: typing.Optional[str],
+         stream: bool,
+         summary: bool,
+         prefix: typing.Optional[str],
+         nexthop: typing.Optional[str]):
     if net and protocol:
         raise ValueError("net and protocol are mutually exclusive")
     elif table and vrf:
@@ -69,28 +80,43 @@ def show(raw: bool,
         raise ValueError("rip is not a valid protocol for family inet6")
     elif (family == 'inet') and (protocol == 'ripng'):
         raise ValueError("rip is not a valid protocol for family inet6")
+    elif (prefix or nexthop or stream) and not (raw or summary):
+        raise ValueError("prefix, nexthop and stream require raw or summary output")
     else:
         if (family == 'inet6') and (protocol == 'ospf'):
             protocol = 'ospf6'
 
         kwargs = dict(locals())
 
+        if raw or summary:
+            kwargs['raw'] = True
         frr_command = frr_command_template.render(kwargs)
         frr_command = re.sub(r'\s+', ' ', frr_command)
 
-        from vyos.util import cmd
-        output = cmd(f"vtysh -c '{frr_command}'")
-
-        if raw:
-            from json import loads
-            d = loads(output)
-            collect = []
-            for k,_ in d.items():
-                for l in d[k]:
-                    collect.append(l)
-            return collect
+        from vyos.frr import execute
+        from vyos.frr import execute_stream
+        from vyos.frr import parse_routes
+        from vyos.frr import route_filter
+
+        if raw or summary:
+            # the routes are decoded one at a time while FRR outputs them,
+            # the protocol is already filtered by FRR
+            match = route_filter(prefix=prefix, nexthop=nexthop)
+            routes = filter(match, parse_routes(execute_stream(frr_command)))
+            if summary:
+                data = _summary(routes)
+                if raw:
+                    return data
+                from tabulate import tabulate
+                entries = sorted(data['protocols'].items())
+                entries.append(['Total', data['routes']])
+                return tabulate(entries, ['Protocol', 'Routes'], numalign="left")
+            if stream:
+                # NDJSON output, one route per line
+                return routes
+            return list(routes)
         else:
-            return output
+            return execute(frr_command)
 
 if __name__ == '__main__':
     try:
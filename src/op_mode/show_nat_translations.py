@@ -22,12 +22,9 @@ import os
 import sys
 import ipaddress
 import argparse
-import xmltodict
 
-from vyos.util import popen
-from vyos.util import DEVNULL
-
-conntrack = '/usr/sbin/conntrack'
+from vyos.conntrack import get_flows
+from vyos.conntrack import parse
 
 verbose_format = "%-20s %-18s %-20s %-18s"
 normal_format = "%-20s %-20s %-4s  %-8s %s"
@@ -39,137 +36,62 @@ def headers(verbose, pipe):
     return normal_format % ('Pre-NAT', 'Post-NAT', 'Prot', 'Timeout', 'Type' if pipe else '')
 
 
-def command(srcdest, proto, ipaddr):
-    command = f'{conntrack} -o xml -L'
-
-    if proto:
-        command += f' -p {proto}'
-
-    if srcdest == 'source':
-        command += ' -n'
-        if ipaddr:
-            command += f' --orig-src {ipaddr}'
-    if srcdest == 'destination':
-        command += ' -g'
-        if ipaddr:
-            command += f' --orig-dst {ipaddr}'
-
-    return command
-
-
-def run(command):
-    xml, code = popen(command,stderr=DEVNULL)
-    if code:
-        sys.exit('conntrack failed')
-    return xml
+def flows(srcdest, proto, ipaddr):
+    src = ipaddr if srcdest == 'source' else None
+    dst = ipaddr if srcdest == 'destination' else None
+    return get_flows(nat=srcdest, src=src, dst=dst, proto=proto or None)
 
 
 def content(xmlfile):
-    xml = ''
     with open(xmlfile,'r') as r:
-        xml += r.read()
-    return xml
+        yield from parse(r)
 
 
 def pipe():
-    xml = ''
-    while True:
-        line = sys.stdin.readline()
-        xml += line
-        if '</conntrack>' in line:
-            break
-
+    yield from parse(sys.stdin)
     sys.stdin = open('/dev/tty')
-    return xml
-
-
-def xml_to_dict(xml):
-    """
-    Convert XML to dictionary
-    Return: dictionary
-    """
-    parse = xmltodict.parse(xml)
-    # If only one NAT entry we must change dict T4499
-    if 'meta' in parse['conntrack']['flow']:
-        return dict(conntrack={'flow': [parse['conntrack']['flow']]})
-    return parse
-
-
-def process(data, stats, protocol, pipe, verbose, flowtype=''):
-    if not data:
-        return
-
-    parsed = xml_to_dict(data)
-
-    print(headers(verbose, pipe))
-
-    # to help the linter to detect typos
-    ORIGINAL = 'original'
-    REPLY = 'reply'
-    INDEPENDANT = 'independent'
-    SPORT = 'sport'
-    DPORT = 'dport'
-    SRC = 'src'
-    DST = 'dst'
-
-    for rule in parsed['conntrack']['flow']:
-        src, dst, sport, dport, proto = {}, {}, {}, {}, {}
-        packet_count, byte_count = {}, {}
-        timeout, use = 0, 0
-
-        rule_type = rule.get('type', '')
-
-        for meta in rule['meta']:
-            # print(meta)
-            direction = meta['@direction']
-
-            if direction in (ORIGINAL, REPLY):
-                if 'layer3' in meta:
-                    l3 = meta['layer3']
-                    src[direction] = l3[SRC]
-                    dst[direction] = l3[DST]
-
-                if 'layer4' in meta:
-                    l4 = meta['layer4']
-                    sp = l4.get(SPORT, '')
-                    dp = l4.get(DPORT, '')
-                    if sp:
-                        sport[direction] = sp
-                    if dp:
-                        dport[direction] = dp
-                    proto[direction] = l4.get('@protoname','')
-
-                if stats and 'counters' in meta:
-                    packet_count[direction] = meta['packets']
-                    byte_count[direction] = meta['bytes']
-                continue
 
-            if direction == INDEPENDANT:
-                timeout = meta['timeout']
-                use = meta['use']
-                continue
 
-        in_src = '%s:%s' % (src[ORIGINAL], sport[ORIGINAL]) if ORIGINAL in sport else src[ORIGINAL]
-        in_dst = '%s:%s' % (dst[ORIGINAL], dport[ORIGINAL]) if ORIGINAL in dport else dst[ORIGINAL]
+def address(address, port):
+    return '%s:%s' % (address, port) if port else address
 
-        # inverted the the perl code !!?
-        out_dst = '%s:%s' % (dst[REPLY], dport[REPLY]) if REPLY in dport else dst[REPLY]
-        out_src = '%s:%s' % (src[REPLY], sport[REPLY]) if REPLY in sport else src[REPLY]
 
+def process(data, stats, protocol, pipe, verbose, flowtype='', ipaddr=None):
+    header = False
+
+    for flow in data:
         if flowtype == 'source':
-            v = ORIGINAL in sport and REPLY in dport
-            f = '%s:%s' % (src[ORIGINAL], sport[ORIGINAL]) if v else src[ORIGINAL]
-            t = '%s:%s' % (dst[REPLY], dport[REPLY]) if v else dst[REPLY]
-        else:
-            v = ORIGINAL in dport and REPLY in sport
-            f = '%s:%s' % (dst[ORIGINAL], dport[ORIGINAL]) if v else dst[ORIGINAL]
-            t = '%s:%s' % (src[REPLY], sport[REPLY]) if v else src[REPLY]
+            if ipaddr and flow.orig_src != str(ipaddr):
+                continue
+        elif ipaddr and flow.orig_dst != str(ipaddr):
+            continue
 
         # Thomas: I do not believe proto should be an option
-        p = proto.get('original', '')
+        p = flow.proto or ''
         if protocol and p != protocol:
             continue
 
+        if not header:
+            print(headers(verbose, pipe))
+            header = True
+
+        in_src = address(flow.orig_src, flow.orig_sport)
+        in_dst = address(flow.orig_dst, flow.orig_dport)
+
+        # inverted the the perl code !!?
+        out_dst = address(flow.reply_dst, flow.reply_dport)
+        out_src = address(flow.reply_src, flow.reply_sport)
+
+        if flowtype == 'source':
+            v = flow.orig_sport and flow.reply_dport
+            f = in_src if v else flow.orig_src
+            t = out_dst if v else flow.reply_dst
+        else:
+            v = flow.orig_dport and flow.reply_sport
+            f = in_dst if v else flow.orig_dst
+            t = out_src if v else flow.reply_src
+
+        timeout, use, rule_type = flow.timeout, flow.use, flow.type
         if verbose:
             msg = verbose_format % (in_src, in_dst, out_dst, out_src)
             p = f'{p}: ' if p else ''
@@ -182,9 +104,10 @@ def process(data, stats, protocol, pipe, verbose, flowtype=''):
             print(normal_format % (f, t, p, timeout, rule_type if rule_type else ''))
 
         if stats:
-            for direction in ('original', 'reply'):
-                if direction in packet_count:
-                    print('  %-8s: packets %s, bytes %s' % direction, packet_count[direction], byte_count[direction])
+            for direction, packets, _bytes in (('original', flow.orig_packets, flow.orig_bytes),
+                                               ('reply', flow.reply_packets, flow.reply_bytes)):
+                if packets is not None:
+                    print('  %-8s: packets %s, bytes %s' % (direction, packets, _bytes))
 
 
 def main():
@@ -203,14 +126,14 @@ def main():
         sys.exit('Unknown NAT type!')
 
     if arg.pipe:
-        process(pipe(), arg.stats, arg.proto, arg.pipe, arg.verbose, arg.type)
+        process(pipe(), arg.stats, arg.proto, arg.pipe, arg.verbose, arg.type, arg.ipaddr)
     elif arg.file:
-        process(content(arg.file), arg.stats, arg.proto, arg.pipe, arg.verbose, arg.type)
+        process(content(arg.file), arg.stats, arg.proto, arg.pipe, arg.verbose, arg.type, arg.ipaddr)
     else:
         try:
-            process(run(command(arg.type, arg.proto, arg.ipaddr)), arg.stats, arg.proto, arg.pipe, arg.verbose, arg.type)
-        except:
-            pass
+            process(flows(arg.type, arg.proto, arg.ipaddr), arg.stats, arg.proto, arg.pipe, arg.verbose, arg.type)
+        except OSError:
+            sys.exit('conntrack failed')
 
 if __name__ == '__main__':
     main()
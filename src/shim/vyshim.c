@@ -50,6 +50,11 @@
 
 #define COMMIT_MARKER "/var/tmp/initial_in_commit"
 
+// milliseconds to wait for vyos-configd at the end of a commit: to connect,
+// and to apply the FRR configuration of the commit
+#define END_CONNECT_TIMEOUT 1000
+#define END_TIMEOUT 600000
+
 enum {
     SUCCESS =      1 << 0,
     ERROR_COMMIT = 1 << 1,
@@ -61,6 +66,7 @@ volatile int init_alarm = 0;
 volatile int timeout = 0;
 
 int initialization(void *);
+int commit_end(void *);
 int pass_through(char **, int);
 void timer_handler(int);
 
@@ -78,6 +84,14 @@ int main(int argc, char* argv[])
     int ex_index;
     int init_timeout = 0;
 
+    // run by the post-commit hook once all scripts of the commit ran
+    if (argc == 2 && !strcmp(argv[1], "--commit-end")) {
+        int ret = commit_end(requester);
+        zmq_close(requester);
+        zmq_ctx_destroy(context);
+        return ret;
+    }
+
     debug_print("Connecting to vyos-configd ...\n");
     zmq_connect(requester, SOCKET_PATH);
 
@@ -236,6 +250,48 @@ int initialization(void* Requester)
     return 0;
 }
 
+int commit_end(void* Requester)
+{
+    char error_code[1];
+    int immediate = 1;
+    int linger = 0;
+    int send_timeout = END_CONNECT_TIMEOUT;
+    int recv_timeout = END_TIMEOUT;
+
+    // do not wait for a vyos-configd which is not running
+    zmq_setsockopt(Requester, ZMQ_IMMEDIATE, &immediate, sizeof(immediate));
+    zmq_setsockopt(Requester, ZMQ_LINGER, &linger, sizeof(linger));
+    zmq_setsockopt(Requester, ZMQ_SNDTIMEO, &send_timeout, sizeof(send_timeout));
+    zmq_setsockopt(Requester, ZMQ_RCVTIMEO, &recv_timeout, sizeof(recv_timeout));
+
+    debug_print("Connecting to vyos-configd ...\n");
+    zmq_connect(Requester, SOCKET_PATH);
+
+    char *end_msg = mkjson(MKJSON_OBJ, 1,
+                           MKJSON_STRING, "type", "end");
+
+    debug_print("Sending end of commit\n");
+    int sent = zmq_send(Requester, end_msg, strlen(end_msg), 0);
+    free(end_msg);
+    if (sent < 0) {
+        debug_print("vyos-configd not running\n");
+        return 0;
+    }
+
+    if (zmq_recv(Requester, error_code, 1, 0) < 0) {
+        debug_print("No end of commit receipt\n");
+        return -1;
+    }
+    debug_print("Received end of commit receipt\n");
+
+    if ((int)error_code[0] & ERROR_COMMIT) {
+        debug_print("Received ERROR_COMMIT\n");
+        return -1;
+    }
+
+    return 0;
+}
+
 int pass_through(char **argv, int ex_index)
 {
     char **newargv = NULL;
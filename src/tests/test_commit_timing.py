@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import tempfile
+
+from unittest import TestCase
+from unittest import mock
+
+try:
+    from src.op_mode import commit
+except ModuleNotFoundError:  # for unittest.main()
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+    from src.op_mode import commit
+
+def stage(wall_ms, cpu_ms=1.0, child_cpu_ms=0.0, subprocesses=0, maxrss_kib=1000):
+    return {'wall_ms': wall_ms, 'cpu_ms': cpu_ms, 'child_cpu_ms': child_cpu_ms,
+            'subprocesses': subprocesses, 'maxrss_kib': maxrss_kib}
+
+def record(commit_id, script, result=1, tagnode=None, notes=None, **stages):
+    out = {'commit': commit_id, 'time': commit_id, 'pid': 1, 'script': script,
+           'args': [], 'tagnode': tagnode, 'result': result,
+           'wall_ms': round(sum(s['wall_ms'] for s in stages.values()), 3),
+           'stages': stages}
+    if notes:
+        out['notes'] = notes
+    return out
+
+class TestCommitTiming(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.log = os.path.join(tmp.name, 'timing.log')
+        patcher = mock.patch.object(commit, 'commit_timing_log', self.log)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, *records):
+        with open(self.log, 'w') as f:
+            for r in records:
+                f.write(json.dumps(r) + '\n')
+            # a line cut short by a crash of the daemon is skipped
+            f.write('{"commit": 3')
+
+    def test_no_records(self):
+        self.assertEqual(commit.show_timing(raw=True, count=None), [])
+        self.assertEqual(commit.show_timing(raw=False, count=None),
+                         'No commit timing information available')
+        with self.assertRaises(ValueError):
+            commit.show_timing(raw=True, count=0)
+
+    def test_raw(self):
+        self.write(
+            record(1.0, 'firewall.py', get_config=stage(10), apply=stage(100, maxrss_kib=5000)),
+            record(2.0, 'interfaces-ethernet.py', tagnode='eth0',
+                   get_config=stage(5), apply=stage(20, child_cpu_ms=3, subprocesses=4)),
+            record(2.0, 'nat.py', result=2, notes={'apply': 'partial'},
+                   get_config=stage(1, maxrss_kib=3000), verify=stage(2)))
+
+        # the latest commit only by default
+        data = commit.show_timing(raw=True, count=None)
+        self.assertEqual([c['commit'] for c in data], [2.0])
+        self.assertEqual(data[0]['wall_ms'], 28)
+        self.assertEqual(data[0]['cpu_ms'], 4)
+        self.assertEqual(data[0]['child_cpu_ms'], 3)
+        self.assertEqual(data[0]['subprocesses'], 4)
+        self.assertEqual(data[0]['maxrss_kib'], 3000)
+        self.assertEqual([(s['script'], s['tagnode'], s['result']) for s in data[0]['scripts']],
+                         [('interfaces-ethernet.py', 'eth0', 'success'), ('nat.py', None, 'error')])
+        self.assertEqual(data[0]['scripts'][1]['notes'], {'apply': 'partial'})
+
+        data = commit.show_timing(raw=True, count=5)
+        self.assertEqual([c['commit'] for c in data], [1.0, 2.0])
+        self.assertEqual(data[0]['maxrss_kib'], 5000)
+
+    def test_slowest_stages(self):
+        self.write(*[record(1.0, f'script{i}.py', apply=stage(i)) for i in range(20)])
+        stages = commit._get_slowest_stages(commit.show_timing(raw=True, count=None))
+        self.assertEqual(len(stages), commit.slowest_count)
+        self.assertEqual([s[2] for s in stages[:2]], ['script19.py', 'script18.py'])
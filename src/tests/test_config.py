@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+
+from unittest import TestCase
+from vyos.config import Config
+from vyos.configsource import ConfigSource
+from vyos.util import get_sub_dict
+
+config_data = {
+    'interfaces': {
+        'ethernet': {
+            'eth0': {'address': '192.0.2.1/24', 'description': 'WAN'},
+            'eth1': {'address': ['192.0.2.9/29', '2001:db8::1/64']},
+        },
+    },
+    'service': {
+        'ssh': {'port': '2222'},
+    },
+}
+
+class FakeConfigTree:
+    """ Minimal stand-in for vyos.configtree.ConfigTree """
+    def __init__(self, data):
+        self.data = data
+        self.to_json_calls = 0
+        self.to_dict_calls = 0
+
+    def to_json(self):
+        self.to_json_calls += 1
+        return json.dumps(self.data)
+
+    def to_dict(self, path=[]):
+        self.to_dict_calls += 1
+        return json.loads(json.dumps(get_sub_dict(self.data, path)))
+
+class FakeConfigSource(ConfigSource):
+    def __init__(self, running, session):
+        super().__init__()
+        self._running_config = running
+        self._session_config = session
+
+class TestConfig(TestCase):
+    def setUp(self):
+        self.session = FakeConfigTree(config_data)
+        self.config = Config(config_source=FakeConfigSource(None, self.session))
+
+    def test_get_config_dict(self):
+        tmp = self.config.get_config_dict(['interfaces', 'ethernet', 'eth0'],
+                                          key_mangling=('-', '_'),
+                                          get_first_key=True)
+        self.assertEqual(tmp, {'address': ['192.0.2.1/24'], 'description': 'WAN'})
+
+    def test_get_config_dict_cached(self):
+        path = ['interfaces', 'ethernet']
+        first = self.config.get_config_dict(path, key_mangling=('-', '_'))
+        # callers are free to alter the returned dict
+        first['ethernet']['eth0']['address'].append('198.51.100.1/24')
+        second = self.config.get_config_dict(path, key_mangling=('-', '_'))
+        self.assertEqual(second['ethernet']['eth0']['address'], ['192.0.2.1/24'])
+        self.assertEqual(self.session.to_dict_calls, 1)
+
+    def test_get_config_dict_subtree(self):
+        # only the requested subtree must be exported from the config tree
+        self.config.get_config_dict(['interfaces', 'ethernet', 'eth1'])
+        self.assertEqual(self.session.to_json_calls, 0)
+        # once the whole tree is decoded it is used for all other lookups
+        self.config.get_cached_root_dict()
+        tmp = self.config.get_config_dict(['interfaces', 'ethernet', 'eth0'],
+                                          get_first_key=True)
+        self.assertEqual(tmp['description'], 'WAN')
+        self.assertEqual(self.session.to_dict_calls, 1)
+
+    def test_get_config_dict_nonexistent(self):
+        self.assertEqual(self.config.get_config_dict(['interfaces', 'dummy']), {})
+
+    def test_get_config_dict_defaults(self):
+        tmp = self.config.get_config_dict(['service', 'ssh'],
+                                          key_mangling=('-', '_'),
+                                          get_first_key=True,
+                                          with_defaults=True)
+        self.assertEqual(tmp['port'], ['2222'])
+        self.assertEqual(tmp['dynamic_protection']['threshold'], '30')
+
+        tmp = self.config.get_config_dict(['interfaces', 'ethernet'],
+                                          key_mangling=('-', '_'),
+                                          get_first_key=True,
+                                          with_defaults=True)
+        self.assertEqual(tmp['eth0']['mtu'], '1500')
+        self.assertEqual(tmp['eth1']['mtu'], '1500')
+        # no defaults for the values of nested tag nodes (vif, ...)
+        self.assertNotIn('vif', tmp['eth0'])
+
+    def test_get_config_dict_effective(self):
+        self.assertEqual(self.config.get_config_dict(['interfaces'], effective=True), {})
+
+    def test_get_config_dict_key_mangling(self):
+        with self.assertRaises(ValueError):
+            self.config.get_config_dict(['interfaces'], key_mangling='-')
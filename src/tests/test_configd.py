@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import importlib.machinery
+import importlib.util
+import json
+import os
+import tempfile
+
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest import mock
+from unittest import skipIf
+
+import vyos.frr as frr
+
+try:
+    import zmq
+except ImportError:
+    zmq = None
+
+base_dir = os.path.join(os.path.dirname(__file__), '../..')
+
+running = {
+    'bgpd': 'frr version 8.1\n!\nrouter bgp 65000\nexit\n!\nend',
+    'ospfd': 'frr version 8.1\n!\nend',
+}
+
+def load_configd():
+    path = os.path.join(base_dir, 'src/services/vyos-configd')
+    loader = importlib.machinery.SourceFileLoader('vyos_configd', path)
+    spec = importlib.util.spec_from_loader('vyos_configd', loader)
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.dict('vyos.defaults.directories',
+                         {'data': os.path.join(base_dir, 'data'),
+                          'conf_mode': os.path.join(base_dir, 'src/conf_mode')}):
+        loader.exec_module(module)
+    return module
+
+def frr_script(daemon, config):
+    """ A conf_mode script replacing the configuration of daemon """
+    def apply(c):
+        frr_cfg = frr.FRRConfig()
+        frr_cfg.load_configuration(daemon)
+        frr_cfg.modify_section(r'^router \w+', stop_pattern='^exit', remove_stop_mark=True)
+        frr_cfg.add_before(frr.default_add_before, config)
+        frr_cfg.commit_configuration(daemon)
+    return SimpleNamespace(get_config=lambda config: None, verify=lambda c: None,
+                           generate=lambda c: None, apply=apply)
+
+class FakeSocket:
+    """ The REP socket of the daemon, with the messages vyshim sends """
+    def __init__(self):
+        self.received = []
+        self.sent = []
+
+    def recv(self):
+        return self.received.pop(0).encode()
+
+    def send(self, data):
+        self.sent.append(data)
+
+@skipIf(zmq is None, 'vyos-configd needs zmq')
+class TestCommitTransaction(TestCase):
+    def setUp(self):
+        self.calls = []
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.configd = load_configd()
+        self.scripts = {
+            'protocols_bgp': frr_script('bgpd', 'router bgp 65000\n neighbor 192.0.2.1 remote-as 65001\nexit'),
+            'protocols_ospf': frr_script('ospfd', 'router ospf\nexit'),
+        }
+        for patcher in [
+                mock.patch('vyos.frr.get_configuration', lambda daemon=None, marked=False:
+                           self.calls.append(('show', daemon)) or running[daemon]),
+                mock.patch('vyos.frr.reload_configuration', lambda config, daemon=None:
+                           self.calls.append(('reload', daemon))),
+                mock.patch('vyos.frr.save_configuration', lambda: self.calls.append(('save',))),
+                mock.patch('vyos.frr.mark_configuration', lambda config: config),
+                mock.patch.object(frr.transaction, 'fname', os.path.join(tmp.name, 'transaction.json')),
+                mock.patch.object(frr.fingerprints, 'fname', os.path.join(tmp.name, 'fingerprints.json')),
+                mock.patch('vyos.frr.path_config', tmp.name),
+                mock.patch.object(self.configd, 'load_conf_mode_script', self.scripts.get),
+                mock.patch.object(self.configd, 'stdout_redirected', mock.MagicMock()),
+                mock.patch.object(self.configd, 'script_stdout_log', os.path.join(tmp.name, 'stdout')),
+                mock.patch.object(self.configd, 'commit_timing_log', os.path.join(tmp.name, 'timing'))]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.path = tmp.name
+        self.socket = FakeSocket()
+
+    def send(self, message, *data):
+        # the init message is followed by the active and session configs and
+        # the pid of the config session
+        self.socket.received.extend(data)
+        self.configd.process_message(self.socket, message)
+        return self.socket.sent.pop()
+
+    def commit(self, *scripts):
+        self.assertEqual(self.send({'type': 'init'}, '', '', '0'), b'pid')
+        self.socket.sent.clear()
+        for script in scripts:
+            node = f'/usr/libexec/vyos/conf_mode/{script}.py'
+            self.assertEqual(self.send({'type': 'node', 'data': node}),
+                             bytes([self.configd.R_SUCCESS]))
+
+    def timing(self):
+        with open(os.path.join(self.path, 'timing')) as f:
+            return [json.loads(l) for l in f]
+
+    def test_commit(self):
+        self.commit('protocols_bgp', 'protocols_ospf')
+        # nothing applied before the end of the commit
+        self.assertEqual(self.calls, [('show', 'bgpd'), ('show', 'ospfd')])
+
+        self.calls.clear()
+        self.assertEqual(self.send({'type': 'end'}), bytes([self.configd.R_SUCCESS]))
+        self.assertEqual(self.calls, [('reload', 'bgpd'), ('reload', 'ospfd'), ('save',)])
+        self.assertFalse(frr.transaction.active())
+        self.assertEqual(self.timing()[-1]['script'], 'frr-transaction')
+        self.assertEqual(self.timing()[-1]['notes'], {'daemons': 'bgpd, ospfd'})
+
+        # an end without scripts has nothing to apply
+        self.calls.clear()
+        self.assertEqual(self.send({'type': 'end'}), bytes([self.configd.R_SUCCESS]))
+        self.assertEqual(self.calls, [])
+
+    def test_failed_commit(self):
+        self.commit('protocols_bgp')
+        with mock.patch('vyos.frr.reload_configuration_retry',
+                        side_effect=frr.CommitError('reload failed')):
+            self.assertEqual(self.send({'type': 'end'}), bytes([self.configd.R_ERROR_COMMIT]))
+        self.assertFalse(frr.transaction.active())
+        with open(os.path.join(self.path, 'stdout')) as f:
+            self.assertIn('bgpd (changed by protocols_bgp.py): reload failed', f.read())
+
+    def test_invalid_config(self):
+        # a syntax error fails the script which made it, not the end of the commit
+        self.send({'type': 'init'}, '', '', '0')
+        with mock.patch('vyos.frr.mark_configuration',
+                        side_effect=frr.ConfigurationNotValid('invalid')):
+            self.assertEqual(self.send({'type': 'node', 'data': '/usr/libexec/vyos/conf_mode/protocols_bgp.py'}),
+                             bytes([self.configd.R_ERROR_COMMIT]))
+        self.assertEqual(frr.transaction.changed(), [])
+
+    def test_pass_through(self):
+        self.commit('protocols_bgp')
+        # the staged configuration is applied before vyshim runs a script
+        # itself, which then applies its own right away
+        self.calls.clear()
+        self.assertEqual(self.send({'type': 'node', 'data': '/usr/libexec/vyos/conf_mode/other.py'}),
+                         bytes([self.configd.R_PASS]))
+        self.assertEqual(self.calls, [('reload', 'bgpd'), ('save',)])
+        self.assertTrue(frr.transaction.active())
+        self.assertEqual(frr.transaction.changed(), [])
+
+        # nothing staged, nothing applied
+        self.calls.clear()
+        self.send({'type': 'node', 'data': '/usr/libexec/vyos/conf_mode/other.py'})
+        self.assertEqual(self.calls, [])
+
+    def test_missing_end(self):
+        self.commit('protocols_bgp')
+        # the next commit applies what the previous one left first
+        self.commit()
+        self.assertEqual(self.calls, [('show', 'bgpd'), ('reload', 'bgpd'), ('save',)])
+        self.assertTrue(frr.transaction.active())
+
+@skipIf(zmq is None, 'vyos-configd needs zmq')
+class TestTimedStage(TestCase):
+    def test_peak_rss(self):
+        configd = load_configd()
+        stages = {}
+        with configd.timed_stage(stages, 'generate'):
+            data = bytearray(64 * 1024 * 1024)
+            del data
+        with configd.timed_stage(stages, 'apply'):
+            pass
+
+        # every stage reports its own peak, not the one of the daemon
+        self.assertGreater(stages['generate']['maxrss_kib'] - stages['apply']['maxrss_kib'],
+                           32 * 1024)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+
+from unittest import TestCase
+from vyos.config import Config
+from vyos.configdict import is_node_changed
+from vyos.configdict import leaf_node_changed
+from vyos.configdict import node_changed
+from vyos.configdiff import Change
+from vyos.configdiff import DiffIndex
+from vyos.configdiff import get_diff_index
+from vyos.configsource import ConfigSource
+
+effective = {
+    'interfaces': {
+        'ethernet': {
+            'eth0': {'address': ['192.0.2.1/24'], 'description': 'WAN'},
+            'eth1': {'address': ['198.51.100.1/24']},
+        },
+    },
+    'service': {'ssh': {'port': '22'}},
+}
+
+session = {
+    'interfaces': {
+        'ethernet': {
+            'eth0': {'address': ['192.0.2.1/24', '2001:db8::1/64'], 'description': 'WAN'},
+            'eth2': {'description': 'LAN'},
+        },
+    },
+    'service': {'ssh': {'port': '22'}},
+}
+
+class FakeConfigTree:
+    def __init__(self, data):
+        self.data = data
+
+    def to_json(self):
+        return json.dumps(self.data)
+
+class FakeConfigSource(ConfigSource):
+    def __init__(self, running, session):
+        super().__init__()
+        self._running_config = running
+        self._session_config = session
+
+class TestDiffIndex(TestCase):
+    def setUp(self):
+        self.index = DiffIndex(session, effective)
+
+    def test_get_change(self):
+        eth = ['interfaces', 'ethernet']
+        self.assertEqual(self.index.get_change(['interfaces']), Change.MODIFY)
+        self.assertEqual(self.index.get_change(eth + ['eth0']), Change.MODIFY)
+        self.assertEqual(self.index.get_change(eth + ['eth0', 'address']), Change.MODIFY)
+        self.assertEqual(self.index.get_change(eth + ['eth0', 'description']), Change(0))
+        self.assertEqual(self.index.get_change(eth + ['eth1']), Change.DELETE)
+        self.assertEqual(self.index.get_change(eth + ['eth1', 'address']), Change.DELETE)
+        self.assertEqual(self.index.get_change(eth + ['eth2', 'description']), Change.ADD)
+        self.assertEqual(self.index.get_change(['service', 'ssh']), Change(0))
+        self.assertEqual(self.index.get_change(['system']), Change(0))
+
+    def test_get_changed_paths(self):
+        self.assertEqual(self.index.get_changed_paths(['interfaces', 'ethernet', 'eth0']),
+                         {('interfaces', 'ethernet', 'eth0'): Change.MODIFY,
+                          ('interfaces', 'ethernet', 'eth0', 'address'): Change.MODIFY})
+        self.assertEqual(self.index.get_changed_paths(['service']), {})
+
+class TestConfigDictChanged(TestCase):
+    def setUp(self):
+        source = FakeConfigSource(FakeConfigTree(effective), FakeConfigTree(session))
+        self.config = Config(config_source=source)
+
+    def test_diff_index_cached(self):
+        self.assertIs(get_diff_index(self.config), get_diff_index(self.config))
+
+    def test_is_node_changed(self):
+        self.assertTrue(is_node_changed(self.config, ['interfaces', 'ethernet', 'eth1']))
+        self.assertFalse(is_node_changed(self.config, ['service', 'ssh']))
+        self.config.set_level(['interfaces', 'ethernet'])
+        self.assertTrue(is_node_changed(self.config, ['eth2']))
+        self.assertFalse(is_node_changed(self.config, ['eth0', 'description']))
+
+    def test_unchanged(self):
+        # answered from the index, without building a DiffTree
+        self.assertIsNone(leaf_node_changed(self.config, ['service', 'ssh', 'port']))
+        self.assertEqual(node_changed(self.config, ['service']), [])
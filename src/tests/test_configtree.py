@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+
+from unittest import TestCase
+
+from vyos.configtree import ConfigTree
+from vyos.configtree import LIBPATH
+from vyos.configtree import parse_commands
+
+commands = """
+# generated
+set interfaces ethernet eth0 address '192.0.2.1/24'
+set interfaces ethernet eth0 address '2001:db8::1/64'
+set interfaces ethernet eth0 vif 10 mtu 1400
+set interfaces ethernet eth1 description "uplink \\"A\\""
+set service ssh
+set firewall group address-group LAN address 192.0.2.9
+delete service ssh port '22'
+delete service ssh
+"""
+
+class TestParseCommands(TestCase):
+    def test_parse_commands(self):
+        ops = list(parse_commands(commands.splitlines()))
+        self.assertEqual(ops, [
+            ('set', ['interfaces', 'ethernet', 'eth0', 'address'], '192.0.2.1/24', False),
+            ('set_tag', ['interfaces', 'ethernet']),
+            ('set', ['interfaces', 'ethernet', 'eth0', 'address'], '2001:db8::1/64', False),
+            ('set', ['interfaces', 'ethernet', 'eth0', 'vif', '10', 'mtu'], '1400', True),
+            ('set_tag', ['interfaces', 'ethernet', 'eth0', 'vif']),
+            ('set', ['interfaces', 'ethernet', 'eth1', 'description'], 'uplink "A"', True),
+            ('set', ['service', 'ssh'], None, True),
+            ('set', ['firewall', 'group', 'address-group', 'LAN', 'address'], '192.0.2.9', False),
+            ('set_tag', ['firewall', 'group', 'address-group']),
+            ('delete_value', ['service', 'ssh', 'port'], '22'),
+            ('delete', ['service', 'ssh']),
+        ])
+
+    def test_parse_commands_invalid(self):
+        with self.assertRaises(ValueError):
+            list(parse_commands(['show interfaces']))
+
+@unittest.skipUnless(os.path.exists(LIBPATH), f'{LIBPATH} not available')
+class TestApplyOps(TestCase):
+    def test_apply_ops(self):
+        config = ConfigTree(config_string='\n')
+        errors = config.apply_ops(parse_commands(commands.splitlines()))
+        self.assertEqual(errors, [])
+        self.assertEqual(config.return_values(['interfaces', 'ethernet', 'eth0', 'address']),
+                         ['192.0.2.1/24', '2001:db8::1/64'])
+        self.assertTrue(config.is_tag(['interfaces', 'ethernet']))
+        self.assertFalse(config.exists(['service', 'ssh']))
+
+    def test_apply_ops_errors(self):
+        config = ConfigTree(config_string='\n')
+        errors = config.apply_ops([
+            ('set', ['system', 'host-name'], 'vyos'),
+            ('rename', ['system', 'domain-name'], 'foo'),
+            ('frobnicate', ['system']),
+            ('set', ['system', 'time-zone'], 'UTC'),
+        ])
+        self.assertEqual([i for i, _ in errors], [1, 2])
+        self.assertEqual(config.return_value(['system', 'time-zone']), 'UTC')
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# ConfigTree.to_dict() - exporting a single subtree - and its benchmark against
+# the full JSON round trip previously used by vyos.config.Config. The benchmark
+# only runs on request: VYOS_BENCHMARK=1 PYTHONPATH=python/ python3 src/tests/test_configtree_export.py
+
+import os
+import json
+import unittest
+
+from timeit import timeit
+
+from vyos.configtree import ConfigTree
+from vyos.configtree import LIBPATH
+from vyos.util import get_sub_dict
+
+# 10000 interfaces with 5 nodes each
+interfaces = 10000
+
+def synthetic_config():
+    config = 'interfaces {\n'
+    for i in range(interfaces):
+        config += f'    dummy dum{i} {{\n' \
+                  f'        address 10.{i // 256 % 256}.{i % 256}.1/24\n' \
+                  f'        address 2001:db8:{i:x}::1/64\n' \
+                  f'        description "synthetic interface {i}"\n' \
+                  f'        mtu 1500\n' \
+                  f'        disable\n' \
+                  f'    }}\n'
+    config += '}\n'
+    return config
+
+@unittest.skipUnless(os.path.exists(LIBPATH), 'libvyosconfig not available')
+class TestConfigTreeExport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.config = ConfigTree(synthetic_config())
+        cls.path = ['interfaces', 'dummy', f'dum{interfaces // 2}']
+
+    def test_to_dict(self):
+        full = get_sub_dict(json.loads(self.config.to_json()), self.path)
+        self.assertEqual(self.config.to_dict(self.path), full)
+        self.assertEqual(self.config.to_dict(self.path + ['foo']), {})
+        self.assertEqual(self.config.to_dict([]), json.loads(self.config.to_json()))
+
+    @unittest.skipUnless(os.environ.get('VYOS_BENCHMARK'), 'set VYOS_BENCHMARK to run benchmarks')
+    def test_to_dict_benchmark(self):
+        runs = 5
+        full = timeit(lambda: get_sub_dict(json.loads(self.config.to_json()),
+                                           self.path), number=runs) / runs
+        subtree = timeit(lambda: self.config.to_dict(self.path),
+                         number=runs) / runs
+
+        print(f'\nfull JSON round trip: {full * 1000:.3f} ms')
+        print(f'subtree to_dict():    {subtree * 1000:.3f} ms')
+        self.assertLess(subtree, full)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
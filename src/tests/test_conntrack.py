@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import os
+import tempfile
+
+from unittest import TestCase
+from unittest import mock
+
+from vyos.conntrack import dump_command
+from vyos.conntrack import get_flows
+from vyos.conntrack import match
+from vyos.conntrack import parse
+from vyos.conntrack import raw_document
+from vyos.conntrack import top
+
+def flow_xml(flow_id, src, dst, sport, dport, proto='tcp', zone=None, counters=True):
+    def meta(direction, src, dst, sport, dport):
+        out = f'<meta direction="{direction}">' \
+              f'<layer3 protonum="2" protoname="ipv4"><src>{src}</src><dst>{dst}</dst></layer3>' \
+              f'<layer4 protonum="6" protoname="{proto}"><sport>{sport}</sport><dport>{dport}</dport></layer4>'
+        if counters:
+            out += '<counters><packets>2</packets><bytes>120</bytes></counters>'
+        return out + '</meta>'
+
+    independent = '<meta direction="independent"><state>ESTABLISHED</state>' \
+                  f'<timeout>431999</timeout><mark>0</mark><use>1</use><id>{flow_id}</id>'
+    if zone is not None:
+        independent += f'<zone>{zone}</zone>'
+    independent += '<assured/></meta>'
+
+    return ('<flow>' + meta('original', src, dst, sport, dport) +
+            meta('reply', dst, '192.0.2.1', dport, sport) + independent + '</flow>')
+
+def document(*flows):
+    return ('<?xml version="1.0" encoding="utf-8"?>\n<conntrack>\n' +
+            '\n'.join(flows) + '\n</conntrack>\n')
+
+class TestConntrack(TestCase):
+    def test_parse(self):
+        xml = document(flow_xml(1, '10.0.0.1', '198.51.100.1', 40000, 443, zone=5),
+                       flow_xml(2, '10.0.0.2', '198.51.100.1', 40001, 80, counters=False))
+        flows = list(parse(io.StringIO(xml)))
+
+        self.assertEqual(len(flows), 2)
+        self.assertEqual(flows[0].id, 1)
+        self.assertEqual(flows[0].family, 'ipv4')
+        self.assertEqual(flows[0].proto, 'tcp')
+        self.assertEqual((flows[0].orig_src, flows[0].orig_sport), ('10.0.0.1', 40000))
+        self.assertEqual((flows[0].reply_dst, flows[0].reply_dport), ('192.0.2.1', 40000))
+        self.assertEqual(flows[0].state, 'ESTABLISHED')
+        self.assertEqual(flows[0].zone, 5)
+        self.assertEqual(flows[0].orig_bytes, 120)
+        self.assertIsNone(flows[1].zone)
+        self.assertIsNone(flows[1].orig_packets)
+
+    def test_raw_document(self):
+        # the shape of the former xmltodict conversion of the whole document
+        xml = document(flow_xml(1, '10.0.0.1', '198.51.100.1', 40000, 443, zone=5, counters=False))
+        meta = lambda direction, src, dst, sport, dport: {
+            'direction': direction,
+            'layer3': {'protonum': '2', 'protoname': 'ipv4', 'src': src, 'dst': dst},
+            'layer4': {'protonum': '6', 'protoname': 'tcp', 'sport': sport, 'dport': dport}}
+        self.assertEqual(raw_document(parse(io.StringIO(xml), as_dict=True)), {'conntrack': {'flow': [
+            {'meta': [meta('original', '10.0.0.1', '198.51.100.1', '40000', '443'),
+                      meta('reply', '198.51.100.1', '192.0.2.1', '443', '40000'),
+                      {'direction': 'independent', 'state': 'ESTABLISHED', 'timeout': '431999',
+                       'mark': '0', 'use': '1', 'id': '1', 'zone': '5', 'assured': None}]}]}})
+
+        self.assertEqual(raw_document(parse(io.StringIO(''), as_dict=True)),
+                         {'conntrack': {'error': True, 'reason': 'entries not found'}})
+
+    def test_parse_stream(self):
+        # no output at all for an empty table
+        self.assertEqual(list(parse(io.StringIO(''))), [])
+
+        # the rest of a pipe is left to the caller
+        stream = io.StringIO(document(flow_xml(1, '10.0.0.1', '198.51.100.1', 1, 2)))
+        self.assertEqual(len(list(parse(stream))), 1)
+
+    def test_filter(self):
+        flow = next(parse(io.StringIO(document(
+            flow_xml(1, '10.0.0.1', '198.51.100.1', 40000, 443, zone=5)))))
+        self.assertTrue(match(flow, src='10.0.0.1', proto='tcp', zone='5'))
+        self.assertFalse(match(flow, dst='10.0.0.1'))
+        self.assertFalse(match(flow, zone=1))
+
+        self.assertEqual(dump_command('ipv4', 'source', src='10.0.0.1', proto='tcp', zone=5),
+                         'sudo conntrack --dump --output xml --family ipv4 --src-nat '
+                         '--orig-src 10.0.0.1 --proto tcp --zone 5')
+
+    def test_top(self):
+        xml = document(*[flow_xml(i, f'10.0.0.{i % 3}', '198.51.100.1', 40000 + i, 443)
+                         for i in range(10)])
+        self.assertEqual(top(parse(io.StringIO(xml)), 'source', 2),
+                         [('10.0.0.0', 4), ('10.0.0.1', 3)])
+        self.assertEqual(top(parse(io.StringIO(xml)), 'destination-port', 1, by='bytes'),
+                         [('443/tcp', 2400)])
+        with self.assertRaises(ValueError):
+            top([], 'foo')
+
+    def test_get_flows(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        dump = os.path.join(tmp.name, 'dump.xml')
+        with open(dump, 'w') as f:
+            f.write(document(*[flow_xml(i, '10.0.0.1', '198.51.100.1', 40000 + i, 443)
+                               for i in range(2000)]))
+
+        # conntrack is still running once the whole dump was read
+        with mock.patch('vyos.conntrack.dump_command',
+                        return_value=f'sh -c "cat {dump}; exec >&-; sleep 0.1"'):
+            self.assertEqual(sum(1 for _ in get_flows()), 2000)
+
+            # the consumer stops early, conntrack is killed
+            flows = get_flows()
+            self.assertEqual(next(flows).id, 0)
+            flows.close()
+
+        with mock.patch('vyos.conntrack.dump_command',
+                        return_value=f'cat {dump} {tmp.name}/missing.xml'):
+            with self.assertRaises(OSError):
+                list(get_flows())
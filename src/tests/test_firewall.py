@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gzip
+import os
+import tempfile
+
+from functools import partial
+from unittest import TestCase
+from unittest import mock
+
+import vyos.firewall as firewall
+
+from vyos.firewall import external_list_delta
+from vyos.firewall import geoip_build_index
+from vyos.firewall import geoip_index_magic
+from vyos.firewall import geoip_load_data
+from vyos.firewall import optimize_rules
+from vyos.firewall import parse_rule
+from vyos.firewall import zone_verdict_maps
+
+templates_dir = os.path.join(os.path.dirname(__file__), '../../data/templates')
+
+def rule(action='accept', protocol='all', **kwargs):
+    return dict(action=action, protocol=protocol, **kwargs)
+
+class TestOptimizeRules(TestCase):
+    def test_merge_address(self):
+        rules = {
+            '10': rule(source={'address': '192.0.2.1'}),
+            '20': rule(source={'address': '192.0.2.2'}),
+            '30': rule(source={'address': '198.51.100.0/24'}),
+            '40': rule('drop', source={'address': '203.0.113.1'}),
+        }
+        out, saved = optimize_rules(rules)
+        self.assertEqual(saved, 2)
+        self.assertEqual(list(out), ['10,20,30', '40'])
+        self.assertIn('ip saddr { 192.0.2.1, 192.0.2.2, 198.51.100.0/24 }',
+                      parse_rule(out['10,20,30'], 'test', '10,20,30', 'ip'))
+        self.assertIn('comment "test-10,20,30"',
+                      parse_rule(out['10,20,30'], 'test', '10,20,30', 'ip'))
+
+    def test_merge_port(self):
+        rules = {
+            '10': rule(protocol='tcp', destination={'port': '22'}),
+            '20': rule(protocol='tcp', destination={'port': '80,443'}),
+            '30': rule(protocol='udp', destination={'port': '53'}),
+        }
+        out, saved = optimize_rules(rules)
+        self.assertEqual(saved, 1)
+        self.assertEqual(out['10,20']['destination']['port'], '22,80,443')
+        # the original rules are left untouched
+        self.assertEqual(rules['10']['destination']['port'], '22')
+
+    def test_merge_interface(self):
+        rules = {
+            '10': rule(inbound_interface='eth0'),
+            '15': rule(inbound_interface='eth1', disable={}),
+            '20': rule(inbound_interface='eth2'),
+        }
+        out, saved = optimize_rules(rules)
+        self.assertEqual(saved, 1)
+        self.assertIn('iifname { eth0, eth2 }', parse_rule(out['10,20'], 'test', '10,20', 'ip'))
+
+    def test_no_merge(self):
+        rules = {
+            # negated values and rules with their own log prefix or set
+            '10': rule(source={'address': '!192.0.2.1'}),
+            '20': rule(source={'address': '!192.0.2.2'}),
+            '30': rule(source={'address': '192.0.2.3'}, log='enable'),
+            '40': rule(source={'address': '192.0.2.4'}, log='enable'),
+            # overlapping port ranges are not a valid anonymous set
+            '50': rule(protocol='tcp', destination={'port': '1000-2000'}),
+            '60': rule(protocol='tcp', destination={'port': '1500'}),
+            # rules differing in more than one value
+            '70': rule(source={'address': '192.0.2.7'}, destination={'address': '192.0.2.70'}),
+            '80': rule(source={'address': '192.0.2.8'}, destination={'address': '192.0.2.80'}),
+        }
+        out, saved = optimize_rules(rules)
+        self.assertEqual(saved, 0)
+        self.assertEqual(list(out), list(rules))
+
+class TestZoneVerdictMaps(TestCase):
+    def test_maps(self):
+        zones = {
+            'lan': {'interface': ['eth1', 'eth2'], 'from': {
+                'wan': {'firewall': {'name': 'WAN-LAN'}},
+                'local': {'firewall': {'name': 'LOCAL-LAN'}}}},
+            'wan': {'interface': ['eth0'], 'intra_zone_filtering': {'action': 'drop'},
+                    'from': {'lan': {'firewall': {'ipv6_name': 'LAN-WAN6'}}}},
+            'local': {'local_zone': {}, 'from': {'lan': {'firewall': {'name': 'LAN-LOCAL'}}}},
+        }
+        maps = zone_verdict_maps(zones)
+        self.assertEqual(maps['local'], 'local')
+        self.assertEqual(maps['forward'], {
+            ('eth1', 'eth1'): 'accept', ('eth2', 'eth1'): 'accept',
+            ('eth1', 'eth2'): 'accept', ('eth2', 'eth2'): 'accept',
+            ('eth0', 'eth1'): 'goto NAME_WAN-LAN', ('eth0', 'eth2'): 'goto NAME_WAN-LAN',
+            ('eth0', 'eth0'): 'drop'})
+        self.assertEqual(maps['forward_default'], {'eth1': 'lan', 'eth2': 'lan', 'eth0': 'wan'})
+        self.assertEqual(maps['local_in'], {'lo': 'accept', 'eth1': 'goto NAME_LAN-LOCAL',
+                                            'eth2': 'goto NAME_LAN-LOCAL'})
+        self.assertEqual(maps['local_out'], {'lo': 'accept', 'eth1': 'goto NAME_LOCAL-LAN',
+                                             'eth2': 'goto NAME_LOCAL-LAN'})
+
+        maps = zone_verdict_maps(zones, ipv6=True)
+        self.assertEqual(maps['forward'][('eth1', 'eth0')], 'goto NAME6_LAN-WAN6')
+        self.assertNotIn(('eth0', 'eth1'), maps['forward'])
+
+class TestExternalList(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = tmp.name
+        self.nft_result = 0
+        os.makedirs(os.path.join(tmp.name, 'lists'))
+        for patcher in [
+                mock.patch.object(firewall, 'external_list_state_dir', os.path.join(tmp.name, 'state')),
+                mock.patch.object(firewall, 'external_list_file_dir', os.path.join(tmp.name, 'lists')),
+                mock.patch.object(firewall, 'external_list_lock_file', os.path.join(tmp.name, 'lock')),
+                mock.patch.object(firewall, 'external_list_crontab_file', os.path.join(tmp.name, 'crontab')),
+                mock.patch.object(firewall, 'nftables_external_list_conf', os.path.join(tmp.name, 'nft.conf')),
+                mock.patch.object(firewall, 'render', partial(firewall.render, location=templates_dir)),
+                mock.patch.object(firewall, 'run', lambda command: self.nft_result)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def update(self, **lists):
+        """ Apply the lists of {name: entries}, return the nftables file """
+        for name, entries in lists.items():
+            with open(os.path.join(self.path, 'lists', name + '.csv'), 'w') as f:
+                f.write(''.join(e + '\n' for e in entries))
+        conf = os.path.join(self.path, 'nft.conf')
+        if os.path.exists(conf):
+            os.unlink(conf)
+        config = {'group': {'external_list': {name: {} for name in lists}}}
+        result = firewall.external_list_update(config)
+        if not os.path.exists(conf):
+            return result, None
+        with open(conf) as f:
+            return result, f.read()
+
+    def test_delta(self):
+        # no state, reloaded in full
+        full, delta, applied = external_list_delta(
+            {'A': ['192.0.2.0/25', '192.0.2.128/25', '198.51.100.1', '198.51.100.3', '203.0.113.1']},
+            'ipv4')
+        self.assertEqual(full, {'A': ['192.0.2.0/24', '198.51.100.1/32', '198.51.100.3/32',
+                                      '203.0.113.1/32']})
+        self.assertEqual(delta, {})
+        for name, elements in applied.items():
+            firewall._external_list_state_save('ipv4', name, elements)
+
+        # unchanged, left alone
+        full, delta, applied = external_list_delta(
+            {'A': ['203.0.113.1', '198.51.100.3', '198.51.100.1', '192.0.2.0/24']}, 'ipv4')
+        self.assertEqual((full, delta), ({}, {}))
+
+        # a small change
+        full, delta, applied = external_list_delta(
+            {'A': ['192.0.2.0/24', '198.51.100.3', '198.51.100.7', '203.0.113.1']}, 'ipv4')
+        self.assertEqual(full, {})
+        self.assertEqual(delta, {'A': {'add': ['198.51.100.7/32'], 'delete': ['198.51.100.1/32']}})
+
+        # a change above the threshold
+        full, delta, applied = external_list_delta({'A': ['192.0.2.0/24', '198.51.100.5']}, 'ipv4')
+        self.assertEqual(full, {'A': ['192.0.2.0/24', '198.51.100.5/32']})
+        self.assertEqual(delta, {})
+
+        # the state of the other family is its own
+        full, delta, applied = external_list_delta({'A': ['2001:db8::/32']}, 'ipv6')
+        self.assertEqual(full, {'A': ['2001:db8::/32']})
+
+    def test_update(self):
+        result, conf = self.update(A=['192.0.2.1', '2001:db8::1'], B=['198.51.100.0/24'])
+        self.assertTrue(result)
+        self.assertIn('flush set ip vyos_filter L_A', conf)
+        self.assertIn('elements = { 192.0.2.1/32 }', conf)
+        self.assertIn('flush set ip6 vyos_filter L6_A', conf)
+
+        # unchanged lists are not applied again
+        self.assertEqual(self.update(A=['192.0.2.1', '2001:db8::1'], B=['198.51.100.0/24']),
+                         (True, None))
+
+        result, conf = self.update(A=['192.0.2.1', '192.0.2.2', '192.0.2.3', '2001:db8::1'],
+                                   B=['198.51.100.0/24'])
+        self.assertIn('add element ip vyos_filter L_A { 192.0.2.2/31 }', conf)
+        self.assertNotIn('flush set', conf)
+        self.assertNotIn('L_B', conf)
+
+        # an emptied list is emptied
+        result, conf = self.update(A=['192.0.2.1', '192.0.2.2', '192.0.2.3', '2001:db8::1'], B=[])
+        self.assertIn('flush set ip vyos_filter L_B', conf)
+        self.assertNotIn('198.51.100.0/24', conf)
+        self.assertEqual(self.update(A=['192.0.2.1', '192.0.2.2', '192.0.2.3', '2001:db8::1'], B=[]),
+                         (True, None))
+
+    def test_failed_update(self):
+        self.update(A=['192.0.2.1'])
+        self.nft_result = 1
+        result, conf = self.update(A=['192.0.2.1', '192.0.2.2'])
+        self.assertFalse(result)
+        self.assertIn('add element ip vyos_filter L_A', conf)
+
+        # the elements in the kernel are unknown, the next update reloads the set
+        self.nft_result = 0
+        result, conf = self.update(A=['192.0.2.1', '192.0.2.2'])
+        self.assertTrue(result)
+        self.assertIn('flush set ip vyos_filter L_A', conf)
+        self.assertIn('elements = { 192.0.2.1/32,192.0.2.2/32 }', conf)
+
+class TestGeoIPIndex(TestCase):
+    def test_round_trip(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        database = os.path.join(tmp.name, 'db.csv.gz')
+        index = os.path.join(tmp.name, 'db.idx')
+        with gzip.open(database, 'wt') as f:
+            f.write('192.0.2.0,192.0.2.127,DE\n'
+                    # adjacent and overlapping ranges are merged
+                    '192.0.2.128,192.0.2.255,DE\n'
+                    '192.0.2.200,198.51.99.255,DE\n'
+                    '203.0.113.7,203.0.113.7,DE\n'
+                    '2001:db8::,2001:db8::ffff,DE\n'
+                    '2001:db8:1::,2001:db8:1::ffff,DE\n'
+                    '198.51.100.0,198.51.100.255,FR\n'
+                    '2001:db8:2::1,2001:db8:2::1,FR\n'
+                    '2001:db8:1:0:0:0:1:0,2001:db8:1::2:ffff,DE\n')
+        geoip_build_index(database, index)
+
+        with open(index, 'rb') as f:
+            self.assertEqual(f.read(len(geoip_index_magic)), geoip_index_magic)
+
+        self.assertEqual(geoip_load_data(['de', 'fr', 'xx'], index), {
+            'de': {'ipv4': ['192.0.2.0-198.51.99.255', '203.0.113.7'],
+                   'ipv6': ['2001:db8::-2001:db8::ffff', '2001:db8:1::-2001:db8:1::2:ffff']},
+            'fr': {'ipv4': ['198.51.100.0-198.51.100.255'], 'ipv6': ['2001:db8:2::1']},
+        })
+        self.assertEqual(geoip_load_data(['xx'], index), {})
+
+        # an index of another format is not read
+        with open(index, 'r+b') as f:
+            f.write(b'VYOSGEO0')
+        with mock.patch('builtins.print'):
+            self.assertEqual(geoip_load_data(['de'], index), {})
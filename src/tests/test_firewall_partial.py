@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import copy
+import os
+import re
+import tempfile
+
+from unittest import TestCase
+from unittest import mock
+
+from vyos.configdiff import DiffIndex
+from vyos.template import render_to_string
+
+try:
+    from src.conf_mode import firewall
+except ModuleNotFoundError:  # for unittest.main()
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+    from src.conf_mode import firewall
+
+templates_dir = os.path.join(os.path.dirname(__file__), '../../data/templates')
+
+effective = {
+    'name': {
+        'FOO': {'default-action': 'drop',
+                'rule': {'10': {'action': 'accept', 'protocol': 'tcp'}}},
+        'BAR': {'default-action': 'drop',
+                'rule': {'10': {'action': 'accept', 'recent': {'count': '3', 'time': 'minute'}}}},
+    },
+    'ipv6-name': {
+        'FOO6': {'default-action': 'drop'},
+    },
+    'group': {
+        'address-group': {'SRV': {'address': ['192.0.2.1']}},
+        'domain-group': {'DOM': {'address': ['vyos.io']}},
+    },
+}
+
+def mangle(config):
+    if not isinstance(config, dict):
+        return config
+    return {k.replace('-', '_'): mangle(v) for k, v in config.items()}
+
+class TestPartialUpdated(TestCase):
+    def setUp(self):
+        tmp = tempfile.NamedTemporaryFile()
+        self.addCleanup(tmp.close)
+        patcher = mock.patch.object(firewall, 'nftables_conf', tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def updated(self, session):
+        """ partial_updated() for a commit from the effective config to session """
+        conf = mock.Mock()
+        conf.get_config_dict.side_effect = lambda path, **kwargs: \
+            {path[-1]: mangle(effective[path[1]].get(path[2], {}))}
+        with mock.patch.object(firewall, 'get_diff_index',
+                               lambda c: DiffIndex({'firewall': session}, {'firewall': effective})):
+            return firewall.partial_updated(conf, mangle(session))
+
+    def session(self):
+        return copy.deepcopy(effective)
+
+    def test_rules_and_members(self):
+        session = self.session()
+        session['name']['FOO']['rule']['10']['action'] = 'drop'
+        session['name']['FOO']['rule']['20'] = {'action': 'accept'}
+        session['ipv6-name']['FOO6']['default-action'] = 'accept'
+        session['group']['address-group']['SRV']['address'].append('192.0.2.2')
+        self.assertEqual(self.updated(session), {'name': {'FOO'}, 'ipv6_name': {'FOO6'},
+                                                 'group': {'address-group'}})
+
+    def test_unchanged(self):
+        self.assertIsNone(self.updated(self.session()))
+
+    def test_no_ruleset(self):
+        session = self.session()
+        session['name']['FOO']['rule']['10']['action'] = 'drop'
+        with mock.patch.object(firewall, 'nftables_conf', '/nonexistent'):
+            self.assertIsNone(self.updated(session))
+
+    def test_new_or_deleted_chain(self):
+        session = self.session()
+        session['name']['NEW'] = {'default-action': 'drop'}
+        self.assertIsNone(self.updated(session))
+
+        session = self.session()
+        del session['ipv6-name']['FOO6']
+        self.assertIsNone(self.updated(session))
+
+        session = self.session()
+        del session['ipv6-name']
+        self.assertIsNone(self.updated(session))
+
+    def test_new_or_deleted_group(self):
+        session = self.session()
+        session['group']['address-group']['NEW'] = {'address': ['192.0.2.3']}
+        self.assertIsNone(self.updated(session))
+
+        session = self.session()
+        del session['group']['address-group']['SRV']
+        self.assertIsNone(self.updated(session))
+
+        session = self.session()
+        session['group']['network-group'] = {'NET': {'network': ['192.0.2.0/24']}}
+        self.assertIsNone(self.updated(session))
+
+    def test_rule_sets(self):
+        # recent, fqdn and geoip sets are created along with the chain
+        session = self.session()
+        session['name']['BAR']['rule']['10']['action'] = 'drop'
+        self.assertIsNone(self.updated(session))
+
+        session = self.session()
+        session['name']['FOO']['rule']['10']['source'] = {'geoip': {'country-code': ['de']}}
+        self.assertIsNone(self.updated(session))
+
+        # a set removed from a chain
+        session = self.session()
+        del session['name']['BAR']['rule']['10']['recent']
+        self.assertIsNone(self.updated(session))
+
+    def test_other_paths(self):
+        session = self.session()
+        session['group']['domain-group']['DOM']['address'].append('vyos.net')
+        self.assertIsNone(self.updated(session))
+
+        session = self.session()
+        session['all-ping'] = 'disable'
+        self.assertIsNone(self.updated(session))
+
+        session = self.session()
+        session['zone'] = {'LAN': {'interface': ['eth0']}}
+        self.assertIsNone(self.updated(session))
+
+class TestPartialTemplate(TestCase):
+    def test_sets(self):
+        group = {'address_group': {'SRV': {'address': ['192.0.2.1']},
+                                   'WEB': {'address': ['192.0.2.80']}},
+                 'port_group': {'PORTS': {'port': ['22']}}}
+        partial = {'name': [], 'ipv6_name': [],
+                   'group': {'address_group': group['address_group']},
+                   'sets': {'ip vyos_filter': ['A_SRV', 'A_WEB'],
+                            'ip vyos_nat': ['A_SRV']}}
+        out = render_to_string('firewall/nftables-partial.j2',
+                               {'group': group, 'partial': partial},
+                               location=templates_dir)
+
+        tables = dict(re.findall(r'^table (ip \w+) \{\n(.*?)^\}', out, re.M | re.S))
+        self.assertEqual(re.findall(r'set (\w+) \{', tables['ip vyos_filter']), ['A_SRV', 'A_WEB'])
+        # only the sets the table holds already
+        self.assertEqual(re.findall(r'set (\w+) \{', tables['ip vyos_nat']), ['A_SRV'])
+        self.assertIn('flush set ip vyos_nat A_SRV', out)
+        self.assertNotIn('P_PORTS', out)
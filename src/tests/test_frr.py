@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import tempfile
+
+from unittest import TestCase
+from unittest import mock
+
+import vyos.frr as frr
+
+running = {
+    'zebra': 'frr version 8.1\n!\nip protocol bgp route-map RM-BGP\n!\nend',
+    'bgpd': 'frr version 8.1\n!\nrouter bgp 65000\n neighbor 192.0.2.1 remote-as 65001\nexit\n!\nend',
+    'ospfd': 'frr version 8.1\n!\nend',
+}
+
+class TestFRRTransaction(TestCase):
+    def setUp(self):
+        self.calls = []
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for target, func in [
+                ('get_configuration', lambda daemon=None, marked=False:
+                    self.calls.append(('show', daemon)) or running[daemon]),
+                ('reload_configuration', lambda config, daemon=None:
+                    self.calls.append(('reload', daemon))),
+                ('save_configuration', lambda: self.calls.append(('save',))),
+                ('mark_configuration', lambda config: config)]:
+            patcher = mock.patch(f'vyos.frr.{target}', func)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for patcher in [
+                mock.patch.object(frr.transaction, 'fname', os.path.join(tmp.name, 'transaction.json')),
+                mock.patch.object(frr.fingerprints, 'fname', os.path.join(tmp.name, 'fingerprints.json')),
+                mock.patch('vyos.frr.path_config', tmp.name)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.path = tmp.name
+        for daemon in running:
+            self.restart(daemon, 100)
+
+    def restart(self, daemon, pid):
+        with open(os.path.join(self.path, f'{daemon}.pid'), 'w') as f:
+            f.write(f'{pid}\n')
+
+    def apply_bgp(self, bgpd_config):
+        # protocols_bgp.py apply()
+        if frr.section_unchanged('bgpd', 'router bgp', bgpd_config):
+            return
+        frr_cfg = frr.FRRConfig()
+        frr_cfg.load_configuration('bgpd')
+        frr_cfg.modify_section(r'^router bgp \d+', stop_pattern='^exit', remove_stop_mark=True)
+        frr_cfg.add_before(frr.default_add_before, bgpd_config)
+        frr_cfg.commit_configuration('bgpd', {'router bgp': bgpd_config})
+
+    def test_transaction(self):
+        frr.transaction.begin(1)
+
+        # first script: zebra and bgpd
+        frr_cfg = frr.FRRConfig()
+        frr_cfg.load_configuration('zebra')
+        frr_cfg.modify_section(r'(\s+)?ip protocol bgp route-map [-a-zA-Z0-9.]+', stop_pattern=r'(\s|!)')
+        frr_cfg.commit_configuration('zebra')
+        frr_cfg.load_configuration('bgpd')
+        frr_cfg.modify_section(r'^router bgp \d+', stop_pattern='^exit', remove_stop_mark=True)
+        frr_cfg.add_before(frr.default_add_before, 'router bgp 65000\n neighbor 192.0.2.2 remote-as 65002\nexit')
+        frr_cfg.commit_configuration('bgpd')
+
+        # second script continues with the zebra configuration of the first
+        frr_cfg = frr.FRRConfig()
+        frr_cfg.load_configuration('zebra')
+        self.assertNotIn('ip protocol bgp route-map RM-BGP', str(frr_cfg))
+        frr_cfg.commit_configuration('zebra')
+        frr_cfg.load_configuration('ospfd')
+        frr_cfg.commit_configuration('ospfd')
+
+        self.assertEqual(frr.transaction.changed(), ['zebra', 'bgpd'])
+        self.assertEqual(frr.transaction.commit(), ['zebra', 'bgpd'])
+        self.assertFalse(frr.transaction.active())
+
+        # every daemon is read once, unchanged ones are not reloaded
+        self.assertEqual(self.calls, [('show', 'zebra'), ('show', 'bgpd'), ('show', 'ospfd'),
+                                      ('reload', 'zebra'), ('reload', 'bgpd'), ('save',)])
+
+    def test_failed_reload(self):
+        frr.transaction.begin(1)
+        frr.transaction.source = 'protocols_bgp.py'
+        self.apply_bgp('router bgp 65000\n neighbor 192.0.2.2 remote-as 65002\nexit')
+        frr.transaction.source = 'protocols_ospf.py'
+        frr_cfg = frr.FRRConfig()
+        frr_cfg.load_configuration('ospfd')
+        frr_cfg.add_before(frr.default_add_before, 'router ospf\nexit')
+        frr_cfg.commit_configuration('ospfd', {'router ospf': 'router ospf\nexit'})
+        frr.transaction.source = None
+
+        def reload(config, daemon=None):
+            if daemon == 'bgpd':
+                raise frr.CommitError('bgpd reload failed')
+            self.calls.append(('reload', daemon))
+
+        self.calls.clear()
+        with mock.patch('vyos.frr.reload_configuration_retry', reload):
+            with self.assertRaises(frr.CommitError) as e:
+                frr.transaction.commit()
+        # the other daemons are still applied
+        self.assertEqual(self.calls, [('reload', 'ospfd'), ('save',)])
+        self.assertIn('bgpd (changed by protocols_bgp.py): bgpd reload failed', str(e.exception))
+        self.assertNotIn('ospfd', str(e.exception))
+        self.assertFalse(frr.transaction.active())
+        self.assertTrue(frr.section_unchanged('ospfd', 'router ospf', 'router ospf\nexit'))
+
+    def test_syntax_error(self):
+        frr.transaction.begin(1)
+        with mock.patch('vyos.frr.mark_configuration',
+                        side_effect=frr.ConfigurationNotValid('invalid')):
+            with self.assertRaises(frr.ConfigurationNotValid):
+                self.apply_bgp('router bgp 65000\n invalid\nexit')
+        self.assertEqual(frr.transaction.changed(), [])
+
+    def test_other_process(self):
+        frr.transaction.begin(1)
+        # a process which did not begin the transaction, e.g. an op-mode
+        # command or a script run by vyshim itself, is not deferred
+        other = frr.FRRTransaction(frr.transaction.fname)
+        with mock.patch('vyos.frr.transaction', other):
+            frr_cfg = frr.FRRConfig()
+            frr_cfg.load_configuration('ospfd')
+            frr_cfg.commit_configuration('ospfd')
+        self.assertEqual(self.calls, [('show', 'ospfd'), ('reload', 'ospfd'), ('save',)])
+        self.assertTrue(frr.transaction.active())
+
+        # nor is the transaction of a previous commit
+        other.begin(2)
+        self.assertFalse(frr.transaction.active())
+
+    def test_no_transaction(self):
+        frr_cfg = frr.FRRConfig()
+        frr_cfg.load_configuration('ospfd')
+        frr_cfg.commit_configuration('ospfd')
+        self.assertEqual(self.calls, [('show', 'ospfd'), ('reload', 'ospfd'), ('save',)])
+
+    def test_unchanged_section(self):
+        bgpd_config = 'router bgp 65000\n neighbor 192.0.2.2 remote-as 65002\nexit'
+        self.apply_bgp(bgpd_config)
+        self.assertEqual(self.calls, [('show', 'bgpd'), ('reload', 'bgpd'), ('save',)])
+
+        # the same render again costs no vtysh invocation at all
+        self.calls.clear()
+        self.apply_bgp(bgpd_config)
+        self.assertEqual(self.calls, [])
+
+        # nor within a transaction
+        frr.transaction.begin(1)
+        self.apply_bgp(bgpd_config)
+        self.assertEqual(frr.transaction.commit(), [])
+        self.assertEqual(self.calls, [])
+
+        # a restarted daemon lost the configuration
+        self.restart('bgpd', 200)
+        self.apply_bgp(bgpd_config)
+        self.assertEqual(self.calls, [('show', 'bgpd'), ('reload', 'bgpd'), ('save',)])
+
+    def test_changed_section(self):
+        self.apply_bgp('router bgp 65000\nexit')
+        self.calls.clear()
+        self.apply_bgp('router bgp 65000\n neighbor 192.0.2.3 remote-as 65003\nexit')
+        self.assertEqual(self.calls, [('show', 'bgpd'), ('reload', 'bgpd'), ('save',)])
+
+        # another section of the daemon was committed since
+        frr_cfg = frr.FRRConfig()
+        frr_cfg.load_configuration('bgpd')
+        frr_cfg.commit_configuration('bgpd', {'rpki': ''})
+        self.assertFalse(frr.section_unchanged('bgpd', 'router bgp',
+                         'router bgp 65000\n neighbor 192.0.2.3 remote-as 65003\nexit'))
+        self.assertTrue(frr.section_unchanged('bgpd', 'rpki', ''))
+
+    def test_failed_commit(self):
+        self.apply_bgp('router bgp 65000\nexit')
+        with mock.patch('vyos.frr.reload_configuration_retry', side_effect=frr.CommitError('failed')):
+            with self.assertRaises(frr.CommitError):
+                self.apply_bgp('router bgp 65001\nexit')
+        self.assertFalse(frr.section_unchanged('bgpd', 'router bgp', 'router bgp 65000\nexit'))
+
+def route(prefix, protocol, nexthop, interface):
+    return {'prefix': prefix, 'protocol': protocol, 'selected': True,
+            'nexthops': [{'ip': nexthop, 'afi': 'ipv4', 'interfaceName': interface}]}
+
+class TestRouteStream(TestCase):
+    routes = [route('10.0.0.0/8', 'static', '192.0.2.1', 'eth0'),
+              route('10.1.0.0/16', 'bgp', '192.0.2.2', 'eth1'),
+              route('10.1.0.0/16', 'ospf', '192.0.2.3', 'eth2'),
+              route('172.16.0.0/12', 'bgp', '192.0.2.2', 'eth1')]
+
+    def table(self):
+        table = {}
+        for entry in self.routes:
+            table.setdefault(entry['prefix'], []).append(entry)
+        return json.dumps(table, indent=2)
+
+    def chunks(self, text, size):
+        return (text[i:i + size] for i in range(0, len(text), size))
+
+    def test_parse(self):
+        text = self.table()
+        for size in [1, 7, len(text)]:
+            self.assertEqual(list(frr.parse_routes(self.chunks(text, size))), self.routes)
+        self.assertEqual(list(frr.parse_routes([])), [])
+        self.assertEqual(list(frr.parse_routes(['{}'])), [])
+
+        # vrf all
+        text = json.dumps({'default': json.loads(self.table()), 'red': {}, 'blue': {}})
+        self.assertEqual(list(frr.parse_routes(self.chunks(text, 5))), self.routes)
+
+        with self.assertRaises(ValueError):
+            list(frr.parse_routes(['{"10.0.0.0/8": [{"prefix": "10.0.0.0/8"}']))
+
+    def test_filter(self):
+        routes = lambda **kwargs: [(r['prefix'], r['protocol']) for r in
+                                   filter(frr.route_filter(**kwargs), self.routes)]
+        self.assertEqual(routes(prefix='10.0.0.0/8'), [('10.0.0.0/8', 'static'),
+                                                       ('10.1.0.0/16', 'bgp'),
+                                                       ('10.1.0.0/16', 'ospf')])
+        self.assertEqual(routes(prefix='2001:db8::/32'), [])
+        self.assertEqual(routes(protocol='bgp', nexthop='eth1'), [('10.1.0.0/16', 'bgp'),
+                                                                  ('172.16.0.0/12', 'bgp')])
+        self.assertEqual(routes(prefix='10.0.0.0/8', nexthop='192.0.2.2'), [('10.1.0.0/16', 'bgp')])
+
+    def test_vtysh_stream(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with open(os.path.join(tmp.name, 'table.json'), 'w') as f:
+            f.write(self.table())
+        vtysh = os.path.join(tmp.name, 'vtysh')
+        with open(vtysh, 'w') as f:
+            f.write(f'#!/bin/sh\ncat {tmp.name}/table.json\nexec >&-\nsleep 0.1\n'
+                    f'exit $(cat {tmp.name}/status)\n')
+        os.chmod(vtysh, 0o755)
+        status = os.path.join(tmp.name, 'status')
+
+        with mock.patch('vyos.frr.path_vtysh', vtysh):
+            # vtysh still runs after the end of its output, its status is checked
+            with open(status, 'w') as f:
+                f.write('0')
+            self.assertEqual(json.loads(''.join(frr.execute_stream('show ip route json'))),
+                             json.loads(self.table()))
+
+            with open(status, 'w') as f:
+                f.write('1')
+            with self.assertRaises(OSError):
+                list(frr.execute_stream('show ip route json'))
+
+            # stopping early does not fail
+            stream = frr.execute_stream('show ip route json')
+            next(stream)
+            stream.close()
+
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Parsed FRR configuration model and benchmark of the section editing on
+# large synthetic configurations. The benchmark only runs on request:
+# VYOS_BENCHMARK=1 PYTHONPATH=python/ python3 src/tests/test_frr_config.py
+
+import os
+import unittest
+
+from timeit import timeit
+
+from vyos.frr import FRRConfig
+from vyos.frr import parse_configuration
+
+config = '''frr version 8.1
+frr defaults traditional
+hostname vyos
+!
+ip prefix-list PL-1 seq 5 permit 10.0.0.0/8
+ip prefix-list PL-2 seq 5 permit 172.16.0.0/12
+!
+router bgp 65000
+ bgp router-id 192.0.2.1
+ neighbor 192.0.2.2 remote-as 65001
+ !
+ address-family ipv4 unicast
+  network 10.0.0.0/8
+ exit-address-family
+exit
+!
+router bgp 65000 vrf red
+ neighbor 192.0.2.3 remote-as 65003
+exit
+!
+route-map FOO permit 10
+ set local-preference 200
+exit
+!
+line vty
+!
+end'''
+
+def synthetic_config(vrfs, neighbors, prefix_lists):
+    """ BGP configuration of roughly vrfs * neighbors * 3 + prefix_lists lines """
+    lines = ['frr version 8.1', 'frr defaults traditional', 'hostname vyos', '!']
+    lines += [f'ip prefix-list PL-{i} seq 5 permit 10.{i // 256 % 256}.{i % 256}.0/24'
+              for i in range(prefix_lists)]
+    lines.append('!')
+    for vrf in range(vrfs):
+        lines.append(f'router bgp 65000 vrf red{vrf}' if vrf else 'router bgp 65000')
+        for i in range(neighbors):
+            lines.append(f' neighbor 10.{vrf % 256}.{i // 256 % 256}.{i % 256} remote-as {65001 + i}')
+        lines.append(' !')
+        lines.append(' address-family ipv4 unicast')
+        for i in range(neighbors):
+            lines.append(f'  neighbor 10.{vrf % 256}.{i // 256 % 256}.{i % 256} activate')
+        lines.append(' exit-address-family')
+        lines.append('exit')
+        lines.append('!')
+    lines += ['line vty', '!', 'end']
+    return lines
+
+class TestFRRConfig(unittest.TestCase):
+    def test_parse(self):
+        tree = parse_configuration(config)
+        self.assertEqual(str(tree), config)
+        self.assertEqual(tree.keys(), ['router bgp 65000', 'router bgp 65000 vrf red',
+                                       'route-map FOO permit 10'])
+        self.assertEqual(tree.find(r'router bgp \d+ vrf \S+'), ['router bgp 65000 vrf red'])
+
+        af = tree.get('router bgp 65000', 'address-family ipv4 unicast')
+        self.assertEqual(af.lines, ['  network 10.0.0.0/8'])
+        self.assertEqual(af.end, ' exit-address-family')
+        self.assertIsNone(tree.get('router bgp 65001'))
+
+        # the lines of the contexts as they are
+        tree = parse_configuration(config, top_level=True)
+        self.assertEqual(str(tree), config)
+        self.assertEqual(tree.keys(), ['router bgp 65000', 'router bgp 65000 vrf red',
+                                       'route-map FOO permit 10'])
+        self.assertIn(' exit-address-family', tree.get('router bgp 65000').lines)
+
+    def test_edit(self):
+        tree = parse_configuration(config)
+        self.assertTrue(tree.remove('route-map FOO permit 10'))
+        self.assertFalse(tree.remove('route-map FOO permit 10'))
+
+        new = parse_configuration('router bgp 65000 vrf red\n neighbor 192.0.2.4 remote-as 65004\nexit')
+        self.assertTrue(tree.replace(new.get('router bgp 65000 vrf red')))
+        new = parse_configuration('router ospf\n ospf router-id 192.0.2.1\nexit')
+        self.assertFalse(tree.replace(new.get('router ospf'), before_pattern='line vty'))
+
+        out = str(tree)
+        self.assertNotIn('route-map FOO', out)
+        self.assertNotIn('192.0.2.3', out)
+        self.assertIn('router bgp 65000 vrf red\n neighbor 192.0.2.4 remote-as 65004\nexit', out)
+        self.assertIn('router ospf\n ospf router-id 192.0.2.1\nexit\nline vty', out)
+
+    def test_modify_section(self):
+        frr_cfg = FRRConfig(config)
+        self.assertEqual(frr_cfg.modify_section(r'^ip prefix-list .*'), 2)
+        self.assertEqual(frr_cfg.modify_section(r'^router bgp \d+.*', stop_pattern='^exit',
+                                                remove_stop_mark=True, count=1), 1)
+        out = str(frr_cfg)
+        self.assertNotIn('ip prefix-list', out)
+        self.assertNotIn('192.0.2.2', out)
+        self.assertIn('router bgp 65000 vrf red', out)
+
+        # an unterminated block is left as is
+        frr_cfg = FRRConfig(config)
+        self.assertEqual(frr_cfg.modify_section('^line vty', stop_pattern='^foo'), 0)
+        self.assertEqual(str(frr_cfg), config)
+
+    def test_modify_context(self):
+        running = config.replace('line vty', 'interface eth0\nexit\n!\n'
+                                 'interface eth1\n ip address 192.0.2.1/24\nexit\n!\n'
+                                 'vrf red\n vni 100\nexit-vrf\n!\nline vty')
+        for pattern, replacement in [(r'^router bgp \d+', '!'),
+                                     (r'^router bgp \d+ vrf \S+', '!'),
+                                     (r'^interface \S+', ['interface eth2', ' shutdown', 'exit']),
+                                     (r'^vrf .+', ''),
+                                     (r'^route-map .*', '!'),
+                                     (r'^router ospf', '!')]:
+            # the same pattern, searched line by line
+            expected = FRRConfig(running)
+            count = expected.modify_section(pattern, replacement, stop_pattern='^exit()',
+                                            remove_stop_mark=True)
+
+            frr_cfg = FRRConfig(running)
+            self.assertEqual(frr_cfg.modify_section(pattern, replacement, stop_pattern='^exit',
+                                                    remove_stop_mark=True), count)
+            self.assertIsNotNone(frr_cfg._tree)
+            self.assertEqual(str(frr_cfg), str(expected))
+
+        # the lines can be edited again once rendered
+        frr_cfg = FRRConfig(running)
+        frr_cfg.modify_section(r'^router bgp \d+', stop_pattern='^exit', remove_stop_mark=True)
+        self.assertTrue(frr_cfg.add_before(r'line vty', 'router bgp 65001\nexit'))
+        frr_cfg.modify_section(r'^interface eth0', stop_pattern='^exit', remove_stop_mark=True)
+        out = str(frr_cfg)
+        self.assertIn('router bgp 65001\nexit\nline vty', out)
+        self.assertNotIn('interface eth0', out)
+        self.assertIn('router bgp 65000 vrf red', out)
+
+    @unittest.skipUnless(os.environ.get('VYOS_BENCHMARK'), 'set VYOS_BENCHMARK to run benchmarks')
+    def test_benchmark(self):
+        runs = 3
+        timings = {}
+        for vrfs in [10, 40]:
+            lines = synthetic_config(vrfs, 500, 50 * vrfs)
+            remove = timeit(lambda: FRRConfig(lines).modify_section(
+                r'^router bgp \d+ vrf \S+', stop_pattern='^exit', remove_stop_mark=True),
+                number=runs) / runs
+            prefix_lists = timeit(lambda: FRRConfig(lines).modify_section(
+                r'^ip prefix-list .*'), number=runs) / runs
+            parse = timeit(lambda: parse_configuration(lines), number=runs) / runs
+            tree = parse_configuration(lines)
+            lookup = timeit(lambda: tree.get(f'router bgp 65000 vrf red{vrfs - 1}'),
+                            number=1000) / 1000
+            render = timeit(lambda: tree.render(), number=runs) / runs
+            timings[vrfs] = remove + prefix_lists
+
+            print(f'\n{len(lines)} lines, {vrfs} BGP instances, {50 * vrfs} prefix-lists')
+            print(f'modify_section() all BGP VRF instances: {remove * 1000:.3f} ms')
+            print(f'modify_section() all prefix-lists:      {prefix_lists * 1000:.3f} ms')
+            print(f'parse_configuration():                  {parse * 1000:.3f} ms')
+            print(f'FRRSection.get():                       {lookup * 1000000:.3f} us')
+            print(f'FRRSection.render():                    {render * 1000:.3f} ms')
+
+        # four times the blocks in a four times larger configuration, a
+        # quadratic implementation takes sixteen times longer
+        self.assertLess(timings[40], timings[10] * 8)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+
+from unittest import TestCase
+from unittest import mock
+
+from vyos.nftables import Counters
+
+def rule(chain, comment, packets, _bytes):
+    return {'rule': {'family': 'ip', 'table': 'vyos_filter', 'chain': chain,
+                     'comment': comment, 'expr': [
+                         {'match': {'op': '==', 'left': {'meta': {'key': 'l4proto'}}, 'right': 'tcp'}},
+                         {'counter': {'packets': packets, 'bytes': _bytes}},
+                         {'accept': None}]}}
+
+class TestNftables(TestCase):
+    def test_index(self):
+        counters = Counters([
+            {'chain': {'family': 'ip', 'table': 'vyos_filter', 'name': 'NAME_foo'}},
+            rule('NAME_foo', 'foo-10', 5, 500),
+            rule('NAME_foo', 'foo-20', 1, 100),
+            # rules of a single configuration rule share its comment
+            rule('NAME_foo', 'foo-20', 2, 200),
+            rule('NAME_bar', 'bar-10', 7, 700)])
+
+        self.assertEqual(len(counters), 3)
+        self.assertEqual(counters.get('ip vyos_filter', 'NAME_foo', 'foo-20'),
+                         {'packets': 3, 'bytes': 300})
+        self.assertIsNone(counters.get('ip vyos_filter', 'NAME_foo', 'foo-30'))
+        self.assertEqual([c for c, _ in counters.chain('ip vyos_filter', 'NAME_foo')],
+                         ['foo-10', 'foo-20'])
+
+    def test_delta(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+             mock.patch('vyos.nftables.snapshot_dir', os.path.join(tmp, 'snapshots')):
+            self.assertIsNone(Counters.load('test'))
+
+            previous = Counters([rule('NAME_foo', 'foo-10', 10, 1000),
+                                 rule('NAME_foo', 'foo-20', 50, 5000)])
+            previous.save('test')
+            previous = Counters.load('test')
+            previous.time -= 10
+
+            # foo-20 decreased, the ruleset was reloaded in between
+            current = Counters([rule('NAME_foo', 'foo-10', 30, 3000),
+                                rule('NAME_foo', 'foo-20', 5, 500)])
+            delta = current.delta(previous)
+
+            foo10 = delta[('ip vyos_filter', 'NAME_foo', 'foo-10')]
+            self.assertEqual(foo10['packets_delta'], 20)
+            self.assertAlmostEqual(foo10['packets_per_second'], 2, delta=0.1)
+            self.assertAlmostEqual(foo10['bytes_per_second'], 200, delta=10)
+            foo20 = delta[('ip vyos_filter', 'NAME_foo', 'foo-20')]
+            self.assertEqual(foo20['packets_delta'], 5)
+
+            # without a previous snapshot only the totals are known
+            self.assertNotIn('packets_delta',
+                             current.delta(None)[('ip vyos_filter', 'NAME_foo', 'foo-10')])
+
+    def test_snapshot_dir(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+             mock.patch('vyos.nftables.snapshot_dir', os.path.join(tmp, 'snapshots')):
+            counters = Counters([rule('NAME_foo', 'foo-10', 10, 1000)])
+
+            # a directory others can write to is refused
+            os.mkdir(os.path.join(tmp, 'snapshots'), 0o700)
+            os.chmod(os.path.join(tmp, 'snapshots'), 0o777)
+            with self.assertRaises(PermissionError):
+                counters.save('test')
+            self.assertIsNone(Counters.load('test'))
+
+            # as is a symlink to a directory
+            os.rmdir(os.path.join(tmp, 'snapshots'))
+            os.mkdir(os.path.join(tmp, 'elsewhere'), 0o700)
+            os.symlink(os.path.join(tmp, 'elsewhere'), os.path.join(tmp, 'snapshots'))
+            with self.assertRaises(PermissionError):
+                counters.save('test')
+            self.assertEqual(os.listdir(os.path.join(tmp, 'elsewhere')), [])
@@ -19,6 +19,24 @@ from unittest import TestCase
 import vyos.opmode
 
 class TestVyOSOpMode(TestCase):
+    def test_stream_table(self):
+        from itertools import count
+        from itertools import islice
+        from vyos.opmode import stream_table
+
+        lines = list(stream_table([[1, '192.0.2.1:22', None], [20, '192.0.2.10', 'x']],
+                                  ['Id', 'Address', 'Zone'], [3, 21, 2]))
+        self.assertEqual(lines, ['Id   Address                Zone',
+                                 '---  ---------------------  ----',
+                                 '1    192.0.2.1:22',
+                                 '20   192.0.2.10             x'])
+        self.assertEqual(list(stream_table([], ['Id'], [3])), ['Entries not found'])
+
+        # rows are formatted as they are read
+        rows = ([i] for i in count())
+        self.assertEqual(list(islice(stream_table(rows, ['Id'], [3]), 4)),
+                         ['Id', '---', '0', '1'])
+
     def test_field_name_normalization(self):
         from vyos.opmode import _normalize_field_name
 
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+import threading
+
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from unittest import TestCase
+
+from vyos.remote import download_if_modified
+
+class ListHandler(BaseHTTPRequestHandler):
+    """ Serves the content of the server, honouring conditional requests """
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        etag = self.headers.get('If-None-Match')
+        since = self.headers.get('If-Modified-Since')
+        if (etag and etag == server.etag) or (not etag and since == server.last_modified):
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        if server.etag:
+            self.send_header('ETag', server.etag)
+        self.send_header('Last-Modified', server.last_modified)
+        self.send_header('Content-Length', str(len(server.content)))
+        self.end_headers()
+        self.wfile.write(server.content)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestDownloadIfModified(TestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), ListHandler)
+        self.server.requests = []
+        self.server.content = b'192.0.2.1\n192.0.2.2\n'
+        self.server.etag = '"v1"'
+        self.server.last_modified = 'Mon, 07 Nov 2022 10:00:00 GMT'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/list.csv'
+        self.dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.dir.name, 'list.csv')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.dir.cleanup()
+
+    def read(self):
+        with open(self.file, 'rb') as f:
+            return f.read()
+
+    def test_etag(self):
+        modified, validators = download_if_modified(self.file, self.url)
+        self.assertTrue(modified)
+        self.assertEqual(validators['etag'], '"v1"')
+        self.assertEqual(self.read(), self.server.content)
+
+        modified, validators = download_if_modified(self.file, self.url, validators)
+        self.assertFalse(modified)
+        self.assertEqual(self.server.requests[-1]['If-None-Match'], '"v1"')
+
+        self.server.content = b'198.51.100.0/24\n'
+        self.server.etag = '"v2"'
+        modified, validators = download_if_modified(self.file, self.url, validators)
+        self.assertTrue(modified)
+        self.assertEqual(validators['etag'], '"v2"')
+        self.assertEqual(self.read(), b'198.51.100.0/24\n')
+
+    def test_last_modified(self):
+        self.server.etag = None
+        modified, validators = download_if_modified(self.file, self.url)
+        self.assertTrue(modified)
+        self.assertIsNone(validators['etag'])
+
+        modified, _ = download_if_modified(self.file, self.url, validators)
+        self.assertFalse(modified)
+        self.assertEqual(self.server.requests[-1]['If-Modified-Since'],
+                         'Mon, 07 Nov 2022 10:00:00 GMT')
+
+    def test_missing_file(self):
+        # validators are only sent along with an existing local copy
+        modified, _ = download_if_modified(self.file, self.url, {'etag': '"v1"'})
+        self.assertTrue(modified)
+        self.assertNotIn('If-None-Match', self.server.requests[-1])
+        self.assertEqual(self.read(), self.server.content)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import os
+import struct
+import tempfile
+
+from socket import AF_INET
+from socket import AF_INET6
+from unittest import TestCase
+
+from vyos.resolver import ResolveError
+from vyos.resolver import build_query
+from vyos.resolver import cache_load
+from vyos.resolver import cache_lookup
+from vyos.resolver import cache_prune
+from vyos.resolver import cache_save
+from vyos.resolver import cache_update
+from vyos.resolver import hosts_lookup
+from vyos.resolver import parse_response
+from vyos.resolver import resolve
+
+def rr(rtype, ttl, rdata):
+    # owner name as a pointer to the question
+    return b'\xc0\x0c' + struct.pack('!HHIH', rtype, 1, ttl, len(rdata)) + rdata
+
+def answer(query, flags, answers=[], authority=[]):
+    header = struct.pack('!HHHHHH', struct.unpack('!H', query[:2])[0], flags,
+                         1, len(answers), len(authority), 0)
+    return header + query[12:] + b''.join(answers) + b''.join(authority)
+
+class TestResolver(TestCase):
+    def test_parse_response(self):
+        query = build_query(1234, 'www.example.com', AF_INET)
+        data = answer(query, 0x8180, [
+            rr(5, 3600, b'\x03cdn\xc0\x10'),
+            rr(1, 300, bytes([192, 0, 2, 1])),
+            rr(1, 120, bytes([192, 0, 2, 2]))])
+        self.assertEqual(parse_response(data, 1234, AF_INET),
+                         ({'192.0.2.1', '192.0.2.2'}, 120))
+
+        with self.assertRaises(ResolveError):
+            parse_response(data, 4321, AF_INET)
+
+    def test_parse_response_aaaa(self):
+        query = build_query(1, 'example.com', AF_INET6)
+        data = answer(query, 0x8180, [
+            rr(28, 60, bytes.fromhex('20010db8000000000000000000000001'))])
+        self.assertEqual(parse_response(data, 1, AF_INET6), ({'2001:db8::1'}, 60))
+
+    def test_parse_response_negative(self):
+        query = build_query(1, 'nothing.example.com', AF_INET)
+        soa = (b'\x02ns\xc0\x14\x05admin\xc0\x14' +
+               struct.pack('!IIIII', 1, 7200, 3600, 86400, 30))
+        data = answer(query, 0x8183, authority=[rr(6, 900, soa)])
+        self.assertEqual(parse_response(data, 1, AF_INET), (set(), 30))
+
+    def test_parse_response_failure(self):
+        query = build_query(1, 'example.com', AF_INET)
+        with self.assertRaises(ResolveError):
+            parse_response(answer(query, 0x8182), 1, AF_INET)
+        with self.assertRaises(ResolveError):
+            parse_response(answer(query, 0x8380), 1, AF_INET)
+
+    def test_hosts(self):
+        with tempfile.NamedTemporaryFile('w') as f:
+            f.write('# comment\n'
+                    '127.0.0.1 localhost\n'
+                    '192.0.2.5 example.com # static mapping\n'
+                    '192.0.2.6 example.com\n'
+                    '2001:db8::5 example.com\n')
+            f.flush()
+            self.assertEqual(hosts_lookup('Example.com', AF_INET, f.name),
+                             {'192.0.2.5', '192.0.2.6'})
+            self.assertEqual(hosts_lookup('example.com.', AF_INET6, f.name),
+                             {'2001:db8::5'})
+            self.assertIsNone(hosts_lookup('example.org', AF_INET, f.name))
+
+    def test_resolve_address(self):
+        self.assertEqual(asyncio.run(resolve('192.0.2.1', AF_INET)),
+                         ({'192.0.2.1'}, None))
+        self.assertEqual(asyncio.run(resolve('192.0.2.1', AF_INET6)),
+                         (set(), None))
+
+class TestResolverCache(TestCase):
+    def test_cache(self):
+        cache = {}
+        cache_update(cache, 'Example.com.', AF_INET, {'192.0.2.2', '192.0.2.1'}, 300)
+        cache_update(cache, 'example.org', AF_INET, {'192.0.2.8'}, -1)
+
+        addresses, ttl = cache_lookup(cache, 'example.com', AF_INET)
+        self.assertEqual(addresses, {'192.0.2.1', '192.0.2.2'})
+        self.assertAlmostEqual(ttl, 300, delta=1)
+        self.assertIsNone(cache_lookup(cache, 'example.com', AF_INET6))
+
+        # expired entries are the last good value
+        self.assertIsNone(cache_lookup(cache, 'example.org', AF_INET))
+        self.assertEqual(cache_lookup(cache, 'example.org', AF_INET, stale=True)[0],
+                         {'192.0.2.8'})
+
+        cache_prune(cache, [('example.org', AF_INET)])
+        self.assertIsNone(cache_lookup(cache, 'example.com', AF_INET))
+
+    def test_cache_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            fname = os.path.join(tmp, 'cache.json')
+            self.assertEqual(cache_load(fname), {})
+
+            cache = {}
+            cache_update(cache, 'example.com', AF_INET6, {'2001:db8::5'}, 60)
+            cache_save(cache, fname)
+            self.assertEqual(cache_load(fname), cache)
+
+            with open(fname, 'w') as f:
+                f.write('{')
+            self.assertEqual(cache_load(fname), {})
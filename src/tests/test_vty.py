@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2022 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+
+from unittest import TestCase
+from unittest import mock
+
+import vyos.frr as frr
+import vyos.vty as vty
+
+summary = {'ipv4Unicast': {'routerId': '192.0.2.1', 'peers': {'192.0.2.2': {'state': 'Established'}}}}
+
+class FakeVty(socketserver.BaseRequestHandler):
+    """ The vty socket of a daemon, answering every command with a reply split
+    over several writes like a daemon with a long output does """
+    def handle(self):
+        self.server.connections += 1
+        buffer = b''
+        while True:
+            data = self.request.recv(4096)
+            if not data:
+                return
+            buffer += data
+            while b'\0' in buffer:
+                command, buffer = buffer.split(b'\0', 1)
+                self.server.commands.append(command.decode())
+                output, status = self.server.reply(command.decode())
+                reply = output.encode() + b'\0\0\0' + bytes([status])
+                for i in range(0, len(reply), 3):
+                    self.request.sendall(reply[i:i + 3])
+
+class FakeDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        self.commands = []
+        self.connections = 0
+        super().__init__(path, FakeVty)
+
+    def reply(self, command):
+        if command in ['enable', 'show bgp ipv4 summary json']:
+            return (json.dumps(summary) if 'json' in command else '', vty.CMD_SUCCESS)
+        if command == 'show running-config':
+            return ('Building configuration...\n\nCurrent configuration:\n!\n'
+                    'router bgp 65000\nexit\n!\nend\n', vty.CMD_SUCCESS)
+        return ('% Unknown command: ' + command, vty.CMD_ERR_NO_MATCH)
+
+class TestVty(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch('vyos.vty.path_vty', tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.server = FakeDaemon(os.path.join(tmp.name, 'bgpd.vty'))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(vty.pool.clear)
+
+    def test_execute(self):
+        self.assertTrue(vty.available('bgpd'))
+        self.assertFalse(vty.available('ospfd'))
+        self.assertEqual(vty.execute_json('bgpd', 'show bgp ipv4 summary json'), summary)
+
+        # a failed command leaves the connection usable
+        with self.assertRaises(vty.VtyError) as e:
+            vty.execute('bgpd', 'show foo')
+        self.assertEqual(e.exception.status, vty.CMD_ERR_NO_MATCH)
+        self.assertEqual(vty.execute_json('bgpd', 'show bgp ipv4 summary json'), summary)
+
+        # one connection for all commands, in enable mode
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.commands, ['enable', 'show bgp ipv4 summary json',
+                                                'show foo', 'show bgp ipv4 summary json'])
+
+    def test_pipelining(self):
+        outputs = vty.execute_many('bgpd', ['show bgp ipv4 summary json'] * 200)
+        self.assertEqual([json.loads(o) for o in outputs], [summary] * 200)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_stream(self):
+        chunks = list(vty.stream('bgpd', 'show bgp ipv4 summary json'))
+        self.assertGreater(len(chunks), 0)
+        self.assertEqual(json.loads(''.join(chunks)), summary)
+        # the connection was read to the end of the reply, and is reused
+        self.assertEqual(vty.execute_json('bgpd', 'show bgp ipv4 summary json'), summary)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_interrupted(self):
+        # replies left unread, the connection is not reused
+        with vty.pool.connection('bgpd') as connection:
+            connection.send(['show bgp ipv4 summary json'])
+        self.assertEqual(vty.execute_json('bgpd', 'show bgp ipv4 summary json'), summary)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_frr(self):
+        self.assertEqual(vty.command_daemon(' show bgp vrf red ipv4 summary json '), 'bgpd')
+        self.assertIsNone(vty.command_daemon('show version'))
+        self.assertEqual(json.loads(frr.execute(' show bgp ipv4 summary json ')), summary)
+        self.assertEqual(frr.get_configuration('bgpd'), '!\nrouter bgp 65000\nexit\n!\nend')
+        with self.assertRaises(OSError):
+            frr.execute('show bgp foo')
+
+class TestVtyFallback(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.commands = []
+        for patcher in [
+                mock.patch('vyos.vty.path_vty', tmp.name),
+                mock.patch('vyos.frr.path_vtysh', '/bin/echo'),
+                mock.patch('vyos.util.popen', lambda command, **kwargs:
+                           self.commands.append(command) or ('vtysh output', 0))]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(vty.pool.clear)
+
+        # the socket left behind by a crashed daemon
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(os.path.join(tmp.name, 'bgpd.vty'))
+        sock.close()
+
+    def test_stale_socket(self):
+        self.assertTrue(vty.available('bgpd'))
+        self.assertEqual(frr.execute('show bgp ipv4 summary json'), 'vtysh output')
+        self.assertEqual(frr.get_configuration('bgpd'), 'vtysh output')
+        self.assertEqual(self.commands, ["/bin/echo -c 'show bgp ipv4 summary json'",
+                                         "/bin/echo -c 'show run' -d bgpd"])
+        self.assertEqual(''.join(frr.execute_stream('show bgp ipv4 summary json')),
+                         '-c show bgp ipv4 summary json\n')
+
+    def test_no_access(self):
+        with mock.patch('vyos.vty.VtyConnection', side_effect=PermissionError(13, 'Permission denied')):
+            self.assertEqual(frr.execute('show bgp ipv4 summary json'), 'vtysh output')
+            self.assertEqual(''.join(frr.execute_stream('show bgp ipv4 summary json')),
+                             '-c show bgp ipv4 summary json\n')